@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Performance Benchmarks for the ERW Analysis Pipeline
+São Miguel Island, Azores
+
+Times the analyzer, the CO₂ mass balance, the sensitivity routines and
+the case-study resource functions on synthetic inputs from 10² up to 10⁷
+rows, and writes throughput, peak memory and scaling slopes as JSON.
+
+Usage:
+    python3 benchmarks/run_benchmarks.py --max-rows 1000000 --output bench.json
+    python3 benchmarks/run_benchmarks.py --check   # code-path parity only
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+sys.path.insert(0, os.path.join(ROOT, 'case_studies'))
+
+from extended_analysis import (ERWScenario, ScenarioBatch, calculate_co2_mass_balance,
+                               calculate_co2_mass_balance_batch, generate_sensitivity_matrix,
+                               sensitivity_analysis, sensitivity_grid)
+from viability_analysis import PLOT_NUMERIC_FIELDS, ERWViabilityAnalyzer, PlotTable, SoilPlot
+from scoring_rubric import Rubric, RubricSet
+import Azores
+import sao_miguel
+
+
+DEFAULT_SIZES = [10 ** k for k in range(2, 8)]
+
+
+# ── synthetic inputs ─────────────────────────────────────────────────────
+
+def synthetic_plot_table(n: int, seed: int = 0) -> PlotTable:
+    """Plots drawn around the Sanguinho soil ranges (pH 4.8-6.8, OM 3-14%, ...)."""
+    rng = np.random.default_rng(seed)
+    return PlotTable({
+        'ph': np.round(rng.uniform(4.8, 6.8, n), 1),
+        'organic_matter': np.round(rng.uniform(3.0, 14.0, n), 1),
+        'exchangeable_ca': np.round(rng.uniform(4.0, 12.0, n), 1),
+        'exchangeable_mg': np.round(rng.uniform(0.3, 1.8, n), 1),
+        'exchangeable_k': np.round(rng.uniform(0.4, 1.2, n), 1),
+        'cec': np.round(rng.uniform(9.0, 24.0, n), 1),
+        'base_saturation': np.round(rng.uniform(30.0, 70.0, n)),
+        'p_extractable': np.round(rng.uniform(30.0, 70.0, n)),
+        'k_extractable': np.round(rng.uniform(140.0, 280.0, n)),
+        'area_ha': np.round(rng.uniform(0.5, 5.0, n), 2),
+    }, plot_id=np.arange(n))
+
+
+def synthetic_plots(n: int, seed: int = 0) -> List[SoilPlot]:
+    """The same plots as SoilPlot objects (for the per-plot code path)."""
+    table = synthetic_plot_table(n, seed)
+    return [SoilPlot(str(i), *(float(table.columns[f][i]) for f in PLOT_NUMERIC_FIELDS))
+            for i in range(n)]
+
+
+def synthetic_scenarios(n: int, seed: int = 0) -> ScenarioBatch:
+    rng = np.random.default_rng(seed)
+    return ScenarioBatch(application_rate_t_ha=rng.uniform(2.7, 50.0, n),
+                         weathering_efficiency=rng.uniform(0.2, 0.7, n),
+                         annual_rainfall_mm=rng.uniform(900.0, 3000.0, n),
+                         transport_emissions_kg_co2_per_t=rng.uniform(5.0, 30.0, n))
+
+
+# ── benchmark cases ──────────────────────────────────────────────────────
+# Each case: name -> (setup(n) -> state, run(state), max rows by default)
+
+def _scenario_list(n):
+    batch = synthetic_scenarios(n)
+    return [batch.scenario(i) for i in range(n)]
+
+
+CASES: Dict[str, tuple] = {
+    'analyze_all_plots': (
+        lambda n: ERWViabilityAnalyzer(synthetic_plots(n)),
+        lambda analyzer: analyzer.analyze_all_plots(),
+        10 ** 5,
+    ),
+    'analyze_table': (
+        lambda n: ERWViabilityAnalyzer(synthetic_plot_table(n)),
+        lambda analyzer: analyzer.analyze_table(),
+        10 ** 7,
+    ),
+    'score_batch': (
+        lambda n: (ERWViabilityAnalyzer([]), synthetic_plot_table(n)),
+        lambda s: s[0].score_plots(s[1]),
+        10 ** 7,
+    ),
+    'rubric_score': (
+        lambda n: (Rubric.from_analyzer(), synthetic_plot_table(n)),
+        lambda s: s[0].score(s[1]),
+        10 ** 7,
+    ),
+    'rubric_set_score_x4': (
+        lambda n: (RubricSet([Rubric.from_analyzer(name=f'rubric {i}') for i in range(4)]),
+                   synthetic_plot_table(n)),
+        lambda s: s[0].score(s[1]),
+        10 ** 7,
+    ),
+    'calculate_co2_mass_balance': (
+        _scenario_list,
+        lambda scenarios: [calculate_co2_mass_balance(s) for s in scenarios],
+        10 ** 5,
+    ),
+    'calculate_co2_mass_balance_batch': (
+        synthetic_scenarios,
+        calculate_co2_mass_balance_batch,
+        10 ** 7,
+    ),
+    # n = grid points; the legacy routines have fixed grids and run once
+    'sensitivity_analysis': (
+        lambda n: ERWScenario("Base", 2.7, 0.45, 1750),
+        sensitivity_analysis,
+        10 ** 2,
+    ),
+    'generate_sensitivity_matrix': (
+        lambda n: 2.7,
+        generate_sensitivity_matrix,
+        10 ** 2,
+    ),
+    'sensitivity_grid': (
+        lambda n: (ERWScenario("Base", 2.7, 0.45, 1750), {
+            'application_rate_t_ha': np.linspace(1, 50, n // 10),
+            'weathering_efficiency': np.linspace(0.2, 0.7, 10),
+        }),
+        lambda s: sensitivity_grid(s[0], s[1]),
+        10 ** 7,
+    ),
+    'sao_miguel_basalt_resource': (
+        lambda n: np.random.default_rng(0).uniform(0.5, 0.9, n),
+        lambda coverage: [sao_miguel.sao_miguel_basalt_resource(basalt_coverage=c) for c in coverage],
+        10 ** 5,
+    ),
+    'sao_miguel_agricultural_integration': (
+        lambda n: n,
+        lambda n: [sao_miguel.sao_miguel_agricultural_integration() for _ in range(n)],
+        10 ** 5,
+    ),
+    'azores_basalt_mass': (
+        lambda n: np.random.default_rng(0).uniform(700, 760, n),
+        lambda area: Azores.azores_basalt_mass(area_km2=area),
+        10 ** 7,
+    ),
+}
+
+# Rows processed per call when it is not the requested size
+FIXED_ROWS = {'sensitivity_analysis': 125, 'generate_sensitivity_matrix': 20}
+
+
+# ── parity checks ────────────────────────────────────────────────────────
+# Each check: name -> run(plots, table) returning an analyze_all_plots
+# DataFrame that must match the per-plot List[SoilPlot] path exactly.
+
+PARITY_CHECKS: Dict[str, Callable] = {
+    'plot_table': lambda plots, table: ERWViabilityAnalyzer(table).analyze_all_plots(),
+    'analyze_table': lambda plots, table: ERWViabilityAnalyzer(table).results_frame(
+        ERWViabilityAnalyzer(table).analyze_table()),
+    'analyze_all_plots_parallel': lambda plots, table: ERWViabilityAnalyzer(plots).analyze_all_plots(n_workers=2),
+}
+
+
+def check_parity(n: int = 3000, seeds=range(4), checks: List[str] = None) -> Dict[str, int]:
+    """
+    Compare each parity check with analyze_all_plots on List[SoilPlot].
+
+    Seed 0 is the usual synthetic table; further seeds also perturb the
+    soil values off the 0.1 grid, so rounding near-ties come up in every
+    rounded column.
+
+    Returns check name -> number of differing cells over all seeds (plot
+    IDs are compared as strings).
+    """
+    mismatches = {}
+    for seed in seeds:
+        table = synthetic_plot_table(n, seed)
+        if seed:
+            rng = np.random.default_rng(seed)
+            for name in ('ph', 'organic_matter', 'exchangeable_ca', 'exchangeable_mg', 'cec'):
+                table.columns[name] += rng.uniform(-0.05, 0.05, n)
+            table.invalidate()
+        plots = table.to_plots()
+        for plot in plots:
+            plot.plot_id = str(plot.plot_id)
+        expected = ERWViabilityAnalyzer(plots).analyze_all_plots()
+        expected['Plot ID'] = expected['Plot ID'].astype(str)
+        for name in checks or PARITY_CHECKS:
+            df = PARITY_CHECKS[name](plots, table)
+            df['Plot ID'] = df['Plot ID'].astype(str)
+            differing = (df != expected) & ~(df.isna() & expected.isna())
+            mismatches[name] = mismatches.get(name, 0) + int(differing.to_numpy().sum())
+    return mismatches
+
+
+def _time(run: Callable, state, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(state)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _peak_memory(run: Callable, state) -> int:
+    tracemalloc.start()
+    try:
+        run(state)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _scaling_slope(points: List[Dict]) -> float:
+    """Log-log slope of seconds vs rows (1.0 = linear scaling)."""
+    usable = [(p['rows'], p['seconds']) for p in points if p['seconds'] > 0]
+    if len(usable) < 2:
+        return None
+    x, y = np.log10(np.array(usable, dtype=float)).T
+    return round(float(np.polyfit(x, y, 1)[0]), 3)
+
+
+def run_benchmarks(sizes: List[int] = None, max_rows: int = None,
+                   cases: List[str] = None, repeat: int = 3,
+                   measure_memory: bool = True) -> Dict:
+    """
+    Run the selected cases at each size up to the case's row cap.
+
+    Returns a JSON-ready dict: environment info plus, per case, a list of
+    {rows, seconds, rows_per_second, peak_memory_bytes} and the scaling slope.
+    """
+    sizes = DEFAULT_SIZES if sizes is None else sizes
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'cases': {},
+    }
+
+    for name in cases or CASES:
+        setup, run, cap = CASES[name]
+        cap = min(cap, max_rows) if max_rows else cap
+        points = []
+        for n in sizes:
+            if n > cap:
+                break
+            state = setup(n)
+            seconds = _time(run, state, repeat)
+            rows = FIXED_ROWS.get(name, n)
+            point = {
+                'rows': rows,
+                'seconds': round(seconds, 6),
+                'rows_per_second': round(rows / seconds, 1) if seconds > 0 else None,
+            }
+            if measure_memory:
+                point['peak_memory_bytes'] = _peak_memory(run, state)
+            points.append(point)
+            print(f"  {name:38s} {rows:>10,} rows  {seconds:9.4f} s", flush=True)
+            if name in FIXED_ROWS:
+                break
+        report['cases'][name] = {'points': points, 'scaling_slope': _scaling_slope(points)}
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--max-rows', type=int, default=10 ** 6,
+                        help='largest size to run (default 1e6; 1e7 needs several GB of RAM)')
+    parser.add_argument('--case', action='append', choices=sorted(CASES),
+                        help='run only this case (repeatable)')
+    parser.add_argument('--repeat', type=int, default=3, help='timing repeats; best is reported')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--output', default='bench_output.json', help='JSON report path')
+    parser.add_argument('--check', action='store_true',
+                        help='only check that the analyzer code paths give identical results')
+    args = parser.parse_args()
+
+    if args.check:
+        mismatches = check_parity()
+        for name, count in mismatches.items():
+            print(f"  {name:38s} {'✅ identical' if count == 0 else f'❌ {count} differing values'}")
+        sys.exit(1 if any(mismatches.values()) else 0)
+
+    print("=" * 80)
+    print("ERW PIPELINE BENCHMARKS")
+    print("=" * 80)
+    report = run_benchmarks(max_rows=args.max_rows, cases=args.case,
+                            repeat=args.repeat, measure_memory=not args.no_memory)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print()
+    print(f"📁 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,5 +7,12 @@ def azores_basalt_mass(area_km2=740, depth_m=10, density_kgm3=2900):
     mass_Mt = mass_kg / 1e9
     return mass_Mt
 
+def azores_basalt_mass_raster(mask, depth_m=10, density_kgm3=2900, cell_size_m=10.0, **kwargs):
+    # Same estimate on a grid: mask is 1 on land (NaN/0 elsewhere), depth and
+    # density may be per-cell layers; processed tile by tile (see basalt_raster)
+    from basalt_raster import raster_basalt_resource
+    result = raster_basalt_resource(mask, depth_m, density_kgm3, 1.0, cell_size_m=cell_size_m, **kwargs)
+    return result['in_situ_resource_t'] / 1e6  # unrounded, like azores_basalt_mass
+
 if __name__ == "__main__":
     print("Estimated Basalt Mass in azores (Mt):", azores_basalt_mass())
\ No newline at end of file
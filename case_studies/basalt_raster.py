@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Raster Basalt Resource Assessment
+São Miguel Island (Azores) - tiled, memory-mapped grids
+
+Gridded version of sao_miguel_basalt_resource / azores_basalt_mass:
+coverage, extractable depth, density and recovery can each be a raster
+(any array, typically an np.memmap or an .npy opened with mmap_mode='r')
+or a constant. Cells are processed tile by tile, so only one tile of each
+layer is in memory at a time; per-cell results can be streamed to
+memory-mapped .npy layers and totals are accumulated per zone.
+
+Cells whose coverage is NaN are outside the island (nodata). A NaN in
+depth, density or recovery at a covered cell (e.g. a hole in a
+DEM-derived depth layer) makes that cell nodata too: it adds nothing to
+the totals or areas, and such cells are counted in 'missing_data_cells'
+rather than turning the totals into NaN.
+"""
+
+import os
+import tempfile
+from typing import Dict, Iterator, Optional, Tuple, Union
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+Layer = Union[float, np.ndarray]
+
+CO2_EFFICIENCY_T_PER_T = 0.30  # tCO2 per tonne basalt (as in sao_miguel_basalt_resource)
+DEFAULT_TILE = (1024, 4096)
+OUTPUT_LAYERS = ('in_situ_t', 'accessible_t', 'cdr_tco2')
+
+
+def open_layer(path: str) -> np.ndarray:
+    """Open an .npy raster read-only without loading it."""
+    return np.load(path, mmap_mode='r')
+
+
+def create_layer(path: str, shape: Tuple[int, int], dtype=np.float32, fill: float = None) -> np.memmap:
+    """Create an .npy raster on disk (writable memmap), optionally filled."""
+    layer = open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+    if fill is not None:
+        for tile in iter_tiles(shape):
+            layer[tile] = fill
+    return layer
+
+
+def iter_tiles(shape: Tuple[int, int], tile: Tuple[int, int] = DEFAULT_TILE) -> Iterator[Tuple[slice, slice]]:
+    """Row-major (row slice, column slice) tiles covering a 2-D grid."""
+    rows, cols = shape
+    for r in range(0, rows, tile[0]):
+        for c in range(0, cols, tile[1]):
+            yield slice(r, min(r + tile[0], rows)), slice(c, min(c + tile[1], cols))
+
+
+def _read(layer: Layer, tile) -> Union[float, np.ndarray]:
+    if np.ndim(layer) == 0:
+        return float(layer)
+    return np.asarray(layer[tile], dtype=np.float64)
+
+
+def raster_basalt_resource(coverage: Layer,
+                           depth_m: Layer = 5,
+                           density_kgm3: Layer = 2875,
+                           recovery_factor: Layer = 0.50,
+                           cell_size_m: float = 10.0,
+                           zones: Optional[np.ndarray] = None,
+                           shape: Optional[Tuple[int, int]] = None,
+                           co2_efficiency: float = CO2_EFFICIENCY_T_PER_T,
+                           tile: Tuple[int, int] = DEFAULT_TILE,
+                           output_dir: Optional[str] = None) -> Dict:
+    """
+    In-situ mass, accessible mass and CDR potential per cell and per zone.
+
+    Parameters:
+    -----------
+    coverage : array or float
+        Fraction of each cell covered by accessible basalt (NaN = nodata)
+    depth_m, density_kgm3, recovery_factor : array or float
+        Extraction depth, bulk density and recoverable fraction (NaN =
+        nodata for that cell)
+    cell_size_m : float
+        Grid resolution (square cells)
+    zones : int array
+        Optional zone ID per cell (e.g. parish); negative IDs are ignored
+    shape : (rows, cols)
+        Grid shape when every layer is a constant
+    tile : (rows, cols)
+        Tile size; memory use is a few arrays of this size
+    output_dir : str
+        If set, per-cell tonnes are written to memory-mapped .npy layers
+        (in_situ_t, accessible_t, cdr_tco2) in this directory
+
+    Returns:
+    --------
+    dict : Island totals with the keys of sao_miguel_basalt_resource
+           (minus the extraction scenarios) plus unrounded
+           'in_situ_resource_t', 'missing_data_cells' (covered cells
+           dropped for NaN depth, density or recovery), 'zones' (zone ID
+           -> totals) and 'layers' (output name -> path) when written
+    """
+    layers = [coverage, depth_m, density_kgm3, recovery_factor, zones]
+    shapes = {np.shape(layer) for layer in layers if layer is not None and np.ndim(layer) == 2}
+    if shape is None:
+        if not shapes:
+            raise ValueError("At least one layer must be a 2-D raster (or pass shape=)")
+        shape = shapes.pop()
+    if shapes - {tuple(shape)}:
+        raise ValueError(f"Raster layers have different shapes: {shapes | {tuple(shape)}}")
+
+    cell_area_m2 = cell_size_m ** 2
+    outputs = {}
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        outputs = {name: create_layer(os.path.join(output_dir, f"{name}.npy"), shape)
+                   for name in OUTPUT_LAYERS}
+
+    totals = np.zeros(5)  # island cells, basalt m², in-situ t, accessible t, CDR t
+    zone_totals = np.zeros((0, 5))
+    missing_data_cells = 0
+
+    for t in iter_tiles(shape, tile):
+        cover = _read(coverage, t)
+        cover = np.broadcast_to(cover, (t[0].stop - t[0].start, t[1].stop - t[1].start))
+        depth, density, recovery = (_read(layer, t) for layer in (depth_m, density_kgm3, recovery_factor))
+        valid = ~np.isnan(cover)
+        covered = valid.copy()
+        for values in (depth, density, recovery):
+            valid &= ~np.isnan(values)
+        missing_data_cells += int(np.count_nonzero(covered & ~valid))
+        cover = np.where(valid, cover, 0.0)
+        depth, density, recovery = (np.where(valid, values, 0.0) for values in (depth, density, recovery))
+
+        in_situ_t = cell_area_m2 * cover * depth * density / 1000
+        accessible_t = in_situ_t * recovery
+        cdr_t = accessible_t * co2_efficiency
+
+        for name, values in zip(OUTPUT_LAYERS, (in_situ_t, accessible_t, cdr_t)):
+            if name in outputs:
+                outputs[name][t] = np.where(valid, values, np.nan)
+
+        stack = (valid, cover * cell_area_m2, in_situ_t, accessible_t, cdr_t)
+        totals += [float(np.sum(v)) for v in stack]
+
+        if zones is not None:
+            zone = np.asarray(zones[t])
+            keep = valid & (zone >= 0)
+            ids = zone[keep].astype(np.intp)
+            if ids.size:
+                n_zones = max(len(zone_totals), int(ids.max()) + 1)
+                if n_zones > len(zone_totals):
+                    zone_totals = np.vstack([zone_totals, np.zeros((n_zones - len(zone_totals), 5))])
+                for k, values in enumerate(stack):
+                    zone_totals[:, k] += np.bincount(ids, weights=np.broadcast_to(values, keep.shape)[keep],
+                                                     minlength=n_zones)
+
+    for layer in outputs.values():
+        layer.flush()
+
+    def summary(row):
+        cells, basalt_m2, in_situ, accessible, cdr = row
+        return {
+            'island_area_km2': cells * cell_area_m2 / 1e6,
+            'basalt_area_km2': basalt_m2 / 1e6,
+            'in_situ_resource_Mt': round(in_situ / 1e6, 1),
+            'in_situ_resource_t': in_situ,
+            'accessible_resource_Mt': round(accessible / 1e6, 1),
+            'accessible_resource_t': accessible,
+            'total_cdr_potential_MtCO2': round(cdr / 1e6, 2),
+        }
+
+    result = summary(totals)
+    result['missing_data_cells'] = missing_data_cells
+    result['cell_size_m'] = cell_size_m
+    result['shape'] = tuple(shape)
+    if zones is not None:
+        result['zones'] = {z: summary(row) for z, row in enumerate(zone_totals) if row[0] > 0}
+    if outputs:
+        result['layers'] = {name: layer.filename for name, layer in outputs.items()}
+    return result
+
+
+def synthetic_island(directory: str, rows: int = 1460, cols: int = 6500, seed: int = 0) -> Dict[str, str]:
+    """
+    Elliptical test island (~15 km × 65 km at 10 m, close to São Miguel's 744 km²)
+    with coverage, depth and zone layers written as .npy files.
+    """
+    rng = np.random.default_rng(seed)
+    paths = {name: os.path.join(directory, f"{name}.npy") for name in ('coverage', 'depth_m', 'zones')}
+    coverage = create_layer(paths['coverage'], (rows, cols))
+    depth = create_layer(paths['depth_m'], (rows, cols))
+    zones = create_layer(paths['zones'], (rows, cols), dtype=np.int16)
+    for t in iter_tiles((rows, cols)):
+        r, c = np.ogrid[t[0], t[1]]
+        inside = ((r - rows / 2) / (rows / 2)) ** 2 + ((c - cols / 2) / (cols / 2)) ** 2 <= 1
+        shape = inside.shape
+        coverage[t] = np.where(inside, np.clip(rng.normal(0.70, 0.15, shape), 0, 1), np.nan)
+        depth[t] = np.clip(rng.normal(5.0, 1.0, shape), 0, None)
+        zones[t] = np.where(inside, np.broadcast_to(c * 6 // cols, shape), -1)  # six municipalities, west-east
+    for layer in (coverage, depth, zones):
+        layer.flush()
+    return paths
+
+
+def main():
+    """Synthetic 10 m São Miguel grid processed from memory-mapped layers."""
+    print("=" * 80)
+    print("RASTER BASALT RESOURCE (synthetic 10 m São Miguel grid)")
+    print("=" * 80)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = synthetic_island(tmp)
+        result = raster_basalt_resource(open_layer(paths['coverage']), open_layer(paths['depth_m']),
+                                        zones=open_layer(paths['zones']), cell_size_m=10.0,
+                                        output_dir=os.path.join(tmp, 'out'))
+        print(f"  Grid: {result['shape'][0]:,} × {result['shape'][1]:,} cells at {result['cell_size_m']:.0f} m")
+        print(f"  Island area: {result['island_area_km2']:.0f} km²   Basalt area: {result['basalt_area_km2']:.0f} km²")
+        print(f"  In-situ: {result['in_situ_resource_Mt']:,.1f} Mt   Accessible: {result['accessible_resource_Mt']:,.1f} Mt"
+              f"   CDR: {result['total_cdr_potential_MtCO2']:.2f} MtCO₂")
+        print()
+        for zone, z in result['zones'].items():
+            print(f"  Zone {zone}: {z['basalt_area_km2']:6.1f} km²  {z['accessible_resource_Mt']:8,.1f} Mt  "
+                  f"{z['total_cdr_potential_MtCO2']:7.2f} MtCO₂")
+    print()
+
+
+if __name__ == "__main__":
+    main()
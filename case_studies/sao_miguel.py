@@ -4,6 +4,28 @@ São Miguel Island (Azores) - ERW Resource Assessment
 Case study for island-scale carbon dioxide removal
 """
 
+from basalt_raster import raster_basalt_resource
+
+# Annual extraction scenarios (t basalt/yr)
+EXTRACTION_SCENARIOS = {
+    'conservative': 50000,   # 50,000 t/yr
+    'moderate': 75000,       # 75,000 t/yr
+    'aggressive': 100000     # 100,000 t/yr
+}
+
+
+def extraction_scenarios(accessible_mass_Mt, co2_efficiency=0.30):
+    """Annual CDR (MtCO2/yr) and depletion years for each extraction scenario."""
+    annual_cdr = {}
+    depletion_years = {}
+    
+    for scenario, extraction_t_yr in EXTRACTION_SCENARIOS.items():
+        annual_cdr[scenario] = (extraction_t_yr * co2_efficiency) / 1000  # MtCO2/yr
+        depletion_years[scenario] = (accessible_mass_Mt * 1e6) / extraction_t_yr
+    
+    return annual_cdr, depletion_years
+
+
 def sao_miguel_basalt_resource(area_km2=744, basalt_coverage=0.70, 
                                  depth_m=5, density_kgm3=2875, 
                                  recovery_factor=0.50):
@@ -46,18 +68,7 @@ def sao_miguel_basalt_resource(area_km2=744, basalt_coverage=0.70,
     total_cdr_MtCO2 = accessible_mass_Mt * co2_efficiency
     
     # Annual extraction scenarios
-    scenarios = {
-        'conservative': 50000,   # 50,000 t/yr
-        'moderate': 75000,       # 75,000 t/yr
-        'aggressive': 100000     # 100,000 t/yr
-    }
-    
-    annual_cdr = {}
-    depletion_years = {}
-    
-    for scenario, extraction_t_yr in scenarios.items():
-        annual_cdr[scenario] = (extraction_t_yr * co2_efficiency) / 1000  # MtCO2/yr
-        depletion_years[scenario] = (accessible_mass_Mt * 1e6) / extraction_t_yr
+    annual_cdr, depletion_years = extraction_scenarios(accessible_mass_Mt, co2_efficiency)
     
     return {
         'island_area_km2': area_km2,
@@ -71,6 +82,45 @@ def sao_miguel_basalt_resource(area_km2=744, basalt_coverage=0.70,
     }
 
 
+def sao_miguel_basalt_resource_raster(coverage, depth_m=5, density_kgm3=2875,
+                                      recovery_factor=0.50, cell_size_m=10.0,
+                                      zones=None, **kwargs):
+    """
+    Raster version of sao_miguel_basalt_resource.
+    
+    Parameters:
+    -----------
+    coverage : array
+        Basalt coverage fraction per cell (NaN outside the island); use
+        basalt_raster.open_layer to memory-map an .npy grid
+    depth_m, density_kgm3, recovery_factor : array or float
+        Per-cell layers or island-wide constants (NaN cells are nodata,
+        counted in 'missing_data_cells')
+    cell_size_m : float
+        Grid resolution (10 m for the island DEM grid)
+    zones : int array
+        Optional zone ID per cell for per-zone totals
+    **kwargs
+        Passed to basalt_raster.raster_basalt_resource (tile, output_dir)
+    
+    Returns:
+    --------
+    dict : Same keys as sao_miguel_basalt_resource plus 'zones' (and
+           'layers' when output_dir is given)
+    """
+    
+    result = raster_basalt_resource(coverage, depth_m, density_kgm3, recovery_factor,
+                                    cell_size_m=cell_size_m, zones=zones, **kwargs)
+    
+    # Extraction depth is only a single number when it is a constant
+    result['extraction_depth_m'] = depth_m if isinstance(depth_m, (int, float)) else None
+    annual_cdr, depletion_years = extraction_scenarios(result['accessible_resource_t'] / 1e6)
+    result['annual_cdr_scenarios_MtCO2_yr'] = annual_cdr
+    result['resource_depletion_years'] = depletion_years
+    
+    return result
+
+
 def sao_miguel_emissions_context():
     """
     Calculate São Miguel's emissions context for CDR assessment.
@@ -164,11 +214,7 @@ def main():
     print("─" * 80)
     
     for scenario, cdr_Mt in resource_results['annual_cdr_scenarios_MtCO2_yr'].items():
-        extraction_t = {
-            'conservative': 50000,
-            'moderate': 75000,
-            'aggressive': 100000
-        }[scenario]
+        extraction_t = EXTRACTION_SCENARIOS[scenario]
         
         depletion_yrs = resource_results['resource_depletion_years'][scenario]
         cdr_tCO2 = cdr_Mt * 1000
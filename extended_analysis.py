@@ -6,11 +6,16 @@ São Miguel Island Enhanced Rock Weathering Study
 This module provides rigorous CO₂ accounting and uncertainty quantification.
 """
 
+import os
+
 import numpy as np
 import pandas as pd
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from typing import Dict, List, Tuple
 
+import run_metrics
+from result_cache import ResultCache, code_fingerprint
+
 
 @dataclass
 class ERWScenario:
@@ -140,6 +145,312 @@ def calculate_co2_mass_balance(scenario: ERWScenario,
     }
 
 
+# Memo for cached_co2_mass_balance; set ERW_CACHE_DIR to persist across runs
+MASS_BALANCE_CACHE = ResultCache(maxsize=4096, directory=os.environ.get('ERW_CACHE_DIR'))
+# ERWScenario fields in the cache key (the name is not a model input)
+SCENARIO_KEY_FIELDS = tuple(f.name for f in fields(ERWScenario) if f.name != 'name')
+
+
+def cached_co2_mass_balance(scenario: ERWScenario,
+                            years: int = 10,
+                            plot_area_ha: float = 2.0,
+                            cache: ResultCache = None) -> Dict:
+    """
+    Memoized calculate_co2_mass_balance.
+    
+    The key covers every numeric scenario field, years, plot area and the
+    bytecode of calculate_co2_mass_balance (hashed once, until the
+    function changes), so editing the model invalidates old entries. The
+    scenario name is not part of the key: identically parameterised
+    scenarios share one entry.
+    """
+    cache = MASS_BALANCE_CACHE if cache is None else cache
+    key = ('calculate_co2_mass_balance', code_fingerprint(calculate_co2_mass_balance),
+           tuple([getattr(scenario, f) for f in SCENARIO_KEY_FIELDS]), years, plot_area_ha)
+    result = cache.get_or_compute(key, lambda: calculate_co2_mass_balance(scenario, years, plot_area_ha))
+    result['scenario'] = scenario.name
+    return result
+
+
+@dataclass
+class ScenarioBatch:
+    """
+    Struct-of-arrays form of ERWScenario: one NumPy array per field.
+    
+    Numeric fields are broadcast against each other, so a batch can mix
+    per-scenario arrays with scalars (or open-grid axes, see
+    sensitivity_grid). `name` is optional and only kept for reporting.
+    """
+    application_rate_t_ha: np.ndarray
+    weathering_efficiency: np.ndarray
+    annual_rainfall_mm: np.ndarray
+    basalt_mgo_percent: np.ndarray = 8.0
+    basalt_cao_percent: np.ndarray = 10.0
+    grinding_emissions_kg_co2_per_t: np.ndarray = 50.0
+    transport_emissions_kg_co2_per_t: np.ndarray = 10.0
+    name: np.ndarray = None
+    
+    def __post_init__(self):
+        arrays = np.broadcast_arrays(*[np.asarray(getattr(self, f), dtype=float)
+                                       for f in self.numeric_fields()])
+        for f, arr in zip(self.numeric_fields(), arrays):
+            setattr(self, f, arr)
+        if self.name is not None:
+            self.name = np.asarray(self.name, dtype=object)
+    
+    @staticmethod
+    def numeric_fields() -> List[str]:
+        """Names of the ERWScenario fields held as float arrays."""
+        return [f.name for f in fields(ERWScenario) if f.name != 'name']
+    
+    @classmethod
+    def from_scenarios(cls, scenarios: List[ERWScenario]) -> 'ScenarioBatch':
+        """Pack a list of ERWScenario objects into a batch."""
+        columns = {f: [getattr(s, f) for s in scenarios] for f in cls.numeric_fields()}
+        return cls(name=[s.name for s in scenarios], **columns)
+    
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.application_rate_t_ha.shape
+    
+    def __len__(self) -> int:
+        return self.application_rate_t_ha.size
+    
+    def scenario(self, index) -> ERWScenario:
+        """Materialise a single ERWScenario (for reporting / debugging)."""
+        name = self.name[index] if self.name is not None else f"Scenario {index}"
+        return ERWScenario(name=name, **{f: float(getattr(self, f)[index])
+                                         for f in self.numeric_fields()})
+
+
+# Decimal places used by calculate_co2_mass_balance for each output key
+MASS_BALANCE_DECIMALS = {
+    'gross_co2_kg_ha_yr': 1,
+    'gross_co2_t_ha_yr': 2,
+    'gross_co2_t_ha_total': 1,
+    'grinding_emissions_kg_ha_yr': 1,
+    'transport_emissions_kg_ha_yr': 1,
+    'total_upstream_kg_ha_yr': 1,
+    'total_upstream_t_ha_yr': 2,
+    'secondary_loss_t_ha_yr': 2,
+    'net_co2_t_ha_yr': 2,
+    'net_co2_t_ha_total': 1,
+    'net_co2_t_total': 1,
+    'upstream_pct_of_gross': 1,
+}
+
+
+def calculate_co2_mass_balance_batch(batch: ScenarioBatch,
+                                     years=10,
+                                     plot_area_ha=2.0,
+                                     round_output: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Vectorized CO₂ mass balance over a ScenarioBatch.
+    
+    Same model and arithmetic as calculate_co2_mass_balance, evaluated for
+    every scenario in one pass. `years` and `plot_area_ha` may be scalars
+    or arrays broadcastable against the batch.
+    
+    Parameters:
+    -----------
+    batch : ScenarioBatch
+        Application parameters, one element per scenario
+    years : int or array
+        Time horizon (default 10 years)
+    plot_area_ha : float or array
+        Plot size in hectares
+    round_output : bool
+        Apply the presentation rounding of calculate_co2_mass_balance
+        (see round_mass_balance). Off by default.
+    
+    Returns:
+    --------
+    dict : Float arrays keyed like calculate_co2_mass_balance
+    """
+    years = np.asarray(years, dtype=float)
+    plot_area_ha = np.asarray(plot_area_ha, dtype=float)
+    
+    # Gross CO₂ from weathering (stoichiometry as in the scalar path)
+    basalt_weathered_kg_ha_total = batch.application_rate_t_ha * 1000 * batch.weathering_efficiency / years
+    
+    mgo_weathered_kg_ha_yr = basalt_weathered_kg_ha_total * (batch.basalt_mgo_percent / 100)
+    cao_weathered_kg_ha_yr = basalt_weathered_kg_ha_total * (batch.basalt_cao_percent / 100)
+    
+    co2_from_mg_kg_ha_yr = mgo_weathered_kg_ha_yr * (44/40)
+    co2_from_ca_kg_ha_yr = cao_weathered_kg_ha_yr * (44/56)
+    
+    rainfall_factor = batch.annual_rainfall_mm / 1750.0
+    
+    gross_co2_kg_ha_yr = (co2_from_mg_kg_ha_yr + co2_from_ca_kg_ha_yr) * rainfall_factor
+    gross_co2_t_ha_yr = gross_co2_kg_ha_yr / 1000
+    
+    # Upstream emissions
+    annual_basalt_kg_ha = batch.application_rate_t_ha * 1000 / years
+    grinding_emissions_kg_ha_yr = annual_basalt_kg_ha * (batch.grinding_emissions_kg_co2_per_t / 1000)
+    transport_emissions_kg_ha_yr = annual_basalt_kg_ha * (batch.transport_emissions_kg_co2_per_t / 1000)
+    
+    total_upstream_kg_ha_yr = grinding_emissions_kg_ha_yr + transport_emissions_kg_ha_yr
+    total_upstream_t_ha_yr = total_upstream_kg_ha_yr / 1000
+    
+    # Secondary carbonate loss (0%, conservative)
+    secondary_carbonate_loss_t_ha_yr = np.zeros_like(gross_co2_t_ha_yr)
+    
+    # Net CO₂ removal
+    net_co2_t_ha_yr = gross_co2_t_ha_yr - total_upstream_t_ha_yr - secondary_carbonate_loss_t_ha_yr
+    
+    positive = gross_co2_t_ha_yr > 0
+    upstream_pct_of_gross = np.divide(total_upstream_t_ha_yr, gross_co2_t_ha_yr,
+                                      out=np.zeros(np.broadcast(total_upstream_t_ha_yr, gross_co2_t_ha_yr).shape),
+                                      where=positive) * 100
+    
+    result = {
+        'gross_co2_kg_ha_yr': gross_co2_kg_ha_yr,
+        'gross_co2_t_ha_yr': gross_co2_t_ha_yr,
+        'gross_co2_t_ha_total': gross_co2_t_ha_yr * years,
+        'grinding_emissions_kg_ha_yr': grinding_emissions_kg_ha_yr,
+        'transport_emissions_kg_ha_yr': transport_emissions_kg_ha_yr,
+        'total_upstream_kg_ha_yr': total_upstream_kg_ha_yr,
+        'total_upstream_t_ha_yr': total_upstream_t_ha_yr,
+        'secondary_loss_t_ha_yr': secondary_carbonate_loss_t_ha_yr,
+        'net_co2_t_ha_yr': net_co2_t_ha_yr,
+        'net_co2_t_ha_total': net_co2_t_ha_yr * years,
+        'net_co2_t_total': net_co2_t_ha_yr * years * plot_area_ha,
+        'upstream_pct_of_gross': upstream_pct_of_gross,
+    }
+    
+    return round_mass_balance(result) if round_output else result
+
+
+def round_mass_balance(result: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Apply the presentation rounding of calculate_co2_mass_balance to batch output.
+    
+    Uses np.round (round-half-even on the scaled value), which can differ
+    from Python's round() in the last digit for values sitting exactly on
+    a half; round individual values with round() when that matters.
+    """
+    return {key: np.round(value, MASS_BALANCE_DECIMALS[key]) if key in MASS_BALANCE_DECIMALS else value
+            for key, value in result.items()}
+
+
+# Axes accepted by sensitivity_grid in addition to the ERWScenario fields
+GRID_EXTRA_AXES = ('years', 'plot_area_ha')
+
+
+@dataclass
+class SensitivityGrid:
+    """
+    Labelled N-D result of sensitivity_grid.
+    
+    dims   : axis names in array order
+    coords : axis name -> 1-D array of axis values
+    data   : output name -> N-D array of shape (len(coords[d]) for d in dims)
+    """
+    dims: Tuple[str, ...]
+    coords: Dict[str, np.ndarray]
+    data: Dict[str, np.ndarray]
+    
+    def __getitem__(self, output: str) -> np.ndarray:
+        return self.data[output]
+    
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return tuple(len(self.coords[d]) for d in self.dims)
+    
+    def _index(self, dim: str, value) -> int:
+        matches = np.flatnonzero(np.isclose(self.coords[dim], value))
+        if len(matches) == 0:
+            raise KeyError(f"{value!r} is not a coordinate of axis '{dim}'")
+        return int(matches[0])
+    
+    def sel(self, **selection) -> 'SensitivityGrid':
+        """Fix one or more axes at a coordinate value, dropping those axes."""
+        index = tuple(self._index(d, selection[d]) if d in selection else slice(None)
+                      for d in self.dims)
+        dims = tuple(d for d in self.dims if d not in selection)
+        return SensitivityGrid(dims=dims,
+                               coords={d: self.coords[d] for d in dims},
+                               data={k: v[index] for k, v in self.data.items()})
+    
+    def reduce(self, dim: str, func=np.mean) -> 'SensitivityGrid':
+        """Collapse an axis with a NumPy reduction (func(array, axis=...))."""
+        axis = self.dims.index(dim)
+        dims = tuple(d for d in self.dims if d != dim)
+        return SensitivityGrid(dims=dims,
+                               coords={d: self.coords[d] for d in dims},
+                               data={k: func(v, axis=axis) for k, v in self.data.items()})
+    
+    def to_dataframe(self, outputs: List[str] = None) -> pd.DataFrame:
+        """Long-format export: one row per grid point, axes first (C order)."""
+        outputs = list(self.data) if outputs is None else outputs
+        mesh = np.meshgrid(*[self.coords[d] for d in self.dims], indexing='ij')
+        columns = {d: m.ravel() for d, m in zip(self.dims, mesh)}
+        columns.update({k: self.data[k].ravel() for k in outputs})
+        return pd.DataFrame(columns)
+
+
+def sensitivity_grid(base_scenario: ERWScenario,
+                     axes: Dict[str, List[float]],
+                     years: int = 10,
+                     plot_area_ha: float = 2.0,
+                     outputs: List[str] = None,
+                     round_output: bool = False) -> SensitivityGrid:
+    """
+    Evaluate the CO₂ mass balance over the Cartesian product of named axes.
+    
+    Each axis is broadcast along its own dimension (open grid), so no
+    per-point scenario objects or N-D input copies are created; only the
+    requested output arrays are materialised at full grid size.
+    
+    Parameters:
+    -----------
+    base_scenario : ERWScenario
+        Values for every field that is not an axis
+    axes : dict
+        Axis name -> values. Names are ERWScenario numeric fields,
+        'years' or 'plot_area_ha'. Dict order sets the array axis order.
+    years, plot_area_ha : float
+        Used when not given as an axis
+    outputs : list of str
+        Mass-balance keys to keep (default: all)
+    round_output : bool
+        Apply presentation rounding (see round_mass_balance)
+    
+    Returns:
+    --------
+    SensitivityGrid
+    """
+    valid = set(ScenarioBatch.numeric_fields()) | set(GRID_EXTRA_AXES)
+    unknown = set(axes) - valid
+    if unknown:
+        raise ValueError(f"Unknown sensitivity axes: {sorted(unknown)}")
+    
+    dims = tuple(axes)
+    coords = {d: np.asarray(axes[d]) for d in dims}
+    
+    def open_axis(name, default):
+        if name not in coords:
+            return default
+        shape = [1] * len(dims)
+        shape[dims.index(name)] = -1
+        return coords[name].astype(float).reshape(shape)
+    
+    batch = ScenarioBatch(**{f: open_axis(f, getattr(base_scenario, f))
+                             for f in ScenarioBatch.numeric_fields()})
+    shape = tuple(len(coords[d]) for d in dims)
+    with run_metrics.span('sensitivity_grid'):
+        balance = calculate_co2_mass_balance_batch(batch,
+                                                   years=open_axis('years', years),
+                                                   plot_area_ha=open_axis('plot_area_ha', plot_area_ha),
+                                                   round_output=round_output)
+    run_metrics.count('sensitivity_grid_points', int(np.prod(shape)))
+    
+    outputs = list(balance) if outputs is None else outputs
+    data = {k: np.broadcast_to(balance[k], shape) for k in outputs}
+    
+    return SensitivityGrid(dims=dims, coords=coords, data=data)
+
+
 def sensitivity_analysis(base_scenario: ERWScenario,
                         plot_area_ha: float = 2.0) -> pd.DataFrame:
     """
@@ -148,6 +459,9 @@ def sensitivity_analysis(base_scenario: ERWScenario,
     - Annual rainfall (1500-2000 mm)
     - Application rate (2.7-50 t/ha)
     
+    Fields not varied are taken from base_scenario. For other axes or
+    finer grids use sensitivity_grid directly.
+    
     Returns DataFrame with CO₂ removal results.
     """
     
@@ -155,29 +469,24 @@ def sensitivity_analysis(base_scenario: ERWScenario,
     rainfalls = [1500, 1650, 1750, 1850, 2000]
     application_rates = [2.7, 5.0, 10.0, 25.0, 50.0]
     
-    results = []
-    
-    for eff in efficiencies:
-        for rain in rainfalls:
-            for rate in application_rates:
-                scenario = ERWScenario(
-                    name=f"Eff={eff*100:.0f}%_Rain={rain}mm_Rate={rate}t/ha",
-                    application_rate_t_ha=rate,
-                    weathering_efficiency=eff,
-                    annual_rainfall_mm=rain
-                )
-                
-                balance = calculate_co2_mass_balance(scenario, plot_area_ha=plot_area_ha)
-                
-                results.append({
-                    'Efficiency (%)': eff * 100,
-                    'Rainfall (mm)': rain,
-                    'Application Rate (t/ha)': rate,
-                    'Net CO₂ (t/ha/yr)': balance['net_co2_t_ha_yr'],
-                    'Net CO₂ (t/ha/10yr)': balance['net_co2_t_ha_total'],
-                })
-    
-    return pd.DataFrame(results)
+    grid = sensitivity_grid(base_scenario,
+                            axes={'weathering_efficiency': efficiencies,
+                                  'annual_rainfall_mm': rainfalls,
+                                  'application_rate_t_ha': application_rates},
+                            plot_area_ha=plot_area_ha,
+                            outputs=['net_co2_t_ha_yr', 'net_co2_t_ha_total'],
+                            round_output=True)
+    
+    df = grid.to_dataframe()
+    df['weathering_efficiency'] = df['weathering_efficiency'] * 100
+    
+    return df.rename(columns={
+        'weathering_efficiency': 'Efficiency (%)',
+        'annual_rainfall_mm': 'Rainfall (mm)',
+        'application_rate_t_ha': 'Application Rate (t/ha)',
+        'net_co2_t_ha_yr': 'Net CO₂ (t/ha/yr)',
+        'net_co2_t_ha_total': 'Net CO₂ (t/ha/10yr)',
+    })
 
 
 def generate_sensitivity_matrix(application_rate: float = 2.7) -> pd.DataFrame:
@@ -189,19 +498,19 @@ def generate_sensitivity_matrix(application_rate: float = 2.7) -> pd.DataFrame:
     efficiencies = [0.20, 0.35, 0.45, 0.60]
     rainfalls = [1500, 1650, 1750, 1850, 2000]
     
-    data = []
-    for rain in rainfalls:
-        row = {'Rainfall (mm)': rain}
-        for eff in efficiencies:
-            scenario = ERWScenario(
-                name=f"Test",
-                application_rate_t_ha=application_rate,
-                weathering_efficiency=eff,
-                annual_rainfall_mm=rain
-            )
-            balance = calculate_co2_mass_balance(scenario)
-            row[f'ε={eff*100:.0f}%'] = balance['net_co2_t_ha_yr']
-        data.append(row)
+    base = ERWScenario(name="Test",
+                       application_rate_t_ha=application_rate,
+                       weathering_efficiency=0.45,
+                       annual_rainfall_mm=1750)
+    grid = sensitivity_grid(base,
+                            axes={'annual_rainfall_mm': rainfalls,
+                                  'weathering_efficiency': efficiencies},
+                            outputs=['net_co2_t_ha_yr'],
+                            round_output=True)
+    
+    data = {'Rainfall (mm)': rainfalls}
+    for j, eff in enumerate(efficiencies):
+        data[f'ε={eff*100:.0f}%'] = grid['net_co2_t_ha_yr'][:, j]
     
     return pd.DataFrame(data)
 
@@ -334,6 +643,11 @@ def mrv_framework() -> Dict:
 def main():
     """Run complete extended analysis."""
     
+    # Opt-in instrumentation: ERW_METRICS=run_metrics.json (or .prom)
+    metrics_path = os.environ.get('ERW_METRICS')
+    if metrics_path:
+        run_metrics.enable()
+    
     print("=" * 90)
     print("EXTENDED ANALYSIS: CO₂ MASS BALANCE, SENSITIVITY, & MRV FRAMEWORK")
     print("São Miguel Island Enhanced Rock Weathering Study")
@@ -354,7 +668,8 @@ def main():
         annual_rainfall_mm=1750
     )
     
-    base_balance = calculate_co2_mass_balance(lime_replacement, plot_area_ha=2.0)
+    with run_metrics.span('base_case'):
+        base_balance = cached_co2_mass_balance(lime_replacement, plot_area_ha=2.0)
     
     print(f"Scenario:               {base_balance['scenario']}")
     print(f"Application rate:       {base_balance['application_rate_t_ha']} t/ha/yr")
@@ -395,7 +710,8 @@ def main():
     print("📉 2. UNCERTAINTY ANALYSIS: 95% CONFIDENCE INTERVAL")
     print("─" * 90)
     
-    uncertainty = uncertainty_analysis(base_balance)
+    with run_metrics.span('uncertainty'):
+        uncertainty = uncertainty_analysis(base_balance)
     
     print(f"Central estimate:        {uncertainty['central_estimate_t_ha_yr']} t CO₂/ha/yr")
     print(f"Total uncertainty:       ±{uncertainty['total_uncertainty_fraction']*100:.0f}%")
@@ -429,7 +745,8 @@ def main():
     print("Lime replacement scenario (2.7 t/ha/yr basalt application)")
     print("─" * 90)
     
-    matrix = generate_sensitivity_matrix(application_rate=2.7)
+    with run_metrics.span('sensitivity_matrix'):
+        matrix = generate_sensitivity_matrix(application_rate=2.7)
     
     print()
     print(matrix.to_string(index=False, float_format=lambda x: f'{x:.2f}'))
@@ -458,7 +775,8 @@ def main():
     
     scenario_results = []
     for scenario in scenarios:
-        balance = calculate_co2_mass_balance(scenario, years=10, plot_area_ha=2.0)
+        with run_metrics.span('scenario_comparison'):
+            balance = cached_co2_mass_balance(scenario, years=10, plot_area_ha=2.0)
         scenario_results.append({
             'Scenario': scenario.name,
             'Rate (t/ha)': scenario.application_rate_t_ha,
@@ -479,7 +797,8 @@ def main():
     print("✅ 5. MRV FRAMEWORK: MEASURABLE vs MODELED vs UNCERTAIN")
     print("─" * 90)
     
-    mrv = mrv_framework()
+    with run_metrics.span('mrv_framework'):
+        mrv = mrv_framework()
     
     print()
     print("🔬 MEASURABLE (Direct Field & Lab Measurements):")
@@ -531,6 +850,10 @@ def main():
     print("• Global Change Biology (Implications for CDR)")
     print("• Carbon Management (Economic feasibility + market analysis)")
     print()
+    
+    if metrics_path:
+        run_metrics.disable().write(metrics_path)
+        print(f"📁 Run metrics written to {metrics_path}")
 
 
 if __name__ == "__main__":
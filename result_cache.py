@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Content-Addressed Result Cache
+São Miguel Island Enhanced Rock Weathering Study
+
+Memoizes model evaluations under a stable SHA-256 of their inputs. Keys
+are built from plain values, dataclasses, NumPy arrays and - for model
+code - functions and classes, which hash to a fingerprint of their
+bytecode and literal constants. Editing a model constant (a class
+attribute passed in the key, or a literal inside a hashed function)
+therefore produces new keys, so stale results are never returned.
+
+Results live in a bounded in-memory LRU and, optionally, in a JSON
+on-disk store shared between runs. Hashing is the expensive part of a
+lookup, so hot callers pass a flat tuple of plain values (a model
+fingerprint computed once, plus the per-call inputs): the LRU uses that
+tuple as is and only the on-disk store needs its SHA-256.
+"""
+
+import copy
+import dataclasses
+import hashlib
+import json
+import os
+import tempfile
+import types
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+
+def _code_fingerprint(code: types.CodeType, digest) -> None:
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _code_fingerprint(const, digest)
+        else:
+            digest.update(repr(const).encode())
+
+
+# function -> (code object, fingerprint); redefining the code rehashes it
+_FUNCTION_FINGERPRINTS = weakref.WeakKeyDictionary()
+
+
+def code_fingerprint(obj) -> str:
+    """
+    Hash of the code behind a function, method or class.
+
+    For classes, every function defined along the MRO (excluding object)
+    and every upper-case class constant is included; they are hashed on
+    every call. Function fingerprints are memoized until the function's
+    __code__ is replaced.
+    """
+    if not isinstance(obj, type):
+        func = getattr(obj, '__func__', obj)
+        cached = _FUNCTION_FINGERPRINTS.get(func)
+        if cached is not None and cached[0] is func.__code__:
+            return cached[1]
+    digest = hashlib.sha256()
+    if isinstance(obj, type):
+        for klass in obj.__mro__[:-1]:
+            digest.update(klass.__qualname__.encode())
+            for name in sorted(vars(klass)):
+                value = vars(klass)[name]
+                func = getattr(value, '__func__', value)
+                if isinstance(func, types.FunctionType):
+                    digest.update(name.encode())
+                    _code_fingerprint(func.__code__, digest)
+                elif isinstance(func, property) and func.fget is not None:
+                    digest.update(name.encode())
+                    _code_fingerprint(func.fget.__code__, digest)
+                elif name.isupper():
+                    digest.update(name.encode())
+                    digest.update(repr(value).encode())
+        return digest.hexdigest()
+    digest.update(func.__qualname__.encode())
+    _code_fingerprint(func.__code__, digest)
+    _FUNCTION_FINGERPRINTS[func] = (func.__code__, digest.hexdigest())
+    return _FUNCTION_FINGERPRINTS[func][1]
+
+
+def _canonical(obj) -> Any:
+    """Reduce a key part to JSON-serialisable primitives."""
+    if obj is None or isinstance(obj, (bool, str)):
+        return obj
+    if isinstance(obj, (int, np.integer)):
+        return int(obj)
+    if isinstance(obj, (float, np.floating)):
+        # repr round-trips exactly; tag so 2 and 2.0 hash differently
+        return {'f': repr(float(obj))}
+    if isinstance(obj, np.ndarray):
+        return {'nd': [str(obj.dtype), list(obj.shape),
+                       hashlib.sha256(np.ascontiguousarray(obj).tobytes()).hexdigest()]}
+    if isinstance(obj, (type, types.FunctionType, types.MethodType)):
+        return {'code': code_fingerprint(obj)}
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return {'dc': type(obj).__qualname__,
+                'fields': {f.name: _canonical(getattr(obj, f.name)) for f in dataclasses.fields(obj)}}
+    if isinstance(obj, dict):
+        return {'dict': [[_canonical(k), _canonical(v)] for k, v in sorted(obj.items(), key=lambda kv: str(kv[0]))]}
+    if isinstance(obj, (list, tuple)):
+        return [_canonical(v) for v in obj]
+    raise TypeError(f"Cannot build a cache key from {type(obj).__name__}")
+
+
+def stable_hash(*parts) -> str:
+    """SHA-256 of the canonical form of the given key parts."""
+    payload = json.dumps(_canonical(list(parts)), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# Stands in for NaN in memo keys (NaN != NaN would never hit)
+_NAN_KEY = object()
+_PLAIN_TYPES = (str, int, bool, type(None))
+
+
+def _memo_key(parts) -> Optional[tuple]:
+    """
+    key_parts as an in-memory key: a tuple (nested tuples allowed) of
+    str / int / float / bool / None, with NaN normalised; None for
+    anything else, which is keyed by stable_hash instead. Numerically
+    equal ints and floats share a key.
+    """
+    if type(parts) is not tuple:
+        return None
+    key = []
+    for part in parts:
+        kind = type(part)
+        if kind is float:
+            key.append(part if part == part else _NAN_KEY)
+        elif kind in _PLAIN_TYPES:
+            key.append(part)
+        elif kind is tuple:
+            part = _memo_key(part)
+            if part is None:
+                return None
+            key.append(part)
+        else:
+            return None
+    return tuple(key)
+
+
+_IMMUTABLE_TYPES = frozenset((float, str, int, bool, type(None)))
+
+
+def _copy(value: Any) -> Any:
+    """Copy of a cached value: dicts and lists are copied, plain values shared."""
+    kind = type(value)
+    if kind is dict:
+        value = value.copy()
+        for k, v in value.items():
+            if type(v) not in _IMMUTABLE_TYPES:
+                value[k] = _copy(v)
+        return value
+    if kind in _IMMUTABLE_TYPES or isinstance(value, np.generic):
+        return value
+    if kind is list:
+        return [_copy(v) for v in value]
+    return copy.deepcopy(value)
+
+
+def _json_default(obj):
+    if isinstance(obj, (np.generic,)):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"{type(obj).__name__} is not JSON serialisable")
+
+
+class ResultCache:
+    """
+    Bounded LRU memo with an optional on-disk JSON store.
+
+    Parameters:
+    -----------
+    maxsize : int
+        Entries kept in memory (least recently used are evicted)
+    directory : str
+        Optional directory for persistent entries (one JSON file per key)
+    """
+
+    def __init__(self, maxsize: int = 4096, directory: Optional[str] = None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self._memory: 'OrderedDict[str, Any]' = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _remember(self, key: str, value: Any) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _load(self, memo_key, key: Optional[str], default: Any) -> Any:
+        """Entry from memory (memo_key) or the on-disk store (key)."""
+        if memo_key in self._memory:
+            self._memory.move_to_end(memo_key)
+            self.hits += 1
+            return _copy(self._memory[memo_key])
+        if self.directory:
+            path = self._path(key)
+            if os.path.exists(path):
+                with open(path, encoding='utf-8') as f:
+                    value = json.load(f)
+                self._remember(memo_key, value)
+                self.disk_hits += 1
+                return _copy(value)
+        return default
+
+    def _store(self, memo_key, key: Optional[str], value: Any) -> None:
+        self._remember(memo_key, _copy(value))
+        if self.directory:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write-then-rename so concurrent readers never see partial files
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(value, f, default=_json_default)
+            os.replace(tmp, path)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._load(key, key, default)
+
+    def put(self, key: str, value: Any) -> None:
+        self._store(key, key, value)
+
+    def get_or_compute(self, key_parts, compute: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for key_parts, computing and storing it on a miss.
+
+        A tuple of plain values (see _memo_key) is looked up in memory
+        directly, so a hit costs a dict lookup and a copy; stable_hash is
+        only computed for other key parts or to reach the on-disk store.
+        """
+        memo_key = _memo_key(key_parts)
+        if memo_key is not None and memo_key in self._memory:
+            self._memory.move_to_end(memo_key)
+            self.hits += 1
+            return _copy(self._memory[memo_key])
+        # The SHA-256 is only needed for the disk store or unhashable keys
+        key = stable_hash(key_parts) if self.directory or memo_key is None else None
+        if memo_key is None:
+            memo_key = key
+        missing = object()
+        value = self._load(memo_key, key, missing)
+        if value is not missing:
+            return value
+        self.misses += 1
+        value = compute()
+        self._store(memo_key, key, value)
+        return value
+
+    def clear(self) -> None:
+        """Drop in-memory entries (the on-disk store is left untouched)."""
+        self._memory.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {'entries': len(self._memory), 'hits': self.hits,
+                'disk_hits': self.disk_hits, 'misses': self.misses}
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Run Metrics: Opt-In Profiling Hooks for the Analysis Pipeline
+São Miguel Island Enhanced Rock Weathering Study
+
+Timed spans (aggregated per stage, nested spans reported by path), row
+counters and resident-memory sampling, exported as JSON or Prometheus
+text. Instrumentation is off unless a RunMetrics object is enabled or
+passed in; disabled spans are a shared no-op context manager.
+
+    metrics = run_metrics.enable()
+    ...  # run the analysis
+    metrics.write('run_metrics.json')   # or .prom
+
+Setting ERW_METRICS=<path> makes extended_analysis.main and
+viability_analysis.main do this itself. ERWViabilityAnalyzer reports to
+its own metrics argument or, when that is None, to the enabled collector.
+"""
+
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+
+_NULL_SPAN = contextlib.nullcontext()
+_ACTIVE: Optional['RunMetrics'] = None
+
+
+def _current_rss_bytes() -> int:
+    """Current resident set size (the peak where /proc is absent, 0 without resource)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):  # no /proc, or no os.sysconf (Windows)
+        pass
+    try:
+        import resource  # Unix only; importing this module must work everywhere
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class _SpanStats:
+    __slots__ = ('count', 'total', 'min', 'max', 'peak_rss')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self.peak_rss = 0
+
+    def as_dict(self) -> Dict:
+        return {'count': self.count, 'total_seconds': self.total,
+                'mean_seconds': self.total / self.count if self.count else 0.0,
+                'min_seconds': self.min if self.count else 0.0, 'max_seconds': self.max,
+                'peak_rss_bytes': self.peak_rss}
+
+
+class _Span:
+    __slots__ = ('metrics', 'name', 'path', 'start')
+
+    def __init__(self, metrics: 'RunMetrics', name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        stack = self.metrics._stack()
+        self.path = f"{stack[-1]}/{self.name}" if stack else self.name
+        stack.append(self.path)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.metrics._stack().pop()
+        self.metrics._record(self.path, elapsed)
+        return False
+
+
+class RunMetrics:
+    """
+    Collector for spans, counters and memory samples.
+
+    Parameters:
+    -----------
+    sample_memory : bool
+        Sample RSS when top-level spans close (nested spans inherit the
+        reading of their parent to keep per-call overhead low)
+    """
+
+    def __init__(self, sample_memory: bool = True):
+        self.sample_memory = sample_memory
+        self.spans: Dict[str, _SpanStats] = {}
+        self.counters: Dict[str, float] = {}
+        self.peak_rss = 0
+        self.started = time.time()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record(self, path: str, elapsed: float):
+        rss = _current_rss_bytes() if self.sample_memory and '/' not in path else 0
+        with self._lock:
+            stats = self.spans.get(path)
+            if stats is None:
+                stats = self.spans[path] = _SpanStats()
+            stats.count += 1
+            stats.total += elapsed
+            stats.min = min(stats.min, elapsed)
+            stats.max = max(stats.max, elapsed)
+            if rss:
+                stats.peak_rss = max(stats.peak_rss, rss)
+                self.peak_rss = max(self.peak_rss, rss)
+
+    def span(self, name: str) -> _Span:
+        """Context manager timing one stage; nested spans report as parent/child."""
+        return _Span(self, name)
+
+    def count(self, name: str, value: float = 1):
+        """Add to a counter (e.g. rows processed)."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def merge(self, data: Dict, prefix: str = '') -> 'RunMetrics':
+        """
+        Add spans and counters from another collector's to_dict() (e.g. one
+        per worker process). Span paths get prefix; counters are summed.
+        """
+        with self._lock:
+            for path, other in data.get('spans', {}).items():
+                path = f"{prefix}/{path}" if prefix else path
+                stats = self.spans.get(path)
+                if stats is None:
+                    stats = self.spans[path] = _SpanStats()
+                if other['count']:
+                    stats.min = min(stats.min, other['min_seconds'])
+                stats.count += other['count']
+                stats.total += other['total_seconds']
+                stats.max = max(stats.max, other['max_seconds'])
+                stats.peak_rss = max(stats.peak_rss, other['peak_rss_bytes'])
+            for name, value in data.get('counters', {}).items():
+                self.counters[name] = self.counters.get(name, 0) + value
+        return self
+
+    def to_dict(self) -> Dict:
+        return {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'wall_seconds': time.time() - self.started,
+            'peak_rss_bytes': max(self.peak_rss, _current_rss_bytes() if self.sample_memory else 0),
+            'spans': {path: stats.as_dict() for path, stats in sorted(self.spans.items())},
+            'counters': dict(self.counters),
+        }
+
+    def to_prometheus(self, prefix: str = 'erw') -> str:
+        """Prometheus text exposition (for node_exporter's textfile collector)."""
+        data = self.to_dict()
+        lines = [
+            f"# TYPE {prefix}_span_seconds_total counter",
+            *[f'{prefix}_span_seconds_total{{span="{p}"}} {s["total_seconds"]:.9f}'
+              for p, s in data['spans'].items()],
+            f"# TYPE {prefix}_span_calls_total counter",
+            *[f'{prefix}_span_calls_total{{span="{p}"}} {s["count"]}' for p, s in data['spans'].items()],
+            f"# TYPE {prefix}_span_max_seconds gauge",
+            *[f'{prefix}_span_max_seconds{{span="{p}"}} {s["max_seconds"]:.9f}' for p, s in data['spans'].items()],
+            f"# TYPE {prefix}_counter_total counter",
+            *[f'{prefix}_counter_total{{name="{k}"}} {v}' for k, v in data['counters'].items()],
+            f"# TYPE {prefix}_peak_rss_bytes gauge",
+            f"{prefix}_peak_rss_bytes {data['peak_rss_bytes']}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """Write JSON, or Prometheus text when path ends in .prom / .txt."""
+        text = self.to_prometheus() if path.endswith(('.prom', '.txt')) else json.dumps(self.to_dict(), indent=2)
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+
+def enable(metrics: Optional[RunMetrics] = None) -> RunMetrics:
+    """Install a process-wide collector (used by span()/count())."""
+    global _ACTIVE
+    _ACTIVE = metrics or RunMetrics()
+    return _ACTIVE
+
+
+def disable() -> Optional[RunMetrics]:
+    """Remove the process-wide collector and return it."""
+    global _ACTIVE
+    metrics, _ACTIVE = _ACTIVE, None
+    return metrics
+
+
+def active() -> Optional[RunMetrics]:
+    return _ACTIVE
+
+
+def span(name: str):
+    """Span on the active collector, or a shared no-op when disabled."""
+    return _NULL_SPAN if _ACTIVE is None else _ACTIVE.span(name)
+
+
+def count(name: str, value: float = 1):
+    if _ACTIVE is not None:
+        _ACTIVE.count(name, value)
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Basalt Supply Allocation Across Plots
+São Miguel Island, Azores
+
+Distributes a limited annual basalt supply (the EXTRACTION_SCENARIOS of
+case_studies/sao_miguel.py, or per-quarry capacities) over plots so as
+to maximise net CO₂ removal or total farmer benefit, within per-plot
+application-rate bounds.
+
+The per-tonne value of each plot comes from ERWViabilityAnalyzer's
+lime-replacement outputs, which are linear in the applied rate, so the
+problem is a linear programme:
+
+    max Σ v[p, q] · x[p, q]
+    s.t. Σ_q x[p, q] ≤ max_rate[p] · area[p],  Σ_q x[p, q] ≥ min_rate[p] · area[p]
+         Σ_p x[p, q] ≤ capacity[q],  x ≥ 0
+
+With a single supply pool this is a fractional knapsack, solved exactly
+by filling plots in order of value per tonne (one sort and a cumulative
+sum). With several quarries, where haulage makes the value depend on
+the quarry, the greedy fills (plot, quarry) pairs in value order, which
+is near-optimal; method='lp' solves the sparse LP exactly with SciPy's
+HiGHS instead.
+"""
+
+import os
+import sys
+import time
+from typing import Dict, Optional, Union
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'case_studies'))
+
+from extended_analysis import ERWScenario
+from road_transport import TRUCK_KG_CO2_PER_T_KM
+from sao_miguel import EXTRACTION_SCENARIOS
+from viability_analysis import ERWViabilityAnalyzer, PlotTable, load_sao_miguel_data
+
+
+LIME_REPLACEMENT_RATE_T_HA = 2.7  # t basalt/ha/yr behind the analyzer's lime-replacement outputs
+# Grinding + transport, the ERWScenario defaults
+UPSTREAM_KG_CO2_PER_T = 50.0 + 10.0
+HAUL_COST_EUR_PER_T_KM = 0.15
+OBJECTIVES = ('net_co2', 'benefit')
+
+
+def plot_values(analyzer: ERWViabilityAnalyzer, objective: str = 'net_co2',
+                scenario: Optional[ERWScenario] = None) -> Dict[str, np.ndarray]:
+    """
+    Value of one tonne of basalt on each plot.
+
+    Parameters:
+    -----------
+    analyzer : ERWViabilityAnalyzer
+        Plots and model constants (analyze_table is evaluated once)
+    objective : str
+        'net_co2' (t CO₂ per t basalt, after grinding and transport
+        emissions of the scenario) or 'benefit' (€ per t basalt: lime
+        savings plus carbon revenue)
+    scenario : ERWScenario
+        Upstream emission factors (default: UPSTREAM_KG_CO2_PER_T)
+
+    Returns:
+    --------
+    dict : 'value' per tonne for the objective, plus 'net_co2_t_per_t'
+           and 'benefit_eur_per_t' for reporting, 'area_ha' and 'plot_id'
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective '{objective}' (expected one of {OBJECTIVES})")
+    if scenario is None:
+        upstream_kg_per_t = UPSTREAM_KG_CO2_PER_T
+    else:
+        upstream_kg_per_t = scenario.grinding_emissions_kg_co2_per_t + scenario.transport_emissions_kg_co2_per_t
+    columns = analyzer.analyze_table()
+    upstream_t_per_t = upstream_kg_per_t / 1000
+    net_co2 = columns['co2_lime_t_ha_yr'] / LIME_REPLACEMENT_RATE_T_HA - upstream_t_per_t
+    benefit = columns['benefit_lime_eur_ha_yr'] / LIME_REPLACEMENT_RATE_T_HA
+    return {
+        'plot_id': columns['plot_id'],
+        'area_ha': columns['area_ha'],
+        'value': net_co2 if objective == 'net_co2' else benefit,
+        'net_co2_t_per_t': net_co2,
+        'benefit_eur_per_t': benefit,
+    }
+
+
+def _knapsack(value, lower, upper, supply):
+    """Exact single-pool allocation: minima first, then best value per tonne."""
+    tonnes = lower.copy()
+    remaining = supply - lower.sum()
+    room = np.where(value > 0, upper - lower, 0.0)
+    order = np.argsort(-value, kind='stable')
+    filled = np.cumsum(room[order])
+    # Plots fully served, then one plot served partially
+    n_full = int(np.searchsorted(filled, remaining, side='right'))
+    tonnes[order[:n_full]] += room[order[:n_full]]
+    if n_full < len(order):
+        tonnes[order[n_full]] += remaining - (filled[n_full - 1] if n_full else 0.0)
+    return tonnes
+
+
+def _greedy_arcs(value, lower, upper, capacity):
+    """
+    Multi-quarry greedy over (plot, quarry) arcs in value order.
+
+    Minimum rates are served first (again best arcs first), then plots are
+    topped up while value is positive.
+    """
+    n_plots, n_quarries = value.shape
+    shipped = np.zeros((n_plots, n_quarries))
+    plot_room = upper.copy()
+    quarry_left = capacity.astype(float).copy()
+    finite = np.isfinite(value)
+    plots, quarries = np.nonzero(finite)
+    order = np.argsort(-value[plots, quarries], kind='stable')
+    plots, quarries = plots[order], quarries[order]
+
+    need = lower.copy()
+    for phase in ('minimum', 'top-up'):
+        want = need if phase == 'minimum' else plot_room
+        open_quarries = int(np.count_nonzero(quarry_left > 0))
+        for p, q in zip(plots.tolist(), quarries.tolist()):
+            if open_quarries == 0 or (phase == 'top-up' and value[p, q] <= 0):
+                break
+            amount = min(want[p], quarry_left[q])
+            if amount <= 0:
+                continue
+            shipped[p, q] += amount
+            quarry_left[q] -= amount
+            if quarry_left[q] <= 0:
+                open_quarries -= 1
+            plot_room[p] -= amount
+            if phase == 'minimum':
+                need[p] -= amount
+        if phase == 'minimum' and np.any(need > 1e-9 * np.maximum(lower, 1.0)):
+            raise ValueError("Quarry capacity (or reach) cannot cover the plots' minimum application rates")
+    return shipped
+
+
+def _linear_programme(value, lower, upper, capacity):
+    """Exact sparse LP over the finite (plot, quarry) arcs (requires SciPy)."""
+    try:
+        from scipy.optimize import linprog
+        from scipy.sparse import csr_matrix, vstack
+    except ImportError as e:
+        raise ImportError("method='lp' requires scipy (pip install scipy)") from e
+    n_plots, n_quarries = value.shape
+    plots, quarries = np.nonzero(np.isfinite(value))
+    n_arcs = len(plots)
+    arcs = np.arange(n_arcs)
+    ones = np.ones(n_arcs)
+    plot_rows = csr_matrix((ones, (plots, arcs)), shape=(n_plots, n_arcs))
+    quarry_rows = csr_matrix((ones, (quarries, arcs)), shape=(n_quarries, n_arcs))
+    a_ub = vstack([plot_rows, -plot_rows, quarry_rows]).tocsr()
+    b_ub = np.concatenate([upper, -lower, capacity])
+    solution = linprog(-value[plots, quarries], A_ub=a_ub, b_ub=b_ub, bounds=(0, None), method='highs')
+    if not solution.success:
+        raise ValueError(f"Allocation LP failed: {solution.message}")
+    shipped = np.zeros((n_plots, n_quarries))
+    shipped[plots, quarries] = solution.x
+    return shipped
+
+
+def allocate_basalt(analyzer: ERWViabilityAnalyzer,
+                    supply_t: Union[float, np.ndarray],
+                    objective: str = 'net_co2',
+                    max_rate_t_ha=LIME_REPLACEMENT_RATE_T_HA,
+                    min_rate_t_ha=0.0,
+                    distance_km: Optional[np.ndarray] = None,
+                    scenario: Optional[ERWScenario] = None,
+                    method: str = 'greedy') -> Dict[str, np.ndarray]:
+    """
+    Distribute annual basalt supply over the analyzer's plots.
+
+    Parameters:
+    -----------
+    analyzer : ERWViabilityAnalyzer
+        Plots and model constants
+    supply_t : float or array
+        Annual supply in tonnes: one pool, or one capacity per quarry
+    objective : str
+        'net_co2' or 'benefit' (see plot_values)
+    max_rate_t_ha, min_rate_t_ha : float or array
+        Per-plot application-rate bounds (t/ha/yr); plots with a positive
+        minimum are always served
+    distance_km : array (n_plots, n_quarries)
+        Road distance from each quarry (NaN / inf = not served from that
+        quarry), e.g. from road_transport; haulage emissions or costs are
+        charged per t·km
+    method : str
+        'greedy' (default) or 'lp' (exact, needs SciPy)
+
+    Returns:
+    --------
+    dict : Per plot 'plot_id', 'basalt_t', 'rate_t_ha', 'net_co2_t',
+           'benefit_eur'; 'shipped_t' (n_plots, n_quarries); per quarry
+           'quarry_used_t'; totals 'total_basalt_t', 'total_net_co2_t',
+           'total_benefit_eur', 'plots_served'
+    """
+    values = plot_values(analyzer, objective, scenario)
+    area = np.asarray(values['area_ha'], dtype=float)
+    n = len(area)
+    upper = np.broadcast_to(np.asarray(max_rate_t_ha, dtype=float), (n,)) * area
+    lower = np.broadcast_to(np.asarray(min_rate_t_ha, dtype=float), (n,)) * area
+    if np.any(lower > upper):
+        raise ValueError("min_rate_t_ha exceeds max_rate_t_ha for some plots")
+
+    capacity = np.atleast_1d(np.asarray(supply_t, dtype=float))
+    haul_net_co2 = haul_benefit = 0.0
+    if distance_km is not None:
+        distance_km = np.asarray(distance_km, dtype=float).reshape(n, len(capacity))
+        distance_km = np.where(np.isnan(distance_km), np.inf, distance_km)
+        haul_net_co2 = distance_km * TRUCK_KG_CO2_PER_T_KM / 1000
+        haul_benefit = distance_km * HAUL_COST_EUR_PER_T_KM
+    net_co2 = values['net_co2_t_per_t'][:, None] - haul_net_co2
+    benefit = values['benefit_eur_per_t'][:, None] - haul_benefit
+    value = np.broadcast_to(net_co2 if objective == 'net_co2' else benefit, (n, len(capacity)))
+
+    if method == 'lp':
+        shipped = _linear_programme(value, lower, upper, capacity)
+    elif method != 'greedy':
+        raise ValueError(f"Unknown method '{method}' (expected 'greedy' or 'lp')")
+    elif len(capacity) == 1 and distance_km is None:
+        if lower.sum() > capacity[0]:
+            raise ValueError("Supply cannot cover the plots' minimum application rates")
+        shipped = _knapsack(value[:, 0], lower, upper, capacity[0])[:, None]
+    else:
+        shipped = _greedy_arcs(value, lower, upper, capacity)
+
+    tonnes = shipped.sum(axis=1)
+    # Unserved arcs may have infinite haul distance: mask rather than multiply
+    plot_net_co2 = np.where(shipped > 0, shipped * net_co2, 0.0).sum(axis=1)
+    plot_benefit = np.where(shipped > 0, shipped * benefit, 0.0).sum(axis=1)
+    return {
+        'plot_id': values['plot_id'],
+        'basalt_t': tonnes,
+        'rate_t_ha': np.divide(tonnes, area, out=np.zeros(n), where=area > 0),
+        'net_co2_t': plot_net_co2,
+        'benefit_eur': plot_benefit,
+        'shipped_t': shipped,
+        'quarry_used_t': shipped.sum(axis=0),
+        'total_basalt_t': float(tonnes.sum()),
+        'total_net_co2_t': float(plot_net_co2.sum()),
+        'total_benefit_eur': float(plot_benefit.sum()),
+        'plots_served': int(np.count_nonzero(tonnes > 0)),
+    }
+
+
+def main():
+    """Extraction scenarios allocated over a synthetic 100,000-plot island."""
+    print("=" * 80)
+    print("BASALT SUPPLY ALLOCATION (lime replacement, up to 2.7 t/ha/yr)")
+    print("=" * 80)
+
+    sanguinho = PlotTable.from_plots(load_sao_miguel_data())
+    n = 100_000
+    rng = np.random.default_rng(0)
+    table = PlotTable({name: np.resize(values, n) for name, values in sanguinho.columns.items()})
+    table.columns['ph'] = np.clip(rng.normal(5.6, 0.4, n), 4.5, 7.5)
+    table.columns['organic_matter'] = np.clip(rng.normal(9.0, 2.5, n), 1.0, None)
+    table.columns['area_ha'] = rng.uniform(0.5, 4.0, n)
+    analyzer = ERWViabilityAnalyzer(table)
+    print(f"  {n:,} plots, {table.area_ha.sum():,.0f} ha "
+          f"(demand at 2.7 t/ha: {table.area_ha.sum() * LIME_REPLACEMENT_RATE_T_HA:,.0f} t/yr)")
+    print()
+
+    for objective in OBJECTIVES:
+        print(f"  Objective: {objective}")
+        for scenario, supply in EXTRACTION_SCENARIOS.items():
+            start = time.perf_counter()
+            result = allocate_basalt(analyzer, supply, objective=objective)
+            elapsed = time.perf_counter() - start
+            print(f"    {scenario:12s} {supply:>9,} t/yr → {result['plots_served']:6,} plots, "
+                  f"{result['total_net_co2_t']:8,.0f} t CO₂ net, €{result['total_benefit_eur']:11,.0f}  "
+                  f"({elapsed:.2f} s)")
+        print()
+
+    # Three quarries with haulage, capacities summing to the moderate scenario
+    capacity = np.array([30000.0, 25000.0, 20000.0])
+    distance = rng.uniform(2, 60, (n, len(capacity)))
+    start = time.perf_counter()
+    result = allocate_basalt(analyzer, capacity, objective='net_co2', distance_km=distance)
+    elapsed = time.perf_counter() - start
+    print(f"  Three quarries with haulage: {result['plots_served']:,} plots, "
+          f"{result['total_net_co2_t']:,.0f} t CO₂ net ({elapsed:.2f} s)")
+    print("    Quarry use: " + ", ".join(f"{u:,.0f}/{c:,.0f} t" for u, c in zip(result['quarry_used_t'], capacity)))
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Incremental Re-Analysis for MRV Resampling
+São Miguel Island, Azores
+
+Keeps the analyze_table result columns for a PlotTable together with
+running aggregates of the island-level summary. When a resampling round
+updates a few plots, only those rows are marked dirty and re-analysed,
+and the aggregates are adjusted by the difference, so the cost of a
+refresh scales with the number of changed plots.
+"""
+
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from viability_analysis import ERWViabilityAnalyzer, PlotTable
+
+
+# analyze_table columns summarised as mean (and sample std)
+MEAN_COLUMNS = ('ph', 'organic_matter', 'mg_deficit', 'total_score')
+# analyze_table columns summed area-weighted (per-ha rate × area_ha)
+TOTAL_COLUMNS = ('co2_lime_t_ha_yr', 'co2_full_t_ha_yr',
+                 'benefit_lime_eur_ha_yr', 'benefit_full_eur_ha_yr')
+
+
+class IncrementalAnalysis:
+    """
+    Dirty-row tracking on top of ERWViabilityAnalyzer.analyze_table.
+
+    Parameters:
+    -----------
+    analyzer : ERWViabilityAnalyzer
+        Model to evaluate
+    table : PlotTable
+        Plots (default: analyzer.plot_table()). The table is updated in
+        place by update_plots.
+    """
+
+    def __init__(self, analyzer: ERWViabilityAnalyzer, table: Optional[PlotTable] = None):
+        self.analyzer = analyzer
+        self.table = analyzer.plot_table() if table is None else table
+        self.results = {k: np.array(v, copy=True) for k, v in analyzer.analyze_table(self.table).items()}
+        self._dirty = np.zeros(len(self.table), dtype=bool)
+        self._index_by_id = None
+        self.rows_recomputed = 0
+        self.recompute_aggregates()
+
+    # ── aggregates ───────────────────────────────────────────────────────
+
+    def _contributions(self, rows: Dict[str, np.ndarray]) -> Dict[str, float]:
+        """Additive aggregate terms contributed by a set of result rows."""
+        terms = {}
+        for col in MEAN_COLUMNS:
+            shifted = rows[col] - self._shift[col]
+            terms[f'{col}:sum'] = float(shifted.sum())
+            terms[f'{col}:sumsq'] = float((shifted * shifted).sum())
+        for col in TOTAL_COLUMNS:
+            terms[f'{col}:total'] = float((rows[col] * rows['area_ha']).sum())
+        terms['area_ha:total'] = float(rows['area_ha'].sum())
+        return terms
+
+    def recompute_aggregates(self):
+        """Rebuild the running aggregates from all rows (resets float drift)."""
+        # Shifting by the current mean keeps the sum-of-squares well conditioned
+        self._shift = {col: float(self.results[col].mean()) if len(self.table) else 0.0
+                       for col in MEAN_COLUMNS}
+        self._aggregates = self._contributions(self.results)
+
+    # ── updates ──────────────────────────────────────────────────────────
+
+    def index_of(self, plot_ids: Iterable) -> np.ndarray:
+        """Row indices for the given plot IDs."""
+        if self._index_by_id is None:
+            self._index_by_id = {pid: i for i, pid in enumerate(self.table.plot_id)}
+        return np.array([self._index_by_id[pid] for pid in plot_ids], dtype=np.intp)
+
+    def update_plots(self, index, **values):
+        """
+        Write new soil values for some plots and mark them dirty.
+
+        index  : row indices (see index_of for plot IDs)
+        values : PlotTable column -> new values for those rows
+        """
+        index = np.asarray(index, dtype=np.intp)
+        self.table.update_rows(index, **values)
+        self._dirty[index] = True
+
+    def mark_dirty(self, index):
+        """Flag rows whose inputs were changed outside update_plots."""
+        self._dirty[np.asarray(index, dtype=np.intp)] = True
+
+    @property
+    def n_dirty(self) -> int:
+        return int(self._dirty.sum())
+
+    def refresh(self) -> np.ndarray:
+        """Re-analyse dirty rows only and adjust the aggregates; returns their indices."""
+        index = np.flatnonzero(self._dirty)
+        if len(index) == 0:
+            return index
+
+        old_rows = {k: v[index] for k, v in self.results.items()}
+        new_rows = self.analyzer.analyze_table(self.table[index])
+
+        removed = self._contributions(old_rows)
+        added = self._contributions(new_rows)
+        for key in self._aggregates:
+            self._aggregates[key] += added[key] - removed[key]
+
+        for key, column in self.results.items():
+            column[index] = new_rows[key]
+
+        self._dirty[index] = False
+        self.rows_recomputed += len(index)
+        return index
+
+    # ── summaries ────────────────────────────────────────────────────────
+
+    def summary(self) -> Dict:
+        """
+        Island summary with the keys of generate_summary_statistics,
+        computed from the running aggregates (refreshes dirty rows first).
+
+        Totals are area-weighted (rate × each plot's area_ha). As in
+        pandas, means are NaN without plots and std needs two.
+        """
+        self.refresh()
+        n = len(self.table)
+        agg = self._aggregates
+
+        def mean(col):
+            if n == 0:
+                return float('nan')
+            return self._shift[col] + agg[f'{col}:sum'] / n
+
+        def std(col):
+            if n < 2:
+                return float('nan')
+            s, ss = agg[f'{col}:sum'], agg[f'{col}:sumsq']
+            return float(np.sqrt(max(ss - s * s / n, 0.0) / (n - 1)))
+
+        return {
+            'n_plots': n,
+            'avg_ph': round(mean('ph'), 2),
+            'std_ph': round(std('ph'), 2),
+            'avg_om': round(mean('organic_matter'), 1),
+            'std_om': round(std('organic_matter'), 1),
+            'avg_mg_deficit': round(mean('mg_deficit'), 2),
+            'avg_viability_score': round(mean('total_score'), 1),
+            'total_area_ha': agg['area_ha:total'],
+            'total_co2_lime_replacement_t_yr': round(agg['co2_lime_t_ha_yr:total'], 1),
+            'total_co2_full_erw_t_yr': round(agg['co2_full_t_ha_yr:total'], 1),
+            'total_economic_benefit_lime_eur_yr': round(agg['benefit_lime_eur_ha_yr:total'], 0),
+            'total_economic_benefit_full_eur_yr': round(agg['benefit_full_eur_ha_yr:total'], 0),
+        }
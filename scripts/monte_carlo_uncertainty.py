@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo Uncertainty Engine for the ERW CO₂ Mass Balance
+São Miguel Island, Azores
+
+Samples uncertain ERWScenario inputs and per-plot soil parameters from
+configurable distributions, evaluates the batched mass balance chunk by
+chunk and keeps streaming quantile estimates, stopping once the 95% CI
+width has stabilised. Memory use is set by the chunk size, not the
+number of draws.
+"""
+
+import os
+import sys
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extended_analysis import (ERWScenario, ScenarioBatch, calculate_co2_mass_balance,
+                               calculate_co2_mass_balance_batch, uncertainty_analysis)
+from viability_analysis import ERWViabilityAnalyzer, SoilPlot, load_sao_miguel_data
+
+
+@dataclass
+class Distribution:
+    """
+    A sampling distribution for one uncertain input.
+
+    kind : 'fixed' (a), 'normal' (mean a, sd b), 'lognormal' (median a,
+           log-sd b), 'uniform' (a, b) or 'triangular' (left a, mode b, right c)
+    low, high : optional hard bounds applied after sampling
+    """
+    kind: str
+    a: float
+    b: float = 0.0
+    c: float = 0.0
+    low: Optional[float] = None
+    high: Optional[float] = None
+
+    @classmethod
+    def relative_normal(cls, center: float, fraction: float, low: float = 0.0,
+                        high: Optional[float] = None) -> 'Distribution':
+        """Normal distribution with sd = fraction × center (e.g. ±30%)."""
+        return cls('normal', center, abs(center) * fraction, low=low, high=high)
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        if self.kind == 'fixed':
+            values = np.full(size, float(self.a))
+        elif self.kind == 'normal':
+            values = rng.normal(self.a, self.b, size)
+        elif self.kind == 'lognormal':
+            values = self.a * rng.lognormal(0.0, self.b, size)
+        elif self.kind == 'uniform':
+            values = rng.uniform(self.a, self.b, size)
+        elif self.kind == 'triangular':
+            values = rng.triangular(self.a, self.b, self.c, size)
+        else:
+            raise ValueError(f"Unknown distribution kind: {self.kind}")
+        if self.low is not None or self.high is not None:
+            values = np.clip(values, self.low, self.high)
+        return values
+
+
+def default_scenario_distributions(scenario: ERWScenario) -> Dict[str, Distribution]:
+    """
+    Input distributions matching the fractional uncertainties assumed in
+    extended_analysis.uncertainty_analysis (weathering ±30%, upstream
+    emissions ±15%, rainfall ±20%).
+    """
+    return {
+        'weathering_efficiency': Distribution.relative_normal(scenario.weathering_efficiency, 0.30, high=1.0),
+        'annual_rainfall_mm': Distribution.relative_normal(scenario.annual_rainfall_mm, 0.20),
+        'grinding_emissions_kg_co2_per_t': Distribution.relative_normal(scenario.grinding_emissions_kg_co2_per_t, 0.15),
+        'transport_emissions_kg_co2_per_t': Distribution.relative_normal(scenario.transport_emissions_kg_co2_per_t, 0.15),
+    }
+
+
+@dataclass
+class SoilUncertainty:
+    """
+    Per-plot soil inputs and their measurement uncertainty.
+
+    Each draw picks a plot (area-weighted) and perturbs its pH and OM by
+    the lab uncertainty. The resulting weathering-rate multiplier,
+    relative to the plot's measured value, scales weathering efficiency.
+    """
+    ph: np.ndarray
+    organic_matter: np.ndarray
+    area_ha: np.ndarray
+    ph_sd: float = 0.2           # ±0.2 pH units (MRV framework)
+    om_fraction_sd: float = 0.10  # ±10%
+
+    @classmethod
+    def from_plots(cls, plots: List[SoilPlot], **kwargs) -> 'SoilUncertainty':
+        return cls(ph=np.array([p.ph for p in plots], dtype=float),
+                   organic_matter=np.array([p.organic_matter for p in plots], dtype=float),
+                   area_ha=np.array([p.area_ha for p in plots], dtype=float),
+                   **kwargs)
+
+    def sample_efficiency_factor(self, rng: np.random.Generator, size: int,
+                                 analyzer: ERWViabilityAnalyzer) -> np.ndarray:
+        weights = self.area_ha / self.area_ha.sum()
+        idx = rng.choice(len(self.ph), size=size, p=weights)
+        ph = self.ph[idx] + rng.normal(0.0, self.ph_sd, size)
+        om = self.organic_matter[idx] * (1.0 + rng.normal(0.0, self.om_fraction_sd, size))
+        om = np.maximum(om, 0.0)
+        measured = analyzer.weathering_multiplier_batch(self.ph[idx], self.organic_matter[idx])
+        sampled = analyzer.weathering_multiplier_batch(ph, om)
+        return np.divide(sampled, measured, out=np.ones(size), where=measured > 0)
+
+
+class StreamingQuantiles:
+    """
+    Fixed-memory histogram sketch for quantiles of an unbounded stream.
+
+    The range is set from the first chunk and doubled (merging adjacent
+    bins) whenever later values fall outside it, so counts are never
+    lost and resolution is span / n_bins.
+    """
+
+    def __init__(self, n_bins: int = 16384):
+        if n_bins % 2:
+            raise ValueError("n_bins must be even")
+        self.n_bins = n_bins
+        self.counts = np.zeros(n_bins, dtype=np.int64)
+        self.lo = None
+        self.width = None
+        self.n = 0
+        self.sum = 0.0
+
+    def _grow(self, vmin: float, vmax: float):
+        half = self.n_bins // 2
+        while vmax >= self.lo + self.width * self.n_bins:
+            merged = self.counts.reshape(half, 2).sum(axis=1)
+            self.counts = np.concatenate([merged, np.zeros(half, dtype=np.int64)])
+            self.width *= 2
+        while vmin < self.lo:
+            merged = self.counts.reshape(half, 2).sum(axis=1)
+            self.counts = np.concatenate([np.zeros(half, dtype=np.int64), merged])
+            self.lo -= self.width * self.n_bins
+            self.width *= 2
+
+    def update(self, values: np.ndarray):
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return
+        vmin, vmax = float(values.min()), float(values.max())
+        if self.lo is None:
+            span = max(vmax - vmin, abs(vmax) * 1e-6, 1e-12)
+            self.lo = vmin - span
+            self.width = 3 * span / self.n_bins
+        self._grow(vmin, vmax)
+        idx = ((values - self.lo) / self.width).astype(np.int64)
+        np.clip(idx, 0, self.n_bins - 1, out=idx)
+        self.counts += np.bincount(idx, minlength=self.n_bins)
+        self.n += values.size
+        self.sum += float(values.sum())
+
+    def quantile(self, q) -> np.ndarray:
+        """Quantile(s) by linear interpolation within the containing bin."""
+        q = np.atleast_1d(np.asarray(q, dtype=float))
+        cum = np.cumsum(self.counts)
+        target = q * self.n
+        idx = np.searchsorted(cum, target, side='left')
+        idx = np.minimum(idx, self.n_bins - 1)
+        before = np.where(idx > 0, cum[idx - 1], 0)
+        in_bin = np.maximum(self.counts[idx], 1)
+        frac = np.clip((target - before) / in_bin, 0.0, 1.0)
+        return self.lo + (idx + frac) * self.width
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.n if self.n else float('nan')
+
+
+def monte_carlo_uncertainty(scenario: ERWScenario,
+                            distributions: Optional[Dict[str, Distribution]] = None,
+                            soil: Optional[SoilUncertainty] = None,
+                            years: int = 10,
+                            output: str = 'net_co2_t_ha_yr',
+                            seed: int = 42,
+                            chunk_size: int = 100_000,
+                            max_draws: int = 10_000_000,
+                            min_draws: int = 200_000,
+                            rel_tol: float = 0.002,
+                            patience: int = 3,
+                            confidence: float = 0.95) -> Dict:
+    """
+    Sampling-based confidence interval for one mass-balance output.
+
+    Parameters:
+    -----------
+    scenario : ERWScenario
+        Central values for every input
+    distributions : dict
+        ERWScenario field -> Distribution (default:
+        default_scenario_distributions). Fields not listed stay fixed.
+    soil : SoilUncertainty
+        Optional per-plot soil inputs propagated through the pH/OM
+        weathering-rate multiplier
+    years : int
+        Time horizon passed to the mass balance
+    output : str
+        Key of calculate_co2_mass_balance_batch to summarise
+    seed : int
+        Seed for numpy's default_rng; identical arguments give identical
+        results
+    chunk_size : int
+        Draws evaluated per vectorized chunk (bounds peak memory)
+    max_draws, min_draws : int
+        Hard cap and minimum before convergence is tested
+    rel_tol, patience : float, int
+        Stop when the CI width changes by less than rel_tol (relative) for
+        `patience` consecutive chunks
+    confidence : float
+        Two-sided CI level
+
+    Returns:
+    --------
+    dict : Mean, median, CI bounds, draws used and convergence flag
+    """
+    distributions = default_scenario_distributions(scenario) if distributions is None else distributions
+    unknown = set(distributions) - set(ScenarioBatch.numeric_fields())
+    if unknown:
+        raise ValueError(f"Unknown scenario fields: {sorted(unknown)}")
+
+    rng = np.random.default_rng(seed)
+    analyzer = ERWViabilityAnalyzer([])
+    sketch = StreamingQuantiles()
+    alpha = (1.0 - confidence) / 2
+    quantiles = [alpha, 0.5, 1.0 - alpha]
+
+    previous_width = None
+    stable_chunks = 0
+    converged = False
+
+    while sketch.n < max_draws:
+        size = min(chunk_size, max_draws - sketch.n)
+        columns = {}
+        # Fixed iteration order keeps the random stream reproducible
+        for f in ScenarioBatch.numeric_fields():
+            if f in distributions:
+                columns[f] = distributions[f].sample(rng, size)
+            else:
+                columns[f] = getattr(scenario, f)
+        if soil is not None:
+            factor = soil.sample_efficiency_factor(rng, size, analyzer)
+            columns['weathering_efficiency'] = np.minimum(
+                np.asarray(columns['weathering_efficiency'], dtype=float) * factor, 1.0)
+
+        balance = calculate_co2_mass_balance_batch(ScenarioBatch(**columns), years=years)
+        sketch.update(balance[output])
+
+        if sketch.n >= min_draws:
+            lower, _, upper = sketch.quantile(quantiles)
+            width = upper - lower
+            if previous_width is not None and abs(width - previous_width) <= rel_tol * abs(previous_width):
+                stable_chunks += 1
+                if stable_chunks >= patience:
+                    converged = True
+                    break
+            else:
+                stable_chunks = 0
+            previous_width = width
+
+    lower, median, upper = sketch.quantile(quantiles)
+
+    return {
+        'output': output,
+        'n_draws': sketch.n,
+        'converged': converged,
+        'mean': sketch.mean,
+        'median': float(median),
+        'lower_bound_ci': float(lower),
+        'upper_bound_ci': float(upper),
+        'ci_width': float(upper - lower),
+        'confidence': confidence,
+        'seed': seed,
+    }
+
+
+def main():
+    """Compare the sampled CI with the analytical quadrature estimate."""
+    print("=" * 80)
+    print("MONTE CARLO UNCERTAINTY: FULL ERW (50 t/ha over 10 years)")
+    print("=" * 80)
+
+    scenario = ERWScenario("Full ERW (50 t/ha)", 50.0, 0.45, 1750)
+    soil = SoilUncertainty.from_plots(load_sao_miguel_data())
+
+    mc = monte_carlo_uncertainty(scenario, soil=soil)
+    analytical = uncertainty_analysis(calculate_co2_mass_balance(scenario))
+
+    print(f"Draws used:            {mc['n_draws']:,} (converged: {mc['converged']})")
+    print(f"Mean / median:         {mc['mean']:.3f} / {mc['median']:.3f} t CO₂/ha/yr")
+    print(f"95% CI (sampled):      {mc['lower_bound_ci']:.3f} - {mc['upper_bound_ci']:.3f} t CO₂/ha/yr")
+    print(f"95% CI (quadrature):   {analytical['lower_bound_95ci']} - {analytical['upper_bound_95ci']} t CO₂/ha/yr")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Sharded Multi-Process Plot Analysis
+São Miguel Island, Azores
+
+Runs ERWViabilityAnalyzer.analyze_table over a PlotTable split into
+contiguous shards on a process pool. Input columns and result columns
+live in shared memory: workers attach by name, read their slice of the
+inputs and write their slice of the outputs in place, so nothing but
+shard bounds is pickled and results come back already in plot order.
+With metrics active, each shard returns its spans and counters, which
+are merged into the caller's collector under 'workers/'.
+"""
+
+import copy
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import run_metrics
+from viability_analysis import (DERIVED_RESULT_COLUMNS, PLOT_NUMERIC_FIELDS, ERWViabilityAnalyzer,
+                                PlotTable)
+
+
+# Per-worker state set by _init_worker
+_worker = {}
+
+
+def _init_worker(in_name: str, out_name: str, n: int, analyzer: ERWViabilityAnalyzer,
+                 collect_metrics: bool = False):
+    # Pool workers share the parent's resource tracker, so attaching here
+    # does not create a second owner; the parent unlinks both blocks.
+    # A forked worker inherits the parent's collector; its records would
+    # be lost, so shards report through their own RunMetrics instead.
+    run_metrics.disable()
+    in_shm = shared_memory.SharedMemory(name=in_name)
+    out_shm = shared_memory.SharedMemory(name=out_name)
+    _worker['shm'] = (in_shm, out_shm)
+    _worker['inputs'] = np.ndarray((len(PLOT_NUMERIC_FIELDS), n), dtype=np.float64, buffer=in_shm.buf)
+    _worker['outputs'] = np.ndarray((len(DERIVED_RESULT_COLUMNS), n), dtype=np.float64, buffer=out_shm.buf)
+    _worker['analyzer'] = analyzer
+    _worker['collect_metrics'] = collect_metrics
+
+
+def _run_shard(bounds):
+    """Analyse one shard; returns (plots processed, metrics dict or None)."""
+    start, stop = bounds
+    analyzer = _worker['analyzer']
+    analyzer.metrics = run_metrics.RunMetrics(sample_memory=False) if _worker['collect_metrics'] else None
+    inputs = _worker['inputs']
+    outputs = _worker['outputs']
+    shard = PlotTable({f: inputs[i, start:stop] for i, f in enumerate(PLOT_NUMERIC_FIELDS)},
+                      plot_id=np.arange(start, stop))
+    result = analyzer.analyze_table(shard)
+    for i, key in enumerate(DERIVED_RESULT_COLUMNS):
+        outputs[i, start:stop] = result[key]
+    return stop - start, None if analyzer.metrics is None else analyzer.metrics.to_dict()
+
+
+def analyze_parallel(analyzer: ERWViabilityAnalyzer,
+                     table: Optional[PlotTable] = None,
+                     n_workers: Optional[int] = None,
+                     shard_size: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Sharded, multi-process ERWViabilityAnalyzer.analyze_table.
+
+    Parameters:
+    -----------
+    analyzer : ERWViabilityAnalyzer
+        Supplies the model constants (subclass overrides are honoured)
+    table : PlotTable
+        Plots to analyse (default: analyzer.plot_table())
+    n_workers : int
+        Worker processes (default: os.cpu_count())
+    shard_size : int
+        Plots per task (default: about four shards per worker)
+
+    Returns:
+    --------
+    dict : Same columns, in the same row order, as analyze_table
+    """
+    table = analyzer.plot_table() if table is None else table
+    n = len(table)
+    n_workers = n_workers or os.cpu_count() or 1
+    if n_workers == 1 or n == 0:
+        return analyzer.analyze_table(table)
+
+    shard_size = shard_size or max(1, -(-n // (n_workers * 4)))
+    bounds = [(start, min(start + shard_size, n)) for start in range(0, n, shard_size)]
+
+    # Ship only the constants, not the plots, to the workers
+    worker_analyzer = copy.copy(analyzer)
+    worker_analyzer.plots = []
+    worker_analyzer.metrics = None
+    metrics = analyzer.active_metrics()
+
+    in_shm = shared_memory.SharedMemory(create=True, size=max(1, len(PLOT_NUMERIC_FIELDS) * n * 8))
+    out_shm = shared_memory.SharedMemory(create=True, size=max(1, len(DERIVED_RESULT_COLUMNS) * n * 8))
+    try:
+        inputs = np.ndarray((len(PLOT_NUMERIC_FIELDS), n), dtype=np.float64, buffer=in_shm.buf)
+        for i, f in enumerate(PLOT_NUMERIC_FIELDS):
+            inputs[i] = table.columns[f]
+        outputs = np.ndarray((len(DERIVED_RESULT_COLUMNS), n), dtype=np.float64, buffer=out_shm.buf)
+
+        with ProcessPoolExecutor(max_workers=min(n_workers, len(bounds)),
+                                 initializer=_init_worker,
+                                 initargs=(in_shm.name, out_shm.name, n, worker_analyzer,
+                                           metrics is not None)) as pool:
+            processed = 0
+            for shard_plots, shard_metrics in pool.map(_run_shard, bounds):
+                processed += shard_plots
+                if shard_metrics is not None:
+                    metrics.merge(shard_metrics, prefix='workers')
+        if processed != n:
+            raise RuntimeError(f"Parallel analysis processed {processed} of {n} plots")
+
+        result = {'plot_id': table.plot_id}
+        result.update({f: table.columns[f] for f in PLOT_NUMERIC_FIELDS})
+        for i, key in enumerate(DERIVED_RESULT_COLUMNS):
+            result[key] = outputs[i].copy()
+        result['rating_code'] = result['rating_code'].astype(np.int8)
+        del inputs, outputs
+    finally:
+        in_shm.close()
+        in_shm.unlink()
+        out_shm.close()
+        out_shm.unlink()
+
+    return result
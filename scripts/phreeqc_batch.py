@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Batch PHREEQC Runs per Plot and Scenario
+São Miguel Island, Azores
+
+Renders one PHREEQC input per SoilPlot (and application scenario) from a
+template in modeling/templates/, runs the distinct inputs through a
+worker pool against a pluggable backend and parses the SELECTED_OUTPUT
+tables into columnar arrays.
+
+Backends:
+    PhreeqcCLIBackend      the phreeqc executable (one process per input)
+    PhreeqcLibraryBackend  IPhreeqc through the optional phreeqpy package
+    StubBackend            deterministic stand-in for tests and dry runs
+
+Identical inputs are run once: results are keyed by a hash of the input
+text and the backend (executable/database), and kept in a ResultCache,
+which can persist to disk (ERW_CACHE_DIR) so re-runs skip them entirely.
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from string import Template
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from result_cache import ResultCache, code_fingerprint, stable_hash
+from selected_output import read_selected_output
+from viability_analysis import SoilPlot, load_sao_miguel_data
+
+
+MODELING_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'modeling')
+DEFAULT_TEMPLATE = os.path.join(MODELING_DIR, 'templates', 'plot_weathering.pqi')
+SELECTED_OUTPUT_FILE = 'selected.out'
+
+# SOLUTION 1 of sao_miguel_erw_phreeqc.pqi: concentration per unit of the
+# measured exchangeable cation (mg/L per cmol/kg)
+CA_MG_L_PER_CMOL = 50 / 8.3
+MG_MG_L_PER_CMOL = 15 / 0.73
+K_MG_L_PER_CMOL = 8 / 0.8
+
+# Scenario 1 reaction (mol) at 2.7 t/ha basalt and 45% weathering efficiency
+REFERENCE_REACTION_MOL = {'olivine_mol': 0.5, 'pyroxene_mol': 0.3, 'plagioclase_mol': 0.2}
+REFERENCE_RATE_T_HA = 2.7
+REFERENCE_EFFICIENCY = 0.45
+
+# Phreeqc cache; set ERW_CACHE_DIR to persist across runs
+PHREEQC_CACHE = ResultCache(maxsize=65536, directory=os.environ.get('ERW_CACHE_DIR'))
+
+
+# ── input rendering ──────────────────────────────────────────────────────
+
+def load_template(path: str = DEFAULT_TEMPLATE) -> Template:
+    with open(path, encoding='utf-8') as f:
+        return Template(f.read())
+
+
+def template_values(plot: SoilPlot, scenario=None, steps: int = 10,
+                    temperature_c: float = 18.0, log_pco2: float = -2.0) -> Dict[str, str]:
+    """
+    Placeholder values for one plot.
+
+    scenario : any object with name, application_rate_t_ha and
+        weathering_efficiency (e.g. ERWScenario); default is lime
+        replacement (2.7 t/ha, 45%)
+    log_pco2 : soil-gas CO₂ partial pressure (log atm)
+    """
+    name = getattr(scenario, 'name', 'Lime replacement')
+    rate = getattr(scenario, 'application_rate_t_ha', REFERENCE_RATE_T_HA)
+    efficiency = getattr(scenario, 'weathering_efficiency', REFERENCE_EFFICIENCY)
+    scale = (rate / REFERENCE_RATE_T_HA) * (efficiency / REFERENCE_EFFICIENCY)
+
+    values = {
+        'title': f"{plot.plot_id}: {name}",
+        'plot_id': str(plot.plot_id),
+        'scenario': name,
+        'ph': f"{plot.ph:.2f}",
+        'temperature_c': f"{temperature_c:.1f}",
+        'ca_mg_l': f"{plot.exchangeable_ca * CA_MG_L_PER_CMOL:.3f}",
+        'mg_mg_l': f"{plot.exchangeable_mg * MG_MG_L_PER_CMOL:.3f}",
+        'k_mg_l': f"{plot.exchangeable_k * K_MG_L_PER_CMOL:.3f}",
+        'log_pco2': f"{log_pco2:.2f}",
+        'steps': str(int(steps)),
+        'selected_output_file': SELECTED_OUTPUT_FILE,
+    }
+    values.update({k: f"{v * scale:.6g}" for k, v in REFERENCE_REACTION_MOL.items()})
+    return values
+
+
+def render_input(plot: SoilPlot, scenario=None, template: Optional[Template] = None, **kwargs) -> str:
+    """PHREEQC input text for one plot (kwargs go to template_values)."""
+    template = load_template() if template is None else template
+    return template.substitute(template_values(plot, scenario, **kwargs))
+
+
+def render_inputs(plots: Sequence[SoilPlot], scenarios: Sequence = (None,),
+                  template: Optional[Template] = None, **kwargs) -> List[str]:
+    """Inputs for every scenario × plot, scenario-major."""
+    template = load_template() if template is None else template
+    return [render_input(plot, scenario, template, **kwargs) for scenario in scenarios for plot in plots]
+
+
+# ── SELECTED_OUTPUT parsing ──────────────────────────────────────────────
+
+def parse_selected_output(text: str) -> Dict[str, np.ndarray]:
+    """
+    SELECTED_OUTPUT text -> {column: array} (see selected_output.read_selected_output;
+    rows of concatenated blocks carry their block index in 'block').
+    """
+    return read_selected_output(text.encode())
+
+
+# ── backends ─────────────────────────────────────────────────────────────
+# A backend has run(input_text) -> SELECTED_OUTPUT text, fingerprint() for
+# cache keys, and thread_safe (False means the pool uses processes).
+
+def _file_digest(path: Optional[str]) -> str:
+    if not path or not os.path.exists(path):
+        return str(path)
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class PhreeqcCLIBackend:
+    """Runs the phreeqc executable in a scratch directory per input."""
+
+    thread_safe = True
+
+    def __init__(self, executable: str = 'phreeqc', database: Optional[str] = None,
+                 timeout: float = 600):
+        self.executable = shutil.which(executable) or executable
+        self.database = database
+        self.timeout = timeout
+
+    def fingerprint(self) -> str:
+        return stable_hash('phreeqc-cli', self.executable, _file_digest(self.database))
+
+    def run(self, input_text: str) -> str:
+        with tempfile.TemporaryDirectory(prefix='phreeqc_') as work:
+            input_path = os.path.join(work, 'input.pqi')
+            with open(input_path, 'w', encoding='utf-8') as f:
+                f.write(input_text)
+            args = [self.executable, input_path, os.path.join(work, 'output.out')]
+            if self.database:
+                args.append(os.path.abspath(self.database))
+            proc = subprocess.run(args, cwd=work, capture_output=True, text=True, timeout=self.timeout)
+            selected = os.path.join(work, SELECTED_OUTPUT_FILE)
+            if proc.returncode != 0 or not os.path.exists(selected):
+                raise RuntimeError(f"phreeqc failed ({proc.returncode}): {proc.stderr.strip() or proc.stdout[-500:]}")
+            with open(selected, encoding='utf-8') as f:
+                return f.read()
+
+
+# IPhreeqc instances of this process, by backend fingerprint (they hold the
+# loaded database, so each worker process loads it once)
+_engines = {}
+
+
+class PhreeqcLibraryBackend:
+    """IPhreeqc through phreeqpy; one instance per worker process."""
+
+    thread_safe = False
+
+    def __init__(self, database: str, library_path: Optional[str] = None):
+        self.database = os.path.abspath(database)
+        self.library_path = library_path
+        self._fingerprint = stable_hash('phreeqc-lib', library_path, _file_digest(self.database))
+
+    def fingerprint(self) -> str:
+        return self._fingerprint
+
+    def _load(self):
+        try:
+            from phreeqpy.iphreeqc.phreeqc_dll import IPhreeqc
+        except ImportError as e:
+            raise ImportError("PhreeqcLibraryBackend requires phreeqpy (pip install phreeqpy)") from e
+        engine = IPhreeqc(self.library_path) if self.library_path else IPhreeqc()
+        engine.load_database(self.database)
+        return engine
+
+    def run(self, input_text: str) -> str:
+        engine = _engines.get(self._fingerprint)
+        if engine is None:
+            engine = _engines[self._fingerprint] = self._load()
+        engine.run_string(input_text)
+        rows = engine.get_selected_output_array()
+        return "\n".join("\t".join(str(v) for v in row) for row in rows)
+
+
+class StubBackend:
+    """
+    Deterministic stand-in: parses pH, Ca, Mg and the reaction from the
+    input and returns a SELECTED_OUTPUT-shaped table from simple
+    stoichiometry. Not a geochemical model.
+    """
+
+    thread_safe = True
+
+    def fingerprint(self) -> str:
+        return stable_hash('phreeqc-stub', code_fingerprint(type(self)))
+
+    @staticmethod
+    def _value(input_text: str, key: str, default: float = 0.0) -> float:
+        match = re.search(rf"^\s*{re.escape(key)}\s+([-+0-9.eE]+)", input_text, re.MULTILINE)
+        return float(match.group(1)) if match else default
+
+    def run(self, input_text: str) -> str:
+        ph = self._value(input_text, 'pH', 7.0)
+        ca0 = self._value(input_text, 'Ca') / 40078
+        mg0 = self._value(input_text, 'Mg') / 24305
+        olivine = self._value(input_text, 'Mg2SiO4')
+        pyroxene = self._value(input_text, 'CaMgSi2O6')
+        plagioclase = self._value(input_text, 'CaAl2Si2O8')
+        steps = int(re.search(r"in\s+(\d+)\s+steps", input_text).group(1)) if 'steps' in input_text else 1
+
+        header = ['sim', 'step', 'pH', 'reaction', 'Alk(eq/kgw)', 'Ca(mol/kgw)', 'Mg(mol/kgw)']
+        lines = ["\t".join(header)]
+        for step in range(1, steps + 1):
+            fraction = step / steps
+            ca = ca0 + (pyroxene + plagioclase) * fraction
+            mg = mg0 + (2 * olivine + pyroxene) * fraction
+            alk = 2 * (ca - ca0 + mg - mg0)
+            step_ph = ph + np.log10(1 + 0.05 * alk * 1000) * 0.5
+            lines.append("\t".join(f"{v:.6e}" for v in (1, step, step_ph, fraction, alk, ca, mg)))
+        return "\n".join(lines) + "\n"
+
+
+# ── pooled runner ────────────────────────────────────────────────────────
+
+# Keywords that end a TITLE block (the ones used by the templates and .pqi files)
+PHREEQC_KEYWORDS = frozenset({
+    'DATABASE', 'SOLUTION', 'SOLUTION_SPREAD', 'EQUILIBRIUM_PHASES', 'EXCHANGE', 'SURFACE',
+    'GAS_PHASE', 'KINETICS', 'RATES', 'REACTION', 'REACTION_TEMPERATURE', 'MIX', 'USE',
+    'INCREMENTAL_REACTIONS', 'SELECTED_OUTPUT', 'USER_PUNCH', 'USER_PRINT', 'PRINT',
+    'PHASES', 'SOLUTION_SPECIES', 'SAVE', 'KNOBS', 'END',
+})
+
+_DESCRIBED_KEYWORD = re.compile(r"^(SOLUTION|REACTION|EQUILIBRIUM_PHASES|SELECTED_OUTPUT)(\s+\d+)?\b.*$",
+                                re.IGNORECASE)
+
+
+def input_key_text(input_text: str) -> str:
+    """
+    The parts of an input that affect results: comments, TITLE blocks and
+    keyword descriptions (plot IDs, scenario names) are dropped, so plots
+    with identical soil values share one run.
+    """
+    lines = []
+    in_title = False
+    for line in input_text.splitlines():
+        line = line.split('#', 1)[0].rstrip()
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if in_title and stripped.split()[0].upper() in PHREEQC_KEYWORDS:
+            in_title = False
+        if stripped.upper().startswith('TITLE'):
+            in_title = True
+            continue
+        if in_title:
+            continue
+        lines.append(_DESCRIBED_KEYWORD.sub(lambda m: m.group(1).upper() + (m.group(2) or ''), stripped))
+    return "\n".join(lines)
+
+
+def _run_one(backend, input_text: str) -> Dict[str, list]:
+    return {k: v.tolist() for k, v in parse_selected_output(backend.run(input_text)).items()}
+
+
+def run_batch(inputs: Sequence[str], backend=None, n_workers: Optional[int] = None,
+              cache: Optional[ResultCache] = None) -> Dict[str, np.ndarray]:
+    """
+    Run PHREEQC inputs and stack their SELECTED_OUTPUT tables.
+
+    Parameters:
+    -----------
+    inputs : list of str
+        Rendered inputs (see render_inputs)
+    backend : backend object
+        Default: PhreeqcCLIBackend if phreeqc is on PATH, else StubBackend
+    n_workers : int
+        Pool size (default: os.cpu_count()); threads for thread-safe
+        backends, processes otherwise
+    cache : ResultCache
+        Default PHREEQC_CACHE
+
+    Returns:
+    --------
+    dict : 'input' (index into inputs of each row) plus one array per
+           SELECTED_OUTPUT column; columns absent from a run are NaN
+    """
+    backend = default_backend() if backend is None else backend
+    cache = PHREEQC_CACHE if cache is None else cache
+    backend_id = backend.fingerprint()
+
+    keys = [stable_hash('phreeqc', backend_id, input_key_text(text)) for text in inputs]
+    tables = {}
+    pending = {}
+    for key, text in zip(keys, inputs):
+        if key in tables or key in pending:
+            continue
+        hit = cache.get(key)
+        if hit is not None:
+            tables[key] = hit
+        else:
+            pending[key] = text
+
+    if pending:
+        cache.misses += len(pending)
+        n_workers = n_workers or os.cpu_count() or 1
+        if n_workers == 1 or len(pending) == 1:
+            computed = [_run_one(backend, text) for text in pending.values()]
+        else:
+            executor = ThreadPoolExecutor if backend.thread_safe else ProcessPoolExecutor
+            with executor(max_workers=min(n_workers, len(pending))) as pool:
+                computed = list(pool.map(_run_one, [backend] * len(pending), pending.values()))
+        for key, table in zip(pending, computed):
+            cache.put(key, table)
+            tables[key] = table
+
+    names = []
+    for key in dict.fromkeys(keys):
+        names.extend(c for c in tables[key] if c not in names)
+    lengths = [len(next(iter(tables[key].values()), [])) for key in keys]
+
+    result = {'input': np.repeat(np.arange(len(inputs)), lengths)}
+    for name in names:
+        parts = [np.asarray(tables[key].get(name, [np.nan] * n)) for key, n in zip(keys, lengths)]
+        result[name] = np.concatenate(parts) if parts else np.array([])
+    return result
+
+
+def default_backend():
+    return PhreeqcCLIBackend() if shutil.which('phreeqc') else StubBackend()
+
+
+def main():
+    """Render and run lime replacement and full ERW inputs for the 11 plots."""
+    from extended_analysis import ERWScenario
+
+    print("=" * 80)
+    print("PHREEQC BATCH: PER-PLOT BASALT DISSOLUTION")
+    print("=" * 80)
+
+    plots = load_sao_miguel_data()
+    scenarios = [ERWScenario("Lime replacement", 2.7, 0.45, 1750),
+                 ERWScenario("Full ERW (50 t/ha)", 50.0, 0.45, 1750)]
+    inputs = render_inputs(plots, scenarios)
+    backend = default_backend()
+    print(f"Backend:  {type(backend).__name__}")
+    print(f"Inputs:   {len(inputs)} ({len(set(inputs))} distinct)")
+
+    result = run_batch(inputs, backend)
+    last = np.r_[np.flatnonzero(np.diff(result['input'])), len(result['input']) - 1]
+    print()
+    print(f"{'Plot':14s} {'Scenario':20s} {'pH final':>9} {'Alk (eq/kgw)':>13}")
+    for row in last:
+        i = result['input'][row]
+        plot, scenario = plots[i % len(plots)], scenarios[i // len(plots)]
+        print(f"{plot.plot_id:14s} {scenario.name:20s} {result['pH'][row]:9.2f} "
+              f"{result.get('Alk(eq/kgw)', np.full(row + 1, np.nan))[row]:13.4g}")
+    print()
+    print(f"Cache:    {PHREEQC_CACHE.stats()}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Plot Map with Precomputed GeoJSON Tiles
+São Miguel Island, Azores
+
+Maps viability scores, weathering multipliers and CO₂ per plot with
+folium. One marker per plot stalls the browser at island scale, so the
+analyze_table columns are written once to a directory of XYZ tiles:
+
+    tiles/{z}/{x}/{y}.geojson
+
+Below max_zoom every tile holds server-side clusters (plots binned on a
+cluster_px pixel grid aligned to the tiles) with counts, areas,
+area-weighted means, CO₂ totals and the modal rating. At max_zoom the
+tiles hold the individual plots (all analyze_all_plots columns) and,
+if given, their boundary polygons simplified to one pixel. Coordinates
+are rounded to the pixel size of each zoom. index.html is a folium map
+whose script fetches only the tiles in view, so a map of 10^5 plots
+loads a few hundred features at a time.
+
+Browsers do not fetch() from file:// URLs; serve the directory:
+
+    python plot_map.py [output_dir]   # default: a new temporary directory
+    python -m http.server -d <output_dir>
+"""
+
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import shapely
+
+from viability_analysis import RESULT_COLUMNS, ERWViabilityAnalyzer, PlotTable, load_sao_miguel_data
+
+TILE_SIZE = 256  # px, standard XYZ tiles
+MIN_ZOOM = 9  # whole island in a few tiles
+MAX_ZOOM = 15  # individual plots (≈1.2 km tiles)
+CLUSTER_PX = 64  # cluster cell size; must divide TILE_SIZE
+TILE_DIRECTORY = 'tiles'
+
+# Columns averaged (area-weighted) over the plots of a cluster
+CLUSTER_MEAN_COLUMNS = ('total_score', 'weathering_multiplier', 'co2_lime_t_ha_yr', 'co2_full_t_ha_yr',
+                        'benefit_lime_eur_ha_yr', 'benefit_full_eur_ha_yr')
+# Cluster CO₂ totals: name -> per-hectare column summed over plot areas
+CLUSTER_TOTAL_COLUMNS = {'co2_lime_t_yr': 'co2_lime_t_ha_yr', 'co2_full_t_yr': 'co2_full_t_ha_yr'}
+# Popup labels for the properties that are not RESULT_COLUMNS
+MAP_LABELS = {
+    'count': 'Plots',
+    'area_ha': 'Area (ha)',
+    'co2_lime_t_yr': 'CO₂ Lime Repl. (t/yr)',
+    'co2_full_t_yr': 'CO₂ Full ERW (t/yr)',
+}
+# Red (poor) -> yellow -> green (good)
+COLOR_SCALE = ('#d73027', '#fee08b', '#1a9850')
+COLOR_STEPS = 64
+
+
+def mercator_pixels(longitude, latitude, zoom: int):
+    """Web Mercator pixel coordinates at a zoom level (origin at the north-west corner)."""
+    scale = TILE_SIZE * 2.0 ** zoom
+    lat = np.radians(np.clip(latitude, -85.0511, 85.0511))
+    x = (np.asarray(longitude, dtype=float) + 180.0) / 360.0 * scale
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0 * scale
+    return x, y
+
+
+def coordinate_decimals(zoom: int) -> int:
+    """Decimal places of a degree that resolve one pixel at zoom."""
+    return int(math.ceil(math.log10(TILE_SIZE * 2.0 ** zoom / 360.0)))
+
+
+def _palette(vmin: float, vmax: float):
+    """COLOR_STEPS hex colours spanning [vmin, vmax] and the branca colormap they come from."""
+    from branca.colormap import LinearColormap
+    colormap = LinearColormap(list(COLOR_SCALE), vmin=vmin, vmax=vmax)
+    step = (vmax - vmin) / COLOR_STEPS
+    return np.array([colormap.rgb_hex_str(vmin + (i + 0.5) * step) for i in range(COLOR_STEPS)]), colormap
+
+
+def _colors(values: np.ndarray, palette: np.ndarray, vmin: float, vmax: float) -> np.ndarray:
+    index = np.floor((values - vmin) / max(vmax - vmin, 1e-12) * COLOR_STEPS)
+    return palette[np.clip(np.nan_to_num(index), 0, COLOR_STEPS - 1).astype(np.intp)]
+
+
+def _json_list(values: np.ndarray, decimals: Optional[int] = 2) -> list:
+    """Column as a JSON-ready list (rounded, NaN -> null)."""
+    values = np.asarray(values)
+    if values.dtype.kind != 'f':
+        return values.tolist()
+    values = np.round(values, decimals) if decimals is not None else values
+    out = values.tolist()
+    if np.isnan(values).any():
+        out = [None if v != v else v for v in out]
+    return out
+
+
+def _write_tiles(directory: str, zoom: int, tile_x: np.ndarray, tile_y: np.ndarray,
+                 geometries: np.ndarray, properties: Dict[str, list]) -> list:
+    """Write one GeoJSON FeatureCollection per tile; returns the 'x/y' keys written."""
+    names = list(properties)
+    rows = list(zip(*(properties[k] for k in names)))
+    order = np.lexsort((tile_y, tile_x))
+    tiles = np.stack([tile_x[order], tile_y[order]], axis=1)
+    starts = np.flatnonzero(np.r_[True, np.any(tiles[1:] != tiles[:-1], axis=1)])
+    ends = np.r_[starts[1:], len(order)]
+    written = []
+    for start, end in zip(starts, ends):
+        x, y = (int(v) for v in tiles[start])
+        features = ','.join(
+            '{"type":"Feature","geometry":%s,"properties":%s}'
+            % (geometries[i], json.dumps(dict(zip(names, rows[i])), ensure_ascii=False, separators=(',', ':')))
+            for i in order[start:end])
+        path = os.path.join(directory, str(zoom), str(x))
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, f'{y}.geojson'), 'w', encoding='utf-8') as f:
+            f.write('{"type":"FeatureCollection","features":[%s]}' % features)
+        written.append(f'{x}/{y}')
+    return written
+
+
+def build_map_tiles(table: PlotTable,
+                    directory: str,
+                    results: Optional[Dict[str, np.ndarray]] = None,
+                    boundaries: Optional[Sequence] = None,
+                    color_column: str = 'total_score',
+                    min_zoom: int = MIN_ZOOM,
+                    max_zoom: int = MAX_ZOOM,
+                    cluster_px: int = CLUSTER_PX,
+                    analyzer: Optional[ERWViabilityAnalyzer] = None) -> Dict:
+    """
+    Write per-zoom GeoJSON tiles of the plot results.
+
+    Parameters:
+    -----------
+    table : PlotTable
+        Plots; those without longitude / latitude are left off the map
+    directory : str
+        Output directory (tiles go to directory/tiles, existing tiles of
+        the same name are overwritten)
+    results : dict
+        analyze_table output for table (computed if None)
+    boundaries : array of shapely geometries
+        Optional plot polygons (WGS84) drawn at max_zoom instead of points.
+        Each polygon is stored in the tile holding its plot location.
+    color_column : str
+        Result column that sets the feature colour
+    min_zoom, max_zoom : int
+        Zoom range; clusters below max_zoom, plots at max_zoom
+    cluster_px : int
+        Cluster cell size in pixels (a divisor of 256)
+    analyzer : ERWViabilityAnalyzer
+        Used when results is None
+
+    Returns:
+    --------
+    dict : Map metadata - 'tiles' (zoom -> list of 'x/y'), 'bounds',
+           'labels', colour range and plot counts (embedded in index.html)
+    """
+    if TILE_SIZE % cluster_px:
+        raise ValueError(f"cluster_px must divide {TILE_SIZE}, got {cluster_px}")
+    if not min_zoom <= max_zoom:
+        raise ValueError("min_zoom must not exceed max_zoom")
+    if results is None:
+        results = (analyzer or ERWViabilityAnalyzer(table)).analyze_table(table)
+
+    located = np.flatnonzero(~np.isnan(table.longitude) & ~np.isnan(table.latitude))
+    lon, lat = table.longitude[located], table.latitude[located]
+    columns = {k: np.asarray(v)[located] for k, v in results.items()}
+    area = np.nan_to_num(columns['area_ha'])
+    labels = {k: v for k, v in RESULT_COLUMNS.items() if v is not None and k != 'plot_id'}
+    labels.update(MAP_LABELS)
+
+    values = np.asarray(columns[color_column], dtype=float)  # numeric result column
+    finite = values[np.isfinite(values)]
+    vmin, vmax = (np.percentile(finite, [2, 98]) if len(finite) else (0.0, 1.0))
+    vmin, vmax = float(vmin), float(max(vmax, vmin + 1e-9))
+    palette, _ = _palette(vmin, vmax)
+    tile_root = os.path.join(directory, TILE_DIRECTORY)
+
+    metadata = {
+        'min_zoom': min_zoom,
+        'max_zoom': max_zoom,
+        'tile_size': TILE_SIZE,
+        'bounds': [[float(lat.min()), float(lon.min())], [float(lat.max()), float(lon.max())]] if len(located) else None,
+        'color_column': color_column,
+        'color_range': [vmin, vmax],
+        'labels': labels,
+        'plots': int(len(located)),
+        'unlocated': int(len(table) - len(located)),
+        'tiles': {},
+    }
+    if not len(located):
+        return metadata
+
+    px, py = mercator_pixels(lon, lat, max_zoom)
+    n_ratings = len(ERWViabilityAnalyzer.RATING_LABELS)
+    for zoom in range(min_zoom, max_zoom):
+        # Plots binned on a cluster_px grid; a cell never straddles a tile
+        shrink = 2.0 ** (zoom - max_zoom)
+        cx = np.floor(px * shrink / cluster_px).astype(np.int64)
+        cy = np.floor(py * shrink / cluster_px).astype(np.int64)
+        cells, member = np.unique(np.stack([cx, cy], axis=1), axis=0, return_inverse=True)
+        member = member.ravel()
+        n = len(cells)
+        count = np.bincount(member, minlength=n)
+        cell_area = np.bincount(member, weights=area, minlength=n)
+        weight = np.where(cell_area[member] > 0, area, 1.0)  # plain mean for clusters without area
+        weight_sum = np.bincount(member, weights=weight, minlength=n)
+        properties = {'count': count.tolist(), 'area_ha': _json_list(cell_area, 1)}
+        for name in CLUSTER_MEAN_COLUMNS:
+            mean = np.bincount(member, weights=weight * columns[name], minlength=n) / weight_sum
+            properties[name] = _json_list(mean)
+        for name, column in CLUSTER_TOTAL_COLUMNS.items():
+            properties[name] = _json_list(np.bincount(member, weights=area * columns[column], minlength=n), 1)
+        ratings = np.bincount(member * n_ratings + columns['rating_code'], minlength=n * n_ratings)
+        properties['rating_code'] = ERWViabilityAnalyzer.rating_labels(
+            ratings.reshape(n, n_ratings).argmax(axis=1)).tolist()
+        color = np.bincount(member, weights=weight * np.nan_to_num(values), minlength=n) / weight_sum
+        properties['color'] = _colors(color, palette, vmin, vmax).tolist()
+
+        decimals = coordinate_decimals(zoom)
+        centre_lon = np.round(np.bincount(member, weights=lon, minlength=n) / count, decimals)
+        centre_lat = np.round(np.bincount(member, weights=lat, minlength=n) / count, decimals)
+        per_tile = TILE_SIZE // cluster_px
+        metadata['tiles'][zoom] = _write_tiles(
+            tile_root, zoom, cells[:, 0] // per_tile, cells[:, 1] // per_tile,
+            shapely.to_geojson(shapely.points(centre_lon, centre_lat)), properties)
+
+    # Individual plots
+    decimals = coordinate_decimals(max_zoom)
+    if boundaries is not None:
+        pixel_deg = 360.0 / (TILE_SIZE * 2.0 ** max_zoom)
+        shapes = np.asarray(boundaries, dtype=object)[located]
+        shapes = shapely.set_precision(shapely.simplify(shapes, pixel_deg, preserve_topology=True), 10.0 ** -decimals)
+        points = shapely.points(np.round(lon, decimals), np.round(lat, decimals))
+        geometries = shapely.to_geojson(np.where(shapely.is_empty(shapes) | shapely.is_missing(shapes),
+                                                 points, shapes))
+    else:
+        geometries = shapely.to_geojson(shapely.points(np.round(lon, decimals), np.round(lat, decimals)))
+    properties = {'plot_id': np.asarray(columns['plot_id']).astype(str).tolist()}
+    for name in RESULT_COLUMNS:
+        if name == 'plot_id':
+            continue
+        if name == 'rating_code':
+            properties[name] = ERWViabilityAnalyzer.rating_labels(columns[name]).tolist()
+        else:
+            properties[name] = _json_list(columns[name], 3)
+    properties['color'] = _colors(values, palette, vmin, vmax).tolist()
+    metadata['tiles'][max_zoom] = _write_tiles(
+        tile_root, max_zoom, np.floor(px / TILE_SIZE).astype(np.int64), np.floor(py / TILE_SIZE).astype(np.int64),
+        geometries, properties)
+    return metadata
+
+
+def _tile_layer_class():
+    from branca.element import MacroElement
+    from jinja2 import Template
+
+    class GeoJsonTiles(MacroElement):
+        """Loads the GeoJSON tiles in view on every map move."""
+
+        _template = Template("""
+{% macro script(this, kwargs) %}
+(function() {
+    var map = {{ this._parent.get_name() }};
+    var meta = {{ this.metadata_json }};
+    var available = {}, layers = {}, cache = {}, wanted = {};
+    Object.keys(meta.tiles).forEach(function(z) { available[z] = new Set(meta.tiles[z]); });
+
+    function describe(p) {
+        return Object.keys(meta.labels).filter(function(k) { return p[k] !== undefined && p[k] !== null; })
+            .map(function(k) { return '<b>' + meta.labels[k] + '</b>: ' + p[k]; }).join('<br>');
+    }
+    function render(data, z) {
+        return L.geoJSON(data, {
+            pointToLayer: function(f, latlng) {
+                var n = f.properties.count || 1;
+                return L.circleMarker(latlng, {radius: n > 1 ? 5 + 2.5 * Math.log2(n) : 5, color: '#333',
+                                               weight: 1, fillColor: f.properties.color, fillOpacity: 0.8});
+            },
+            style: function(f) { return {color: f.properties.color, weight: 1, fillOpacity: 0.6}; },
+            onEachFeature: function(f, layer) {
+                if (z < meta.max_zoom) {
+                    layer.bindTooltip(describe(f.properties));
+                    layer.on('click', function(e) { map.setView(e.latlng, Math.min(z + 2, meta.max_zoom)); });
+                } else {
+                    layer.bindPopup('<b>' + f.properties.plot_id + '</b><br>' + describe(f.properties));
+                }
+            }
+        });
+    }
+    function show(key, z) {
+        if (wanted[key] && !layers[key]) layers[key] = render(cache[key], z).addTo(map);
+    }
+    function update() {
+        var z = Math.max(meta.min_zoom, Math.min(meta.max_zoom, map.getZoom()));
+        var bounds = map.getBounds();
+        var nw = map.project(bounds.getNorthWest(), z).divideBy(meta.tile_size).floor();
+        var se = map.project(bounds.getSouthEast(), z).divideBy(meta.tile_size).floor();
+        wanted = {};
+        for (var x = nw.x; x <= se.x; x++) {
+            for (var y = nw.y; y <= se.y; y++) {
+                if (available[z] && available[z].has(x + '/' + y)) wanted[z + '/' + x + '/' + y] = true;
+            }
+        }
+        Object.keys(layers).forEach(function(key) {
+            if (!wanted[key]) { map.removeLayer(layers[key]); delete layers[key]; }
+        });
+        Object.keys(wanted).forEach(function(key) {
+            if (cache[key]) { show(key, z); return; }
+            fetch(meta.url + key + '.geojson').then(function(r) { return r.json(); })
+                .then(function(data) { cache[key] = data; show(key, z); });
+        });
+    }
+    map.on('moveend', update);
+    update();
+})();
+{% endmacro %}
+""")
+
+        def __init__(self, metadata: Dict, url: str):
+            super().__init__()
+            self._name = 'GeoJsonTiles'
+            # json.dumps keeps the label order (tojson sorts keys)
+            self.metadata_json = json.dumps(dict(metadata, url=url)).replace('</', '<\\/')
+
+    return GeoJsonTiles
+
+
+def export_plot_map(table: PlotTable, directory: str, results: Optional[Dict[str, np.ndarray]] = None,
+                    tiles: str = 'OpenStreetMap', **tile_kwargs) -> str:
+    """
+    Write the tiles and a folium map (directory/index.html) that loads them.
+
+    tile_kwargs are passed to build_map_tiles. Returns the HTML path.
+    """
+    import folium
+
+    metadata = build_map_tiles(table, directory, results, **tile_kwargs)
+    if metadata['bounds'] is None:
+        raise ValueError("No plot has a longitude / latitude to map")
+    (south, west), (north, east) = metadata['bounds']
+    fmap = folium.Map(location=[(south + north) / 2, (west + east) / 2], zoom_start=metadata['min_zoom'],
+                      min_zoom=max(metadata['min_zoom'] - 2, 0), tiles=tiles, prefer_canvas=True)
+    fmap.fit_bounds(metadata['bounds'])
+    _tile_layer_class()(metadata, url=TILE_DIRECTORY + '/').add_to(fmap)
+    _, colormap = _palette(*metadata['color_range'])
+    colormap.caption = metadata['labels'].get(metadata['color_column'], metadata['color_column'])
+    colormap.add_to(fmap)
+    path = os.path.join(directory, 'index.html')
+    fmap.save(path)
+    return path
+
+
+def synthetic_plots(n: int = 100_000, seed: int = 0) -> PlotTable:
+    """Sanguinho soils resampled onto n random locations across São Miguel."""
+    from climate_layers import SAO_MIGUEL_BOUNDS, assign_climate, synthetic_climate
+    from spatial_index import METRIC_CRS, PLOT_CRS
+    from pyproj import Transformer
+
+    rng = np.random.default_rng(seed)
+    base = PlotTable.from_plots(load_sao_miguel_data())
+    columns = {name: np.resize(values, n) for name, values in base.columns.items()}
+    columns['ph'] = np.clip(rng.normal(5.6, 0.4, n), 4.5, 7.5)
+    columns['organic_matter'] = np.clip(rng.normal(9.0, 2.5, n), 1.0, None)
+    columns['exchangeable_mg'] = np.clip(rng.normal(0.75, 0.25, n), 0.05, None)
+    columns['area_ha'] = rng.uniform(0.1, 1.3, n)
+    # Uniform over the ellipse inscribed in the island's bounding box
+    x_min, y_min, x_max, y_max = SAO_MIGUEL_BOUNDS
+    r, theta = np.sqrt(rng.uniform(0, 1, n)), rng.uniform(0, 2 * np.pi, n)
+    x = (x_min + x_max) / 2 + r * np.cos(theta) * (x_max - x_min) / 2
+    y = (y_min + y_max) / 2 + r * np.sin(theta) * (y_max - y_min) / 2
+    columns['longitude'], columns['latitude'] = Transformer.from_crs(
+        METRIC_CRS, PLOT_CRS, always_xy=True).transform(x, y)
+    table = PlotTable(columns, plot_id=np.array([f"SM-{i:06d}" for i in range(n)], dtype=object))
+    assign_climate(table, **synthetic_climate())
+    return table
+
+
+def main(directory: Optional[str] = None):
+    """
+    Map of 100,000 synthetic plots.
+
+    Parameters:
+    -----------
+    directory : str
+        Output directory (default: a new temporary directory, kept so the
+        map can be served)
+    """
+    directory = directory or tempfile.mkdtemp(prefix='erw_plot_map_')
+    print("=" * 80)
+    print("🗺️  PLOT MAP (precomputed GeoJSON tiles)")
+    print("=" * 80)
+    table = synthetic_plots()
+    results = ERWViabilityAnalyzer(table).analyze_table(table)
+    start = time.perf_counter()
+    path = export_plot_map(table, directory, results)
+    elapsed = time.perf_counter() - start
+    with open(os.path.join(directory, 'index.html'), encoding='utf-8') as f:
+        html_kb = len(f.read().encode()) / 1024
+    metadata_tiles = {}
+    for root, _, files in os.walk(os.path.join(directory, TILE_DIRECTORY)):
+        zoom = os.path.relpath(root, os.path.join(directory, TILE_DIRECTORY)).split(os.sep)[0]
+        for name in files:
+            sizes = metadata_tiles.setdefault(zoom, [])
+            sizes.append(os.path.getsize(os.path.join(root, name)))
+    print(f"  {len(table):,} plots written in {elapsed:.1f} s ({html_kb:,.0f} KB map page)")
+    print(f"  {'Zoom':>4} {'Tiles':>7} {'Largest tile':>14} {'Total':>10}")
+    for zoom in sorted(metadata_tiles, key=int):
+        sizes = metadata_tiles[zoom]
+        print(f"  {zoom:>4} {len(sizes):>7,} {max(sizes) / 1024:>11,.0f} KB {sum(sizes) / 1024 ** 2:>7,.1f} MB")
+    print()
+    print(f"  Written to {directory}")
+    print(f"  Serve with: python -m http.server -d {directory}   (then open {os.path.basename(path)})")
+    print()
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Partitioned Columnar Result Store (Parquet / Arrow IPC)
+São Miguel Island, Azores
+
+Writes analyze_table results (or an analyze_all_plots DataFrame) to a
+hive-partitioned Parquet or Arrow IPC dataset without recomputing them:
+
+    results/island=São Miguel/parish=Povoação/run_id=2026-10-18/part-<id>-0.parquet
+
+Every write appends new part files, so incremental batches (soil_ingest
+chunks, parallel shards, later runs) never rewrite earlier data. Columns
+keep the analyze_table names, ratings are a dictionary-encoded 'rating'
+column (int8 codes + the six labels, instead of an emoji string per
+row), and each field carries its analyze_all_plots display name as
+metadata. Readers ask for the columns and partitions they need and
+Arrow reads only those column chunks and directories.
+
+Requires pyarrow (pinned in requirements.txt).
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError as exc:
+    raise ImportError("result_store requires pyarrow "
+                      "(pip install -r requirements.txt, or pip install pyarrow)") from exc
+
+from viability_analysis import RESULT_COLUMNS, ERWViabilityAnalyzer, PlotTable
+
+# Extension and pyarrow.dataset format name per store format
+FORMATS = {'parquet': ('parquet', 'parquet'), 'arrow': ('arrow', 'ipc')}
+DEFAULT_PARTITIONS = ('run_id',)
+COMPRESSION = 'zstd'
+_LABEL_TO_KEY = {label: key for key, label in RESULT_COLUMNS.items() if label is not None}
+
+
+def new_run_id() -> str:
+    """Sortable run identifier (UTC timestamp)."""
+    return time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())
+
+
+def _result_columns(results: Union[Mapping[str, np.ndarray], pd.DataFrame],
+                    labels: Sequence[str]) -> Dict[str, np.ndarray]:
+    """analyze_table dict, or analyze_all_plots DataFrame mapped back to its keys and rating codes."""
+    if isinstance(results, pd.DataFrame):
+        columns = {_LABEL_TO_KEY.get(name, name): results[name].to_numpy() for name in results.columns}
+        if 'rating_code' in columns:
+            codes = pd.Categorical(columns['rating_code'], categories=list(labels)).codes
+            if (codes < 0).any():
+                raise ValueError("DataFrame has ratings that are not in the rating labels")
+            columns['rating_code'] = codes.astype(np.int8)
+        return columns
+    return dict(results)
+
+
+def results_table(results: Union[Mapping[str, np.ndarray], pd.DataFrame],
+                  labels: Sequence[str] = ERWViabilityAnalyzer.RATING_LABELS,
+                  **values) -> pa.Table:
+    """
+    Results as an Arrow table.
+
+    Parameters:
+    -----------
+    results : dict or DataFrame
+        analyze_table output (extra per-plot arrays, e.g. join_plots'
+        'parish', are kept) or an analyze_all_plots DataFrame (which has
+        no area_ha column)
+    labels : sequence of str
+        Rating labels indexed by rating_code (a rubric's labels if one
+        was used)
+    values :
+        Extra columns: a scalar for every row (run_id='...') or an array
+
+    Returns:
+    --------
+    pa.Table : 'rating' is dictionary<int8, string>; fields carry their
+               display name under the 'label' metadata key
+    """
+    columns = _result_columns(results, labels)
+    n = len(next(iter(columns.values())))
+    arrays, fields = [], []
+    for name, column in columns.items():
+        if name == 'rating_code':
+            name = 'rating'
+            array = pa.DictionaryArray.from_arrays(pa.array(np.asarray(column, dtype=np.int8)),
+                                                   pa.array(list(labels), type=pa.string()))
+        elif name == 'plot_id' and np.asarray(column).dtype == object:
+            array = pa.array(np.asarray(column).astype(str))
+        else:
+            array = pa.array(column)
+        label = RESULT_COLUMNS.get('rating_code' if name == 'rating' else name)
+        fields.append(pa.field(name, array.type, metadata={'label': label} if label else None))
+        arrays.append(array)
+    for name, value in values.items():
+        array = pa.array(value) if np.ndim(value) else pa.array([value] * n)
+        if len(array) != n:
+            raise ValueError(f"Column '{name}' has length {len(array)}, expected {n}")
+        fields.append(pa.field(name, array.type))
+        arrays.append(array)
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+class ResultWriter:
+    """
+    Appends result batches to a partitioned dataset.
+
+    Parameters:
+    -----------
+    root : str
+        Dataset directory (created if missing; existing parts are kept)
+    partition_by : sequence of str
+        Hive partition columns, e.g. ('island', 'parish', 'run_id'). Each
+        must be given per write (array or scalar) or in values.
+    format : str
+        'parquet' or 'arrow' (Arrow IPC / Feather v2)
+    labels : sequence of str
+        Rating labels (default: ERWViabilityAnalyzer.RATING_LABELS)
+    values : dict
+        Columns added to every batch (e.g. {'island': 'São Miguel',
+        'run_id': new_run_id()})
+
+    The schema of the first batch (or of an existing dataset) is fixed;
+    later batches with different columns or types raise ValueError.
+    """
+
+    def __init__(self, root: str, partition_by: Sequence[str] = DEFAULT_PARTITIONS, format: str = 'parquet',
+                 labels: Sequence[str] = ERWViabilityAnalyzer.RATING_LABELS,
+                 values: Optional[Mapping] = None, compression: str = COMPRESSION):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown format '{format}' (use {', '.join(FORMATS)})")
+        self.root = root
+        self.partition_by = tuple(partition_by)
+        self.format = format
+        self.labels = tuple(labels)
+        self.values = dict(values or {})
+        self.extension, dataset_format = FORMATS[format]
+        file_format = ds.ParquetFileFormat() if dataset_format == 'parquet' else ds.IpcFileFormat()
+        self._file_options = file_format.make_write_options(
+            **({'compression': compression} if dataset_format == 'parquet'
+               else {'compression': pa.Codec(compression) if compression else None}))
+        self._dataset_format = dataset_format
+        self.schema = None
+        self.files: List[str] = []
+        self.rows_written = 0
+        if os.path.isdir(root) and any(os.scandir(root)):
+            self.schema = open_results(root, format).schema
+
+    def write(self, results: Union[Mapping[str, np.ndarray], pd.DataFrame], **values) -> List[str]:
+        """Append one batch; returns the files written."""
+        table = results_table(results, self.labels, **{**self.values, **values})
+        missing = [name for name in self.partition_by if name not in table.column_names]
+        if missing:
+            raise ValueError(f"Missing partition column(s): {', '.join(missing)}")
+        partition_schema = pa.schema([pa.field(name, pa.string()) for name in self.partition_by])
+        table = table.cast(pa.schema([
+            pa.field(f.name, pa.string()) if f.name in self.partition_by else f for f in table.schema]))
+        self._check_schema(table.schema)
+
+        written = []
+        ds.write_dataset(
+            table, self.root, format=self._dataset_format, file_options=self._file_options,
+            partitioning=ds.partitioning(partition_schema, flavor='hive'),
+            basename_template=f'part-{uuid.uuid4().hex}-{{i}}.{self.extension}',
+            existing_data_behavior='overwrite_or_ignore',
+            file_visitor=lambda f: written.append(f.path))
+        self.files.extend(written)
+        self.rows_written += table.num_rows
+        return written
+
+    def write_batches(self, batches: Iterable, **values) -> int:
+        """Append every batch of an iterable (e.g. per-chunk results); returns rows written."""
+        start = self.rows_written
+        for batch in batches:
+            self.write(batch, **values)
+        return self.rows_written - start
+
+    def _check_schema(self, schema: pa.Schema):
+        # Names and types of the stored columns; dictionaries compare by value
+        # type (Parquet reads int8 codes back as int32)
+        def signature(s):
+            return {f.name: ('dictionary', f.type.value_type) if pa.types.is_dictionary(f.type) else f.type
+                    for f in s if f.name not in self.partition_by}
+        if self.schema is None:
+            self.schema = schema
+            return
+        new, expected = signature(schema), signature(self.schema)
+        if new != expected:
+            differences = [f"missing {name}" for name in expected if name not in new]
+            differences += [f"unexpected {name}" for name in new if name not in expected]
+            differences += [f"{name}: {new[name]} instead of {expected[name]}"
+                            for name in new if name in expected and new[name] != expected[name]]
+            raise ValueError(f"Batch does not match the dataset schema at {self.root} ({'; '.join(differences)})")
+
+
+def write_results(results: Union[Mapping[str, np.ndarray], pd.DataFrame], root: str,
+                  partition_by: Sequence[str] = DEFAULT_PARTITIONS, format: str = 'parquet',
+                  labels: Sequence[str] = ERWViabilityAnalyzer.RATING_LABELS, **values) -> List[str]:
+    """Append one batch to the dataset at root (see ResultWriter)."""
+    return ResultWriter(root, partition_by, format, labels).write(results, **values)
+
+
+def open_results(root: str, format: str = 'parquet') -> ds.Dataset:
+    """The dataset at root, with hive partition columns as dictionary strings."""
+    extension, dataset_format = FORMATS[format]
+    return ds.dataset(root, format=dataset_format, exclude_invalid_files=False,
+                      partitioning=ds.HivePartitioning.discover(infer_dictionary=True),
+                      ignore_prefixes=['.', '_'])
+
+
+def read_results(root: str, columns: Optional[Sequence[str]] = None,
+                 filter: Optional[Union[ds.Expression, Mapping]] = None,
+                 format: str = 'parquet') -> pa.Table:
+    """
+    Read selected columns and partitions.
+
+    Parameters:
+    -----------
+    columns : list of str
+        Columns to read (default: all); other column chunks are not read
+    filter : pyarrow.dataset.Expression or dict
+        Row filter; a dict {column: value} matches equality on each, and
+        conditions on partition columns skip whole directories
+
+    Returns:
+    --------
+    pa.Table (to_pandas() gives ratings and partitions as categoricals)
+    """
+    if isinstance(filter, Mapping):
+        expression = None
+        for name, value in filter.items():
+            term = ds.field(name) == value
+            expression = term if expression is None else expression & term
+        filter = expression
+    return open_results(root, format).to_table(columns=columns, filter=filter)
+
+
+def main():
+    """Three incremental runs of 200,000 plots written by parish, then a narrow read."""
+    print("=" * 80)
+    print("🗄️  PARTITIONED RESULT STORE")
+    print("=" * 80)
+    rng = np.random.default_rng(0)
+    n = 200_000
+    table = PlotTable({'ph': rng.normal(5.6, 0.4, n), 'organic_matter': rng.normal(9, 2.5, n),
+                       'exchangeable_ca': rng.normal(6, 1.5, n), 'exchangeable_mg': rng.normal(0.8, 0.3, n),
+                       'exchangeable_k': np.full(n, 0.6), 'cec': rng.normal(15, 3, n),
+                       'base_saturation': np.full(n, 45.0), 'p_extractable': np.full(n, 40.0),
+                       'k_extractable': np.full(n, 200.0), 'area_ha': rng.uniform(0.2, 2.0, n)},
+                      plot_id=np.array([f"SM-{i:06d}" for i in range(n)], dtype=object))
+    parishes = np.array(['Povoação', 'Furnas', 'Ribeira Grande', 'Ponta Delgada', 'Nordeste'])[rng.integers(0, 5, n)]
+
+    root = tempfile.mkdtemp(prefix='erw_results_')
+    try:
+        for i, efficiency in enumerate((0.35, 0.45, 0.55)):
+            analyzer = ERWViabilityAnalyzer(table)
+            analyzer.WEATHERING_EFFICIENCY = efficiency
+            results = analyzer.analyze_table(table)
+            writer = ResultWriter(root, partition_by=('island', 'parish', 'run_id'),
+                                  values={'island': 'São Miguel', 'run_id': f'efficiency-{efficiency:.2f}'})
+            start = time.perf_counter()
+            # Two halves per run stand in for incremental ingest chunks
+            for half in (slice(0, n // 2), slice(n // 2, n)):
+                writer.write({k: v[half] for k, v in results.items()}, parish=parishes[half])
+            print(f"  Run {i + 1}: {writer.rows_written:,} rows in {len(writer.files)} files "
+                  f"({time.perf_counter() - start:.2f} s)")
+
+        size_mb = sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(root) for f in fs) / 1024 ** 2
+        print(f"  Dataset: {size_mb:.1f} MB on disk")
+        start = time.perf_counter()
+        subset = read_results(root, columns=['plot_id', 'rating', 'co2_lime_t_ha_yr'],
+                              filter={'parish': 'Furnas', 'run_id': 'efficiency-0.45'})
+        elapsed = time.perf_counter() - start
+        print(f"  Furnas, efficiency 0.45: {subset.num_rows:,} rows × {subset.num_columns} columns "
+              f"read in {elapsed * 1000:.0f} ms (rating type: {subset.schema.field('rating').type})")
+        print(subset.to_pandas()['rating'].value_counts().to_string())
+    finally:
+        shutil.rmtree(root)
+    print()
+
+
+if __name__ == "__main__":
+    main()
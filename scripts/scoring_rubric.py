@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Declarative Viability Scoring Rubrics
+São Miguel Island, Azores
+
+The viability score is a sum of threshold ladders (pH, organic matter,
+Mg deficit, CEC, rainfall, temperature) mapped to a star rating. A rubric
+file lists those ladders so agronomists on other islands can change
+breakpoints and points without touching the analyzer:
+
+    name = "São Miguel"
+
+    [factors.ph]
+    column = "ph"
+    breakpoints = [5.2, 5.5, 5.8, 6.0, 6.5, 7.0]
+    points = [30, 29, 27, 25, 20, 15, 5]
+    side = "left"
+
+    [factors.temperature]
+    column = "temperature_c"
+    breakpoints = [12, 15, 20, 23]
+    points = [5, 8, 10, 8, 5]
+    side = ["right", "right", "left", "left"]
+    fill = 18
+
+    [rating]
+    thresholds = [50, 60, 70, 80, 90]
+    labels = ["⭐ MARGINAL", ...]
+
+points[i] is awarded between breakpoints[i-1] and breakpoints[i]. side
+says which band a value equal to a breakpoint falls in, as for the
+analyzer's *_LADDER constants: 'left' = the lower band (value <= b),
+'right' = the upper band (value >= b); a list sets it per breakpoint.
+NaN values take `fill` when given and otherwise score `missing` (default:
+the else branch of the equivalent if/elif chain); an optional column
+absent from the plot data (e.g. no climate columns) counts as all NaN.
+Columns are any PlotTable column or mg_deficit / mg_ca_ratio. Scores
+carry the same keys as ERWViabilityAnalyzer.score_batch, plus one
+'<factor>_score' per factor; 'climate_score' sums the factors on the
+climate columns.
+
+Rubrics compile once to one sorted edge array and one points table per
+factor, so scoring is a single searchsorted and a gather per factor.
+RubricSet compiles several rubrics together: factors on the same column
+share one searchsorted over the union of their edges, and the plot table
+is read once, block by block, for all of them.
+"""
+
+import json
+import os
+import time
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from viability_analysis import (PLOT_CLIMATE_FIELDS, PLOT_FIELD_DEFAULTS, ERWViabilityAnalyzer, PlotTable,
+                                load_sao_miguel_data)
+
+SIDES = ('left', 'right')
+BLOCK_ROWS = 1 << 16  # rows per block in RubricSet.score
+DEFAULT_RUBRIC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'rubrics',
+                                   'sao_miguel.toml')
+
+# Columns derived from PlotTable fields when scoring a plain dict of arrays
+DERIVED_COLUMNS = {
+    'mg_deficit': lambda c: np.fmax(0.0, 1.5 - np.asarray(c['exchangeable_mg'], dtype=float)),
+    'mg_ca_ratio': lambda c: np.divide(np.asarray(c['exchangeable_mg'], dtype=float),
+                                       np.asarray(c['exchangeable_ca'], dtype=float),
+                                       out=np.zeros(len(c['exchangeable_mg'])),
+                                       where=np.asarray(c['exchangeable_ca']) > 0),
+}
+
+
+class Factor:
+    """
+    One threshold ladder of a rubric.
+
+    Parameters:
+    -----------
+    name : str
+        Factor name; scores are returned as '<name>_score'
+    column : str
+        Plot column scored
+    breakpoints : sequence of float
+        Strictly increasing thresholds
+    points : sequence of float
+        len(breakpoints) + 1 band scores, lowest band first
+    side : str or sequence of str
+        'left' or 'right', for all breakpoints or per breakpoint
+    fill : float
+        Value used for NaN inputs (e.g. an island climate constant)
+    missing : float
+        Score for NaN inputs when fill is None
+    """
+
+    def __init__(self, name: str, column: str, breakpoints: Sequence[float], points: Sequence[float],
+                 side: Union[str, Sequence[str]] = 'right', fill: Optional[float] = None,
+                 missing: Optional[float] = None):
+        self.name = name
+        self.column = column
+        self.breakpoints = tuple(float(b) for b in breakpoints)
+        self.points = tuple(float(p) for p in points)
+        self.side = (side,) * len(self.breakpoints) if isinstance(side, str) else tuple(side)
+        if len(self.points) != len(self.breakpoints) + 1:
+            raise ValueError(f"Factor '{name}': expected {len(self.breakpoints) + 1} points, got {len(self.points)}")
+        if np.any(np.diff(self.breakpoints) <= 0):
+            raise ValueError(f"Factor '{name}': breakpoints must be strictly increasing")
+        if len(self.side) != len(self.breakpoints) or any(s not in SIDES for s in self.side):
+            raise ValueError(f"Factor '{name}': side must be 'left', 'right' or one of them per breakpoint")
+        self.fill = None if fill is None else float(fill)
+        if missing is None:
+            # if/elif chains: every comparison fails for NaN -> else branch
+            missing = self.points[0] if self.side and self.side[0] == 'right' else self.points[-1]
+        self.missing = float(missing)
+
+    @property
+    def edges(self) -> np.ndarray:
+        """
+        Breakpoints for searchsorted(..., side='right'): a 'left' breakpoint
+        b becomes the next float above b, so a value equal to b stays below.
+        """
+        edges = np.array(self.breakpoints, dtype=float)
+        left = np.array([s == 'left' for s in self.side], dtype=bool)
+        edges[left] = np.nextafter(edges[left], np.inf)
+        return edges
+
+    def nan_points(self) -> float:
+        if self.fill is None:
+            return self.missing
+        return self.points[int(np.searchsorted(self.edges, self.fill, side='right'))]
+
+    def to_dict(self) -> Dict:
+        side = self.side[0] if len(set(self.side)) == 1 else list(self.side)
+        data = {'column': self.column, 'breakpoints': list(self.breakpoints), 'points': list(self.points),
+                'side': side or 'right'}
+        if self.fill is not None:
+            data['fill'] = self.fill
+        return data
+
+
+class Rubric:
+    """
+    Named set of factors and the rating scale applied to their total.
+
+    Build with from_file / from_dict, or from_analyzer for the rubric
+    hard-coded in ERWViabilityAnalyzer. score() compiles on first use.
+    """
+
+    def __init__(self, name: str, factors: Sequence[Factor],
+                 thresholds: Sequence[float] = ERWViabilityAnalyzer.RATING_THRESHOLDS,
+                 labels: Sequence[str] = ERWViabilityAnalyzer.RATING_LABELS):
+        if len({f.name for f in factors}) != len(factors):
+            raise ValueError(f"Rubric '{name}': factor names must be unique")
+        if len(labels) != len(thresholds) + 1:
+            raise ValueError(f"Rubric '{name}': expected {len(thresholds) + 1} rating labels, got {len(labels)}")
+        if np.any(np.diff(thresholds) <= 0):
+            raise ValueError(f"Rubric '{name}': rating thresholds must be strictly increasing")
+        self.name = name
+        self.factors = list(factors)
+        self.thresholds = tuple(float(t) for t in thresholds)
+        self.labels = tuple(labels)
+        self._compiled = None
+
+    @classmethod
+    def from_dict(cls, data: Mapping, name: Optional[str] = None) -> 'Rubric':
+        factors = [Factor(factor_name, **spec) for factor_name, spec in data['factors'].items()]
+        rating = data.get('rating', {})
+        return cls(name or data.get('name', 'rubric'), factors,
+                   rating.get('thresholds', ERWViabilityAnalyzer.RATING_THRESHOLDS),
+                   rating.get('labels', ERWViabilityAnalyzer.RATING_LABELS))
+
+    @classmethod
+    def from_file(cls, path: str) -> 'Rubric':
+        """Load a .toml or .json rubric (the file stem is the default name)."""
+        ext = os.path.splitext(path)[1].lower()
+        if ext == '.toml':
+            try:
+                import tomllib
+            except ImportError:  # Python < 3.11
+                try:
+                    import tomli as tomllib
+                except ImportError as e:
+                    raise ImportError("TOML rubrics require Python 3.11+ or tomli (pip install tomli)") from e
+            with open(path, 'rb') as f:
+                data = tomllib.load(f)
+        elif ext == '.json':
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        else:
+            raise ValueError(f"Unsupported rubric format '{ext}' (use .toml or .json)")
+        return cls.from_dict(data, name=data.get('name', os.path.splitext(os.path.basename(path))[0]))
+
+    @classmethod
+    def from_analyzer(cls, analyzer: Union[ERWViabilityAnalyzer, type] = ERWViabilityAnalyzer,
+                      name: str = 'São Miguel') -> 'Rubric':
+        """The analyzer's built-in ladders (with any instance overrides) as a rubric."""
+        factors = [Factor(factor_name, column, breakpoints, points, side)
+                   for factor_name, column, (breakpoints, points, side) in (
+                       ('ph', 'ph', analyzer.PH_LADDER),
+                       ('om', 'organic_matter', analyzer.OM_LADDER),
+                       ('mg', 'mg_deficit', analyzer.MG_DEFICIT_LADDER),
+                       ('cec', 'cec', analyzer.CEC_LADDER))]
+        breakpoints, points, side = analyzer.RAINFALL_LADDER
+        factors.append(Factor('rainfall', 'annual_rainfall_mm', breakpoints, points, side,
+                              fill=analyzer.ANNUAL_RAINFALL_MM))
+        # Temperature bands are inclusive towards the optimum (see climate_score_batch)
+        breakpoints, points = analyzer.TEMPERATURE_BANDS
+        factors.append(Factor('temperature', 'temperature_c', breakpoints, points,
+                              ('right', 'right', 'left', 'left'), fill=analyzer.AVG_TEMPERATURE_C))
+        return cls(name, factors, analyzer.RATING_THRESHOLDS, analyzer.RATING_LABELS)
+
+    def to_dict(self) -> Dict:
+        return {'name': self.name,
+                'factors': {f.name: f.to_dict() for f in self.factors},
+                'rating': {'thresholds': list(self.thresholds), 'labels': list(self.labels)}}
+
+    @property
+    def max_score(self) -> float:
+        return sum(max(f.points) for f in self.factors)
+
+    def score(self, columns, block_rows: int = BLOCK_ROWS) -> Dict[str, np.ndarray]:
+        """
+        Score every plot.
+
+        Returns:
+        --------
+        dict : 'mg_deficit', '<factor>_score' arrays, 'climate_score'
+               (climate factors summed), 'total_score' and 'rating_code'
+               (index into self.labels)
+        """
+        if self._compiled is None:
+            self._compiled = RubricSet([self])
+        return self._compiled.score(columns, block_rows)[self.name]
+
+    def rating_codes(self, scores) -> np.ndarray:
+        scores = np.asarray(scores, dtype=float)
+        codes = np.searchsorted(np.asarray(self.thresholds), scores, side='right')
+        return np.where(np.isnan(scores), 0, codes).astype(np.int8)
+
+    def rating_labels(self, codes) -> np.ndarray:
+        return np.asarray(self.labels, dtype=object)[np.asarray(codes)]
+
+    def __getstate__(self):
+        # Recompiled on first use after unpickling (e.g. in pool workers)
+        return dict(self.__dict__, _compiled=None)
+
+    def __repr__(self) -> str:
+        return f"Rubric({self.name!r}, factors={[f.name for f in self.factors]})"
+
+
+def _column(columns, name: str, n: int) -> np.ndarray:
+    if isinstance(columns, PlotTable):
+        return getattr(columns, name)
+    if name in columns:
+        return np.asarray(columns[name], dtype=float)
+    if name in DERIVED_COLUMNS:
+        return DERIVED_COLUMNS[name](columns)
+    if name in PLOT_FIELD_DEFAULTS:
+        # As PlotTable.from_columns: absent optional columns take their default (NaN for climate)
+        return np.full(n, PLOT_FIELD_DEFAULTS[name], dtype=float)
+    raise KeyError(f"Rubric column '{name}' is not in the plot data")
+
+
+class RubricSet:
+    """
+    Several rubrics compiled into shared lookup kernels.
+
+    For each plot column, the factors scoring it (in any rubric) share one
+    sorted edge array (the union of their edges); each factor keeps a
+    points table indexed by position in that array, with a final slot
+    for NaN. Scoring a block of rows costs one searchsorted per distinct
+    column and one gather per factor.
+    """
+
+    def __init__(self, rubrics: Sequence[Rubric]):
+        names = [r.name for r in rubrics]
+        if len(set(names)) != len(names):
+            raise ValueError("Rubric names must be unique within a RubricSet")
+        self.rubrics = list(rubrics)
+        by_column: Dict[str, List[Tuple[Rubric, Factor]]] = {}
+        for rubric in self.rubrics:
+            for factor in rubric.factors:
+                by_column.setdefault(factor.column, []).append((rubric, factor))
+        # column -> (edges, [(rubric name, score key, points table)])
+        self.kernels = {}
+        for column, members in by_column.items():
+            edges = np.unique(np.concatenate([f.edges for _, f in members]))
+            lookups = []
+            for rubric, factor in members:
+                # Band of the factor's own ladder for each union band
+                band = np.searchsorted(factor.edges, np.r_[-np.inf, edges], side='right')
+                table = np.r_[np.asarray(factor.points)[band], factor.nan_points()]
+                lookups.append((rubric.name, f'{factor.name}_score', table))
+            self.kernels[column] = (edges, lookups)
+
+    def score(self, columns, block_rows: int = BLOCK_ROWS) -> Dict[str, Dict[str, np.ndarray]]:
+        """
+        Score all rubrics in one blocked pass over the plot columns.
+
+        Parameters:
+        -----------
+        columns : PlotTable or dict of arrays
+            Plot data (e.g. a soil_ingest chunk)
+        block_rows : int
+            Rows evaluated at a time (keeps each block's columns in cache)
+
+        Returns:
+        --------
+        dict : rubric name -> Rubric.score() dict
+        """
+        if isinstance(columns, PlotTable):
+            n = len(columns)
+        else:
+            n = len(next(iter(columns.values()), ()))
+        data = {column: _column(columns, column, n) for column in self.kernels}
+        mg_deficit = np.array(data['mg_deficit'] if 'mg_deficit' in data else _column(columns, 'mg_deficit', n))
+        results = {r.name: {'mg_deficit': mg_deficit, **{f'{f.name}_score': np.empty(n) for f in r.factors}}
+                   for r in self.rubrics}
+        totals = {r.name: np.zeros(n) for r in self.rubrics}
+        for start in range(0, n, block_rows):
+            rows = slice(start, start + block_rows)
+            for column, (edges, lookups) in self.kernels.items():
+                values = data[column][rows]
+                index = np.searchsorted(edges, values, side='right')
+                index[np.isnan(values)] = len(edges) + 1
+                for rubric_name, key, table in lookups:
+                    scores = np.take(table, index, out=results[rubric_name][key][rows])
+                    totals[rubric_name][rows] += scores
+        for rubric in self.rubrics:
+            climate_score = np.zeros(n)
+            for factor in rubric.factors:
+                if factor.column in PLOT_CLIMATE_FIELDS:
+                    climate_score += results[rubric.name][f'{factor.name}_score']
+            results[rubric.name]['climate_score'] = climate_score
+            results[rubric.name]['total_score'] = totals[rubric.name]
+            results[rubric.name]['rating_code'] = rubric.rating_codes(totals[rubric.name])
+        return results
+
+
+def score_rubrics(columns, rubrics: Sequence[Rubric], block_rows: int = BLOCK_ROWS) -> Dict[str, Dict[str, np.ndarray]]:
+    """Score several rubrics in one pass (compiles a RubricSet)."""
+    return RubricSet(rubrics).score(columns, block_rows)
+
+
+def main():
+    """Built-in vs file rubric, a variant rubric and timing against score_batch."""
+    print("=" * 80)
+    print("📐 DECLARATIVE SCORING RUBRICS")
+    print("=" * 80)
+    builtin = Rubric.from_analyzer()
+    from_file = Rubric.from_file(DEFAULT_RUBRIC_PATH)
+    print(f"  {from_file!r} loaded from {os.path.relpath(DEFAULT_RUBRIC_PATH)}")
+    print(f"  Matches the analyzer's built-in ladders: {from_file.to_dict() == builtin.to_dict()}")
+
+    # Variant: a drier island with stronger weight on Mg deficiency
+    variant = Rubric.from_dict(builtin.to_dict(), name='Dry island, Mg-weighted')
+    variant.factors[2] = Factor('mg', 'mg_deficit', (0.3, 0.6, 0.9, 1.2), (0, 8, 14, 18, 20))
+    variant.factors[4] = Factor('rainfall', 'annual_rainfall_mm', (400, 600, 900), (3, 8, 12, 15),
+                                fill=700)
+    print()
+
+    plots = load_sao_miguel_data()
+    table = PlotTable.from_plots(plots)
+    results = score_rubrics(table, [builtin, variant])
+    print(f"  {'Plot':<14}{'Built-in':>10}{'Variant':>10}  Variant rating")
+    for i, plot_id in enumerate(table.plot_id):
+        print(f"  {plot_id:<14}{results[builtin.name]['total_score'][i]:>10.0f}"
+              f"{results[variant.name]['total_score'][i]:>10.0f}  "
+              f"{variant.rating_labels(results[variant.name]['rating_code'][i])}")
+    print()
+
+    n = 1_000_000
+    rng = np.random.default_rng(0)
+    big = PlotTable({'ph': rng.normal(5.6, 0.5, n), 'organic_matter': rng.normal(9, 3, n),
+                     'exchangeable_ca': rng.normal(5, 1, n), 'exchangeable_mg': rng.normal(1.0, 0.4, n),
+                     'exchangeable_k': np.full(n, 0.5), 'cec': rng.normal(15, 4, n),
+                     'base_saturation': np.full(n, 40.0), 'p_extractable': np.full(n, 20.0),
+                     'k_extractable': np.full(n, 150.0), 'annual_rainfall_mm': rng.normal(1700, 500, n)})
+    analyzer = ERWViabilityAnalyzer(big)
+    big.mg_deficit  # cache the derived column for both paths
+    timings = {}
+    for label, run in (('score_batch (hand-written)', lambda: analyzer.score_plots(big)),
+                       ('Rubric (built-in)', lambda: builtin.score(big)),
+                       ('RubricSet (2 rubrics)', lambda: score_rubrics(big, [builtin, variant]))):
+        run()
+        start = time.perf_counter()
+        for _ in range(3):
+            run()
+        timings[label] = (time.perf_counter() - start) / 3
+    same = np.array_equal(analyzer.score_plots(big)['total_score'], builtin.score(big)['total_score'])
+    print(f"  {n:,} plots (identical totals: {same})")
+    for label, seconds in timings.items():
+        print(f"    {label:<28}{seconds * 1000:>8.0f} ms")
+    print()
+
+
+if __name__ == "__main__":
+    main()
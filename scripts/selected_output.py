@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Streaming Reader for PHREEQC SELECTED_OUTPUT Files
+São Miguel Island, Azores
+
+Memory-maps a SELECTED_OUTPUT file and parses it window by window into
+typed NumPy columns, so multi-gigabyte outputs load with memory bounded
+by the window size. The schema (column names, numeric or text) is
+inferred once per header; a file may hold several concatenated blocks
+(one header per simulation or SELECTED_OUTPUT definition), and each row
+is tagged with the index of the block it came from.
+
+    for chunk in iter_selected_output('selected.out'):
+        chunk['pH'], chunk['block'] ...
+"""
+
+import mmap
+import os
+import re
+import warnings
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+
+DEFAULT_CHUNK_BYTES = 64 << 20
+
+# Header lines start with a column name; data rows start with a number
+# (PHREEQC writes sim/state/soln/... in that order, so only a -reset false
+# selection starting with a text column such as state breaks this; see
+# _iter_bytes)
+_HEADER_LINE = re.compile(rb'[ \t]*[A-Za-z_][^\n]*')
+_NUMBER = re.compile(rb'^[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$')
+
+
+@dataclass
+class SelectedOutputSchema:
+    """Column names of one header and, once data is seen, which are numeric."""
+    names: Tuple[str, ...]
+    numeric: Optional[Tuple[bool, ...]] = None
+
+    @classmethod
+    def from_header(cls, line: bytes) -> 'SelectedOutputSchema':
+        return cls(tuple(t.decode() for t in line.split()))
+
+    def infer(self, first_row: bytes):
+        tokens = first_row.split()
+        if len(tokens) != len(self.names):
+            raise ValueError(f"SELECTED_OUTPUT row has {len(tokens)} fields, header has {len(self.names)}")
+        self.numeric = tuple(bool(_NUMBER.match(t)) or t.lower() in (b'nan', b'inf', b'-inf')
+                             for t in tokens)
+
+
+def _parse_rows(segment: bytes, schema: SelectedOutputSchema) -> Dict[str, np.ndarray]:
+    """Parse data rows (no header lines) into columns."""
+    segment = segment.strip()
+    ncols = len(schema.names)
+    if not segment:
+        return {name: np.empty(0, dtype=float if num else str)
+                for name, num in zip(schema.names, schema.numeric or (True,) * ncols)}
+    if schema.numeric is None:
+        schema.infer(segment.split(b'\n', 1)[0])
+
+    if all(schema.numeric):
+        # Fast path: one C-level pass over the whole segment
+        with warnings.catch_warnings():
+            # Malformed input stops the scan early; the size check below catches it
+            warnings.simplefilter('ignore', DeprecationWarning)
+            values = np.fromstring(segment.replace(b'\t', b' '), dtype=np.float64, sep=' ')
+        if values.size % ncols == 0 and values.size // ncols == segment.count(b'\n') + 1:
+            table = values.reshape(-1, ncols)
+            return {name: table[:, j].copy() for j, name in enumerate(schema.names)}
+
+    tokens = np.array(segment.split())
+    if tokens.size % ncols:
+        raise ValueError(f"Ragged SELECTED_OUTPUT rows: {tokens.size} fields for {ncols} columns")
+    table = tokens.reshape(-1, ncols)
+    return {name: (table[:, j].astype(np.float64) if num else table[:, j].astype(str))
+            for j, (name, num) in enumerate(zip(schema.names, schema.numeric))}
+
+
+def _header_lines(window: bytes) -> Iterator[re.Match]:
+    """
+    Header-line matches in a window, in order.
+
+    Only lines containing a letter other than e/E (exponents) are tried,
+    found with one vectorized pass, so all-numeric windows cost no regex work.
+    """
+    raw = np.frombuffer(window, dtype=np.uint8)
+    lower = raw | 0x20
+    letters = ((lower >= ord('a')) & (lower <= ord('z')) & (lower != ord('e'))) | (raw == ord('_'))
+    candidates = np.flatnonzero(letters)
+    if len(candidates) == 0:
+        return
+    newlines = np.flatnonzero(raw == ord('\n'))
+    line = np.unique(np.searchsorted(newlines, candidates))
+    starts = np.where(line > 0, newlines[np.maximum(line - 1, 0)] + 1, 0)
+    for start in starts:
+        match = _HEADER_LINE.match(window, int(start))
+        if match is not None:
+            yield match
+
+
+def _concat(parts):
+    if len(parts) == 1:
+        return parts[0]
+    return {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+
+
+def _windows(data, chunk_bytes: int) -> Iterator[bytes]:
+    """Newline-aligned byte windows of data (bytes or mmap)."""
+    start, size = 0, len(data)
+    while start < size:
+        stop = min(start + chunk_bytes, size)
+        if stop < size:
+            newline = data.find(b'\n', stop)
+            stop = size if newline < 0 else newline + 1
+        yield data[start:stop]
+        start = stop
+
+
+def iter_selected_output(source: Union[str, bytes], chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                         columns: Optional[Sequence[str]] = None) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Yield column chunks from a SELECTED_OUTPUT file (path) or its bytes.
+
+    Parameters:
+    -----------
+    source : str or bytes
+        File path (memory-mapped) or raw file contents
+    chunk_bytes : int
+        Window size; peak memory is a small multiple of this
+    columns : list of str
+        Keep only these columns (plus 'block')
+
+    Yields:
+    -------
+    dict : {column: array} for consecutive rows sharing one schema -
+           numeric columns float64, text columns str - plus 'block'
+           (int32 index of the header the rows belong to)
+    """
+    if isinstance(source, (bytes, bytearray)):
+        yield from _iter_bytes(source, chunk_bytes, columns)
+        return
+    with open(source, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield from _iter_bytes(data, chunk_bytes, columns)
+
+
+def _iter_bytes(data, chunk_bytes, columns):
+    schemas: Dict[bytes, SelectedOutputSchema] = {}
+    schema = None
+    block = -1
+    parts = []
+
+    def flush():
+        if not parts:
+            return None
+        chunk = _concat(parts)
+        parts.clear()
+        if columns is not None:
+            chunk = {k: chunk[k] for k in (*columns, 'block') if k in chunk}
+        return chunk
+
+    def add(segment):
+        if not segment.strip():
+            return
+        if schema is None:
+            raise ValueError("SELECTED_OUTPUT data before the first header line")
+        rows = _parse_rows(segment, schema)
+        n = len(next(iter(rows.values())))
+        rows['block'] = np.full(n, block, dtype=np.int32)
+        parts.append(rows)
+
+    for window in _windows(data, chunk_bytes):
+        pos = 0
+        for match in _header_lines(window):
+            key = b' '.join(match.group().split())
+            if key not in schemas and schema is not None:
+                if schema.numeric is None and len(key.split()) == len(schema.names):
+                    schema.infer(match.group())
+                if schema.numeric and not schema.numeric[0]:
+                    continue  # a data row whose first column is text
+            add(window[pos:match.start()])
+            new_schema = schemas.get(key)
+            if new_schema is None:
+                new_schema = schemas[key] = SelectedOutputSchema.from_header(match.group())
+            if new_schema is not schema:
+                chunk = flush()
+                if chunk is not None:
+                    yield chunk
+            schema = new_schema
+            block += 1
+            pos = match.end()
+        add(window[pos:])
+        chunk = flush()
+        if chunk is not None:
+            yield chunk
+
+
+def read_selected_output(source: Union[str, bytes], columns: Optional[Sequence[str]] = None,
+                         chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> Dict[str, np.ndarray]:
+    """
+    Whole file as one set of columns.
+
+    Blocks with different headers are stacked on the union of their
+    columns; values a block does not have are NaN (or '' for text).
+    """
+    chunks = list(iter_selected_output(source, chunk_bytes, columns))
+    if not chunks:
+        return {}
+    names = list(dict.fromkeys(name for chunk in chunks for name in chunk))
+    result = {}
+    for name in names:
+        kinds = [chunk[name].dtype.kind for chunk in chunks if name in chunk]
+        fill = '' if 'U' in kinds else np.nan
+        result[name] = np.concatenate([
+            chunk[name] if name in chunk else np.full(len(chunk['block']), fill)
+            for chunk in chunks
+        ])
+    return result
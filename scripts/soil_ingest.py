@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Streaming Soil-Lab Ingestion
+São Miguel Island, Azores
+
+Reads cooperative lab exports (CSV or Parquet) in chunks into columnar
+arrays keyed by SoilPlot field names, with header mapping and unit
+normalisation. No per-row Python objects are created, so large files can
+be scored chunk by chunk with bounded memory.
+"""
+
+import os
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from viability_analysis import (PLOT_FIELD_DEFAULTS, PLOT_FIELDS, PLOT_NUMERIC_FIELDS, ERWViabilityAnalyzer,
+                                PlotTable)
+
+
+SOIL_FIELDS = PLOT_FIELDS
+NUMERIC_FIELDS = PLOT_NUMERIC_FIELDS
+# field -> default when absent (the SoilPlot defaults)
+OPTIONAL_FIELDS = PLOT_FIELD_DEFAULTS
+
+# Common lab export headers (lower-cased, stripped) -> SoilPlot field
+DEFAULT_COLUMN_MAP = {
+    'plot id': 'plot_id', 'plot': 'plot_id', 'sample id': 'plot_id', 'sample': 'plot_id',
+    'ph': 'ph', 'ph (h2o)': 'ph', 'ph h2o': 'ph', 'ph_h2o': 'ph',
+    'om': 'organic_matter', 'om%': 'organic_matter', 'om (%)': 'organic_matter',
+    'organic matter': 'organic_matter', 'organic matter (%)': 'organic_matter',
+    'ca': 'exchangeable_ca', 'ca (cmol/kg)': 'exchangeable_ca', 'exch ca': 'exchangeable_ca',
+    'mg': 'exchangeable_mg', 'mg (cmol/kg)': 'exchangeable_mg', 'exch mg': 'exchangeable_mg',
+    'k': 'exchangeable_k', 'k (cmol/kg)': 'exchangeable_k', 'exch k': 'exchangeable_k',
+    'cec': 'cec', 'cec (cmol/kg)': 'cec',
+    'base saturation': 'base_saturation', 'base saturation (%)': 'base_saturation', 'bs%': 'base_saturation',
+    'p': 'p_extractable', 'p extractable': 'p_extractable', 'p (mg/kg)': 'p_extractable',
+    'k extractable': 'k_extractable', 'k (mg/kg)': 'k_extractable',
+    'area': 'area_ha', 'area (ha)': 'area_ha',
+    'lon': 'longitude', 'long': 'longitude', 'longitude': 'longitude',
+    'lat': 'latitude', 'latitude': 'latitude',
+    'rainfall': 'annual_rainfall_mm', 'rainfall (mm)': 'annual_rainfall_mm', 'annual rainfall (mm)': 'annual_rainfall_mm',
+    'temperature': 'temperature_c', 'temperature (c)': 'temperature_c', 'temperature (°c)': 'temperature_c',
+}
+
+# Multiplicative factors converting a source unit to the SoilPlot unit
+UNIT_FACTORS = {
+    'organic_matter': {'%': 1.0, 'g/kg': 0.1, 'fraction': 100.0},
+    'exchangeable_ca': {'cmol/kg': 1.0, 'meq/100g': 1.0, 'mmol/kg': 0.1},
+    'exchangeable_mg': {'cmol/kg': 1.0, 'meq/100g': 1.0, 'mmol/kg': 0.1},
+    'exchangeable_k': {'cmol/kg': 1.0, 'meq/100g': 1.0, 'mmol/kg': 0.1},
+    'cec': {'cmol/kg': 1.0, 'meq/100g': 1.0, 'mmol/kg': 0.1},
+    'base_saturation': {'%': 1.0, 'fraction': 100.0},
+    'p_extractable': {'mg/kg': 1.0, 'ppm': 1.0, 'g/kg': 1000.0},
+    'k_extractable': {'mg/kg': 1.0, 'ppm': 1.0, 'g/kg': 1000.0},
+    'area_ha': {'ha': 1.0, 'm2': 1e-4, 'km2': 100.0, 'acre': 0.40468564224},
+}
+
+
+def _resolve_columns(header: List[str], column_map: Optional[Dict[str, str]]) -> Dict[str, str]:
+    """Map SoilPlot field -> source column for the given file header."""
+    resolved = {}
+    for column in header:
+        if column_map is not None and column in column_map:
+            target = column_map[column]
+        elif column in SOIL_FIELDS:
+            target = column
+        else:
+            target = DEFAULT_COLUMN_MAP.get(column.strip().lower())
+        if target is not None and target not in resolved:
+            resolved[target] = column
+
+    missing = [f for f in SOIL_FIELDS if f not in resolved and f not in OPTIONAL_FIELDS]
+    if missing:
+        raise ValueError(f"Soil file is missing columns for: {', '.join(missing)}")
+    return resolved
+
+
+def _unit_factors(units: Optional[Dict[str, str]]) -> Dict[str, float]:
+    factors = {}
+    for field_name, unit in (units or {}).items():
+        try:
+            factors[field_name] = UNIT_FACTORS[field_name][unit]
+        except KeyError:
+            raise ValueError(f"Unsupported unit '{unit}' for {field_name}") from None
+    return factors
+
+
+def _normalise(frame: pd.DataFrame, resolved: Dict[str, str],
+               factors: Dict[str, float]) -> Dict[str, np.ndarray]:
+    """Convert one raw chunk to SoilPlot-named, SoilPlot-unit columns."""
+    n = len(frame)
+    chunk = {'plot_id': frame[resolved['plot_id']].astype(str).to_numpy(dtype=object)}
+    for field_name in NUMERIC_FIELDS:
+        if field_name in resolved:
+            values = pd.to_numeric(frame[resolved[field_name]], errors='coerce').to_numpy(dtype=float)
+        else:
+            values = np.full(n, OPTIONAL_FIELDS[field_name])
+        if field_name in factors:
+            values = values * factors[field_name]
+        chunk[field_name] = values
+    return chunk
+
+
+def iter_soil_chunks(path: str,
+                     column_map: Optional[Dict[str, str]] = None,
+                     units: Optional[Dict[str, str]] = None,
+                     chunksize: int = 100_000,
+                     **read_kwargs) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Stream a soil-lab export as columnar chunks.
+
+    Parameters:
+    -----------
+    path : str
+        .csv / .txt / .tsv or .parquet file
+    column_map : dict
+        Source header -> SoilPlot field, checked before the built-in aliases
+    units : dict
+        SoilPlot field -> source unit (see UNIT_FACTORS); unlisted fields
+        are assumed to be in SoilPlot units already
+    chunksize : int
+        Rows per chunk
+    read_kwargs :
+        Passed to pandas.read_csv (e.g. sep=';', decimal=',')
+
+    Yields:
+    -------
+    dict : SoilPlot field -> array (plot_id as object array)
+    """
+    factors = _unit_factors(units)
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext == '.parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise ImportError("Reading Parquet soil files requires pyarrow") from exc
+        parquet = pq.ParquetFile(path)
+        resolved = _resolve_columns(parquet.schema_arrow.names, column_map)
+        for batch in parquet.iter_batches(batch_size=chunksize, columns=list(resolved.values())):
+            yield _normalise(batch.to_pandas(), resolved, factors)
+        return
+
+    if ext == '.tsv':
+        read_kwargs.setdefault('sep', '\t')
+    header = pd.read_csv(path, nrows=0, **read_kwargs).columns.tolist()
+    resolved = _resolve_columns(header, column_map)
+    reader = pd.read_csv(path, usecols=list(resolved.values()), chunksize=chunksize, **read_kwargs)
+    for frame in reader:
+        yield _normalise(frame, resolved, factors)
+
+
+def load_soil_table(path: str, **kwargs) -> PlotTable:
+    """Read a whole soil file into one PlotTable (see iter_soil_chunks)."""
+    chunks = list(iter_soil_chunks(path, **kwargs))
+    if not chunks:
+        return PlotTable({f: np.array([], dtype=object if f == 'plot_id' else float) for f in SOIL_FIELDS})
+    return PlotTable.from_columns({f: np.concatenate([c[f] for c in chunks]) for f in SOIL_FIELDS})
+
+
+def score_soil_file(path: str,
+                    analyzer: Optional[ERWViabilityAnalyzer] = None,
+                    **kwargs) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Score a soil file chunk by chunk with ERWViabilityAnalyzer.score_plots.
+
+    Peak memory is bounded by the chunk size. Each yielded dict holds the
+    chunk's plot_id and area_ha plus every score_batch column (scored
+    with the analyzer's rubric if it has one).
+    """
+    analyzer = ERWViabilityAnalyzer([]) if analyzer is None else analyzer
+    for chunk in iter_soil_chunks(path, **kwargs):
+        scores = analyzer.score_plots(PlotTable.from_columns(chunk))
+        scores['plot_id'] = chunk['plot_id']
+        scores['area_ha'] = chunk['area_ha']
+        yield scores
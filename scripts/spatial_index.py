@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Spatial Joins for Plots, Zones, Parishes and Quarries
+São Miguel Island, Azores
+
+Puts plots on the map (SoilPlot / PlotTable longitude and latitude) and
+joins them in bulk to polygon layers (rainfall zones, parishes) and point
+layers (quarry sites) through a shapely STRtree. All queries run in
+metres in WGS 84 / UTM zone 26N and are evaluated for every plot in one
+vectorized call, so island-scale joins avoid plot × feature loops.
+"""
+
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from pyproj import Transformer
+
+from viability_analysis import PlotTable, SoilPlot
+
+
+PLOT_CRS = 'EPSG:4326'  # SoilPlot longitude / latitude
+METRIC_CRS = 'EPSG:32626'  # WGS 84 / UTM zone 26N (São Miguel)
+
+# Point layers up to this size use a blocked brute-force nearest search,
+# which beats the tree for a few dozen quarries
+BRUTE_FORCE_NEAREST_MAX = 256
+
+_to_metric = Transformer.from_crs(PLOT_CRS, METRIC_CRS, always_xy=True)
+
+
+def _as_table(plots: Union[PlotTable, Sequence[SoilPlot]]) -> PlotTable:
+    return plots if isinstance(plots, PlotTable) else PlotTable.from_plots(list(plots))
+
+
+def plot_points(plots: Union[PlotTable, Sequence[SoilPlot]], metric: bool = True) -> np.ndarray:
+    """
+    Plot locations as a shapely Point array (None where unknown).
+
+    metric : project to METRIC_CRS (metres) instead of longitude / latitude
+    """
+    table = _as_table(plots)
+    lon, lat = table.longitude, table.latitude
+    x, y = _to_metric.transform(lon, lat) if metric else (lon, lat)
+    points = shapely.points(np.asarray(x), np.asarray(y))
+    points[np.isnan(lon) | np.isnan(lat)] = None
+    return points
+
+
+def plots_geodataframe(plots: Union[PlotTable, Sequence[SoilPlot]], crs: str = METRIC_CRS) -> gpd.GeoDataFrame:
+    """Plots with their numeric fields as a GeoDataFrame."""
+    table = _as_table(plots)
+    data = {'plot_id': table.plot_id, **table.columns}
+    return gpd.GeoDataFrame(data, geometry=plot_points(table, metric=False), crs=PLOT_CRS).to_crs(crs)
+
+
+class SpatialLayer:
+    """
+    Target features (zones, parishes, quarries) behind an STRtree.
+
+    Parameters:
+    -----------
+    geometries : GeoDataFrame, GeoSeries or array of shapely geometries
+        Features; GeoPandas input is reprojected to METRIC_CRS, plain
+        geometries must already be in metres
+    ids : array
+        Feature IDs returned by the joins (default: id_column or row number)
+    id_column : str
+        GeoDataFrame column to take the IDs from
+    """
+
+    def __init__(self, geometries, ids=None, id_column: Optional[str] = None):
+        if isinstance(geometries, (gpd.GeoDataFrame, gpd.GeoSeries)):
+            if geometries.crs is not None:
+                geometries = geometries.to_crs(METRIC_CRS)
+            if ids is None and id_column is not None:
+                ids = geometries[id_column].to_numpy()
+            geometries = np.asarray(geometries.geometry.values if isinstance(geometries, gpd.GeoDataFrame)
+                                    else geometries.values)
+        self.geometries = np.asarray(geometries, dtype=object)
+        self.ids = np.arange(len(self.geometries)) if ids is None else np.asarray(ids)
+        self.tree = shapely.STRtree(self.geometries)
+        self._point_xy = None
+        if 0 < len(self.geometries) <= BRUTE_FORCE_NEAREST_MAX and \
+                np.all(shapely.get_type_id(self.geometries) == shapely.GeometryType.POINT):
+            self._point_xy = shapely.get_coordinates(self.geometries)
+
+    @classmethod
+    def from_file(cls, path: str, id_column: Optional[str] = None, **read_kwargs) -> 'SpatialLayer':
+        """Any format geopandas reads (GeoPackage, Shapefile, GeoJSON, ...)."""
+        return cls(gpd.read_file(path, **read_kwargs), id_column=id_column)
+
+    def __len__(self) -> int:
+        return len(self.geometries)
+
+    def containing(self, points: np.ndarray) -> np.ndarray:
+        """
+        Index of the feature containing each point (-1 if none).
+
+        Points on a shared boundary get the lowest-index feature.
+        """
+        result = np.full(len(points), -1, dtype=np.intp)
+        point_idx, feature_idx = self.tree.query(points, predicate='intersects')
+        # Keep the lowest feature index per point
+        order = np.lexsort((feature_idx, point_idx))
+        point_idx, feature_idx = point_idx[order], feature_idx[order]
+        first = np.r_[True, point_idx[1:] != point_idx[:-1]] if len(point_idx) else np.array([], dtype=bool)
+        result[point_idx[first]] = feature_idx[first]
+        return result
+
+    def nearest(self, points: np.ndarray, max_distance: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Index of and distance (m) to the nearest feature for each point.
+
+        Points with no feature within max_distance (or no location) get
+        index -1 and distance NaN. Ties go to the lowest-index feature.
+        """
+        index = np.full(len(points), -1, dtype=np.intp)
+        distance = np.full(len(points), np.nan)
+        valid = np.flatnonzero(~shapely.is_missing(points))
+        if len(valid) == 0 or len(self) == 0:
+            return index, distance
+        if self._point_xy is not None:
+            xy = shapely.get_coordinates(points[valid])
+            feature_idx = np.empty(len(valid), dtype=np.intp)
+            dist = np.empty(len(valid))
+            for start in range(0, len(valid), 65536):
+                block = xy[start:start + 65536]
+                d2 = ((block[:, None, :] - self._point_xy[None, :, :]) ** 2).sum(axis=2)
+                feature_idx[start:start + len(block)] = d2.argmin(axis=1)
+                dist[start:start + len(block)] = np.sqrt(d2.min(axis=1))
+            point_idx = np.arange(len(valid))
+            if max_distance is not None:
+                point_idx = np.flatnonzero(dist <= max_distance)
+                feature_idx, dist = feature_idx[point_idx], dist[point_idx]
+        else:
+            (point_idx, feature_idx), dist = self.tree.query_nearest(
+                points[valid], max_distance=max_distance, return_distance=True, all_matches=False)
+        index[valid[point_idx]] = feature_idx
+        distance[valid[point_idx]] = dist
+        return index, distance
+
+    def within_distance(self, points: np.ndarray, distance: float) -> Tuple[np.ndarray, np.ndarray]:
+        """All (point index, feature index) pairs closer than distance (m)."""
+        return self.tree.query(points, predicate='dwithin', distance=distance)
+
+    def feature_ids(self, index: np.ndarray, missing=None) -> np.ndarray:
+        """Map feature indices (-1 = none) to IDs."""
+        ids = np.asarray(self.ids[np.maximum(index, 0)], dtype=object)
+        ids[index < 0] = missing
+        return ids
+
+
+def join_plots(plots: Union[PlotTable, Sequence[SoilPlot]],
+               zones: Optional[SpatialLayer] = None,
+               parishes: Optional[SpatialLayer] = None,
+               quarries: Optional[SpatialLayer] = None,
+               quarry_max_distance_m: Optional[float] = None) -> Dict[str, np.ndarray]:
+    """
+    Attach rainfall zone, parish and nearest quarry to every plot.
+
+    Returns:
+    --------
+    dict : 'plot_id' plus, for each layer given, 'rainfall_zone' /
+           'parish' (feature ID or None) and 'quarry' / 'quarry_distance_m'
+    """
+    table = _as_table(plots)
+    points = plot_points(table)
+    result = {'plot_id': table.plot_id}
+    if zones is not None:
+        result['rainfall_zone'] = zones.feature_ids(zones.containing(points))
+    if parishes is not None:
+        result['parish'] = parishes.feature_ids(parishes.containing(points))
+    if quarries is not None:
+        index, distance = quarries.nearest(points, max_distance=quarry_max_distance_m)
+        result['quarry'] = quarries.feature_ids(index)
+        result['quarry_distance_m'] = distance
+    return result
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Streaming Summary Statistics for Viability Results
+São Miguel Island, Azores
+
+generate_summary_statistics needs every result row in one DataFrame.
+StreamingSummary keeps a fixed-size state instead and folds in result
+chunks as they arrive (analyze_table dicts, analyze_all_plots
+DataFrames, Arrow batches from result_store), so island-scale or
+multi-year runs (10^8 plot-years) are summarised in constant memory.
+
+Per column the state holds count, mean and the sum of squared deviations
+(Welford / Chan et al.), min and max, and the area-weighted total
+Σ area_ha · value as a compensated (TwoSum) pair. Each chunk is reduced
+with NumPy and merged with the pairwise update
+
+    δ = mean_b - mean_a,  n = n_a + n_b
+    mean = mean_a + δ·n_b/n,  M2 = M2_a + M2_b + δ²·n_a·n_b/n
+
+so states from parallel shards or separate runs combine into the
+statistics of the pooled data, whatever the order or split.
+"""
+
+import json
+import time
+from typing import Dict, Iterable, Mapping, Optional, Sequence
+
+import numpy as np
+
+from viability_analysis import RESULT_COLUMNS, ERWViabilityAnalyzer, PlotTable
+
+# Result columns summarised by default (analyze_table names)
+SUMMARY_COLUMNS = ('ph', 'organic_matter', 'mg_deficit', 'total_score', 'co2_lime_t_ha_yr',
+                   'co2_full_t_ha_yr', 'benefit_lime_eur_ha_yr', 'benefit_full_eur_ha_yr')
+WEIGHT_COLUMN = 'area_ha'
+_LABEL_TO_KEY = {label: key for key, label in RESULT_COLUMNS.items() if label is not None}
+
+
+def _two_sum(a: np.ndarray, b: np.ndarray):
+    """Error-free a + b = s + e (Knuth)."""
+    s = a + b
+    bb = s - a
+    return s, (a - (s - bb)) + (b - bb)
+
+
+def _batch_columns(batch, names: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Requested columns of a dict, DataFrame (display or analyze_table names) or Arrow table / batch."""
+    if hasattr(batch, 'column_names') and hasattr(batch, 'column'):  # pyarrow Table / RecordBatch
+        available = set(batch.column_names)
+        return {name: batch.column(name).to_numpy(zero_copy_only=False) for name in names if name in available}
+    if hasattr(batch, 'columns') and hasattr(batch, 'iloc'):  # pandas DataFrame
+        renamed = {_LABEL_TO_KEY.get(label, label): label for label in batch.columns}
+        return {name: batch[renamed[name]].to_numpy() for name in names if name in renamed}
+    if isinstance(batch, PlotTable):
+        return {name: getattr(batch, name) for name in names if name in batch.columns or hasattr(batch, name)}
+    return {name: batch[name] for name in names if name in batch}
+
+
+class StreamingSummary:
+    """
+    Mergeable running summary of result columns.
+
+    Parameters:
+    -----------
+    columns : sequence of str
+        Columns to summarise (analyze_table names)
+    weight : str
+        Column weighting the totals (area_ha, so totals are t/yr, €/yr)
+
+    update() folds in one chunk, merge() adds another state, to_dict() /
+    from_dict() move states between processes or runs as JSON.
+    """
+
+    def __init__(self, columns: Sequence[str] = SUMMARY_COLUMNS, weight: str = WEIGHT_COLUMN):
+        self.columns = tuple(columns)
+        self.weight = weight
+        k = len(self.columns)
+        self.rows = 0
+        self.count = np.zeros(k, dtype=np.int64)  # non-NaN values per column
+        self.mean = np.zeros(k)
+        self.m2 = np.zeros(k)
+        self.min = np.full(k, np.inf)
+        self.max = np.full(k, -np.inf)
+        self.total = np.zeros(k)  # Σ weight · value (NaN values skipped)
+        self.total_err = np.zeros(k)
+        self.weight_total = 0.0
+        self.weight_err = 0.0
+
+    def _merge_moments(self, count, mean, m2, minimum, maximum, total, total_err, weight_total, weight_err, rows):
+        n = self.count + count
+        safe = np.maximum(n, 1)
+        delta = mean - self.mean
+        self.m2 = self.m2 + m2 + delta ** 2 * (self.count * count / safe)
+        self.mean = np.where(n > 0, self.mean + delta * (count / safe), 0.0)
+        self.count = n
+        self.min = np.fmin(self.min, minimum)
+        self.max = np.fmax(self.max, maximum)
+        self.total, err = _two_sum(self.total, total)
+        self.total_err = self.total_err + err + total_err
+        self.weight_total, err = _two_sum(np.float64(self.weight_total), np.float64(weight_total))
+        self.weight_total = float(self.weight_total)
+        self.weight_err = float(self.weight_err + err + weight_err)
+        self.rows += int(rows)
+
+    def update(self, batch, weights=None) -> 'StreamingSummary':
+        """
+        Fold in one chunk of results.
+
+        batch : analyze_table dict, analyze_all_plots DataFrame, PlotTable
+            or pyarrow Table / RecordBatch. Columns it lacks are skipped.
+        weights : per-row weights when the batch has no weight column
+            (e.g. the plots' area_ha for an analyze_all_plots DataFrame)
+        """
+        data = _batch_columns(batch, self.columns + (self.weight,))
+        if weights is None:
+            if self.weight not in data:
+                raise ValueError(f"Batch has no '{self.weight}' column; pass weights= for the totals")
+            weights = data[self.weight]
+        weights = np.asarray(weights, dtype=float)
+        n = len(weights)
+        if n == 0:
+            return self
+        values = np.full((len(self.columns), n), np.nan)
+        for i, name in enumerate(self.columns):
+            if name in data:
+                values[i] = data[name]
+        valid = ~np.isnan(values)
+        count = valid.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(count > 0, np.where(valid, values, 0.0).sum(axis=1) / np.maximum(count, 1), 0.0)
+            m2 = np.where(valid, (values - mean[:, None]) ** 2, 0.0).sum(axis=1)
+            minimum = np.where(count > 0, np.nanmin(np.where(valid, values, np.inf), axis=1), np.inf)
+            maximum = np.where(count > 0, np.nanmax(np.where(valid, values, -np.inf), axis=1), -np.inf)
+        total = np.where(valid, values * weights, 0.0).sum(axis=1)
+        self._merge_moments(count, mean, m2, minimum, maximum, total, 0.0, weights.sum(), 0.0, n)
+        return self
+
+    def consume(self, batches: Iterable, weights: Optional[Iterable] = None) -> 'StreamingSummary':
+        """update() for every chunk of an iterable (e.g. executor results as they complete)."""
+        if weights is None:
+            for batch in batches:
+                self.update(batch)
+        else:
+            for batch, batch_weights in zip(batches, weights):
+                self.update(batch, batch_weights)
+        return self
+
+    def merge(self, other: 'StreamingSummary') -> 'StreamingSummary':
+        """Add another state (same columns and weight) into this one."""
+        if other.columns != self.columns or other.weight != self.weight:
+            raise ValueError("Cannot merge summaries of different columns or weights")
+        self._merge_moments(other.count, other.mean, other.m2, other.min, other.max,
+                            other.total, other.total_err, other.weight_total, other.weight_err, other.rows)
+        return self
+
+    def __add__(self, other: 'StreamingSummary') -> 'StreamingSummary':
+        return StreamingSummary.from_dict(self.to_dict()).merge(other)
+
+    def to_dict(self) -> Dict:
+        """JSON-serialisable state (floats round-trip exactly)."""
+        return {
+            'columns': list(self.columns), 'weight': self.weight, 'rows': self.rows,
+            'count': self.count.tolist(), 'mean': self.mean.tolist(), 'm2': self.m2.tolist(),
+            'min': self.min.tolist(), 'max': self.max.tolist(),
+            'total': self.total.tolist(), 'total_err': self.total_err.tolist(),
+            'weight_total': self.weight_total, 'weight_err': self.weight_err,
+        }
+
+    @classmethod
+    def from_dict(cls, state: Mapping) -> 'StreamingSummary':
+        summary = cls(state['columns'], state['weight'])
+        summary.rows = int(state['rows'])
+        summary.count = np.asarray(state['count'], dtype=np.int64)
+        for name in ('mean', 'm2', 'min', 'max', 'total', 'total_err'):
+            setattr(summary, name, np.asarray(state[name], dtype=float))
+        summary.weight_total = float(state['weight_total'])
+        summary.weight_err = float(state['weight_err'])
+        return summary
+
+    def _index(self, column: str) -> int:
+        try:
+            return self.columns.index(column)
+        except ValueError:
+            raise KeyError(f"'{column}' is not summarised") from None
+
+    def column_mean(self, column: str) -> float:
+        i = self._index(column)
+        return float(self.mean[i]) if self.count[i] else float('nan')
+
+    def column_std(self, column: str, ddof: int = 1) -> float:
+        """Standard deviation (sample by default, as pandas)."""
+        i = self._index(column)
+        return float(np.sqrt(self.m2[i] / (self.count[i] - ddof))) if self.count[i] > ddof else float('nan')
+
+    def column_total(self, column: str) -> float:
+        """Σ weight · value."""
+        i = self._index(column)
+        return float(self.total[i] + self.total_err[i])
+
+    @property
+    def total_weight(self) -> float:
+        return self.weight_total + self.weight_err
+
+    def summary(self) -> Dict:
+        """Same keys and rounding as ERWViabilityAnalyzer.generate_summary_statistics."""
+        return {
+            'n_plots': self.rows,
+            'avg_ph': round(self.column_mean('ph'), 2),
+            'std_ph': round(self.column_std('ph'), 2),
+            'avg_om': round(self.column_mean('organic_matter'), 1),
+            'std_om': round(self.column_std('organic_matter'), 1),
+            'avg_mg_deficit': round(self.column_mean('mg_deficit'), 2),
+            'avg_viability_score': round(self.column_mean('total_score'), 1),
+            'total_area_ha': self.total_weight,
+            'total_co2_lime_replacement_t_yr': round(self.column_total('co2_lime_t_ha_yr'), 1),
+            'total_co2_full_erw_t_yr': round(self.column_total('co2_full_t_ha_yr'), 1),
+            'total_economic_benefit_lime_eur_yr': round(self.column_total('benefit_lime_eur_ha_yr'), 0),
+            'total_economic_benefit_full_eur_yr': round(self.column_total('benefit_full_eur_ha_yr'), 0),
+        }
+
+
+def main():
+    """Island-scale results summarised in chunks, in shards and against pandas."""
+    print("=" * 80)
+    print("📈 STREAMING SUMMARY STATISTICS")
+    print("=" * 80)
+    rng = np.random.default_rng(0)
+    n = 1_000_000
+    table = PlotTable({'ph': rng.normal(5.6, 0.4, n), 'organic_matter': rng.normal(9, 2.5, n),
+                       'exchangeable_ca': rng.normal(6, 1.5, n), 'exchangeable_mg': rng.normal(0.8, 0.3, n),
+                       'exchangeable_k': np.full(n, 0.6), 'cec': rng.normal(15, 3, n),
+                       'base_saturation': np.full(n, 45.0), 'p_extractable': np.full(n, 40.0),
+                       'k_extractable': np.full(n, 200.0), 'area_ha': rng.uniform(0.2, 2.0, n)})
+    analyzer = ERWViabilityAnalyzer(table)
+    results = analyzer.analyze_table(table)
+    chunks = [{k: v[i:i + 100_000] for k, v in results.items()} for i in range(0, n, 100_000)]
+
+    start = time.perf_counter()
+    streamed = StreamingSummary().consume(chunks)
+    elapsed = time.perf_counter() - start
+    # Four shards summarised separately (e.g. by workers or runs), merged via JSON
+    shards = [StreamingSummary().consume(chunks[i::4]) for i in range(4)]
+    merged = StreamingSummary()
+    for shard in reversed(shards):
+        merged.merge(StreamingSummary.from_dict(json.loads(json.dumps(shard.to_dict()))))
+    # Reference: pandas over the whole result frame
+    frame = analyzer.results_frame(results)
+    area = results['area_ha']
+    in_memory = {
+        'n_plots': len(frame),
+        'avg_ph': round(frame['pH'].mean(), 2), 'std_ph': round(frame['pH'].std(), 2),
+        'avg_om': round(frame['Organic Matter (%)'].mean(), 1),
+        'std_om': round(frame['Organic Matter (%)'].std(), 1),
+        'avg_mg_deficit': round(frame['Mg Deficit'].mean(), 2),
+        'avg_viability_score': round(frame['Viability Score'].mean(), 1),
+        'total_area_ha': area.sum(),
+        'total_co2_lime_replacement_t_yr': round((frame['CO₂ Lime Repl. (t/ha/yr)'] * area).sum(), 1),
+        'total_co2_full_erw_t_yr': round((frame['CO₂ Full ERW (t/ha/yr)'] * area).sum(), 1),
+        'total_economic_benefit_lime_eur_yr': round((frame['Benefit Lime Repl. (€/ha/yr)'] * area).sum(), 0),
+        'total_economic_benefit_full_eur_yr': round((frame['Benefit Full ERW (€/ha/yr)'] * area).sum(), 0),
+    }
+
+    print(f"  {n:,} plots in {len(chunks)} chunks: {elapsed * 1000:.0f} ms, "
+          f"state {len(json.dumps(streamed.to_dict())):,} bytes")
+    print(f"  {'Statistic':<36}{'Streamed':>20}{'Merged shards':>20}{'pandas':>20}")
+    for key, value in streamed.summary().items():
+        print(f"  {key:<36}{value:>20,.2f}{merged.summary()[key]:>20,.2f}{in_memory[key]:>20,.2f}")
+    print(f"  Merged shards identical: {merged.summary() == streamed.summary()}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
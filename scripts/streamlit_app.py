@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+ERW Scenario Explorer (Streamlit)
+São Miguel Island, Azores
+
+Interactive front end for ERWViabilityAnalyzer and the CO₂ mass balance:
+
+    streamlit run scripts/streamlit_app.py
+
+Plot tables and the mass-balance sensitivity grid are loaded once
+(st.cache_resource). Per-plot results are cached in stages, each keyed
+only by the sliders it depends on:
+
+    rainfall           → viability scores and weathering multipliers
+    + efficiency       → CO₂ rates
+    + carbon price     → farmer benefit
+
+so moving one slider recomputes only its stage and the ones after it.
+The mass-balance panel reads slices of the precomputed grid.
+"""
+
+import os
+import sys
+import time
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(SCRIPTS))
+sys.path.insert(0, SCRIPTS)  # also when not started by `streamlit run`
+
+from extended_analysis import ERWScenario, calculate_co2_mass_balance, sensitivity_grid
+from viability_analysis import (ERWViabilityAnalyzer, PlotTable, SOIL_DATA_PATH, climate_columns,
+                                load_sao_miguel_data)
+
+
+# Slider ranges; the sensitivity grid is evaluated on exactly these steps
+EFFICIENCY_STEPS = np.round(np.arange(0.10, 0.901, 0.05), 2)
+RAINFALL_STEPS = np.arange(750, 3001, 50)
+RATE_STEPS = np.array([1.0, 2.7, 5.0, 10.0, 20.0, 30.0, 40.0, 50.0, 75.0, 100.0])
+TOP_PLOTS = 500  # rows shown in the plot table
+SOURCES = {"Sanguinho analyses": 'sanguinho', "Synthetic island": 'synthetic', "Soil lab export": 'file'}
+
+
+# ── Data (cached once per process) ──────────────────────────────────────────
+
+@st.cache_resource(show_spinner="Loading plots...")
+def load_plots(source: str, n_plots: int = 0, path: str = '') -> PlotTable:
+    """Sanguinho data, a synthetic island of n_plots, or a soil lab export."""
+    if source == 'file':
+        from soil_ingest import load_soil_table
+        return load_soil_table(path)
+    table = PlotTable.from_plots(load_sao_miguel_data())
+    if source == 'sanguinho':
+        return table
+    # Sanguinho plots resampled with field-scale variability
+    rng = np.random.default_rng(0)
+    columns = {name: np.resize(values, n_plots) for name, values in table.columns.items()}
+    columns['ph'] = np.clip(rng.normal(5.6, 0.4, n_plots), 4.5, 7.5)
+    columns['organic_matter'] = np.clip(rng.normal(9.0, 2.5, n_plots), 1.0, None)
+    columns['exchangeable_mg'] = np.clip(rng.normal(0.75, 0.25, n_plots), 0.05, None)
+    columns['cec'] = np.clip(rng.normal(16.0, 3.0, n_plots), 2.0, None)
+    columns['area_ha'] = rng.uniform(0.1, 1.3, n_plots)  # ~70,000 ha at 100k plots
+    return PlotTable(columns, plot_id=np.array([f"SM-{i:06d}" for i in range(n_plots)], dtype=object))
+
+
+@st.cache_resource(show_spinner="Precomputing mass-balance grid...")
+def mass_balance_grid():
+    """Net and gross CO₂ over every efficiency × rainfall × rate slider position."""
+    base = ERWScenario("Explorer", 2.7, 0.45, 1750)
+    return sensitivity_grid(base, {'weathering_efficiency': EFFICIENCY_STEPS,
+                                   'annual_rainfall_mm': RAINFALL_STEPS,
+                                   'application_rate_t_ha': RATE_STEPS},
+                            outputs=['gross_co2_t_ha_yr', 'total_upstream_t_ha_yr', 'net_co2_t_ha_yr'])
+
+
+# ── Per-plot stages (each keyed by the sliders it depends on) ───────────────
+# Arguments starting with '_' are not hashed; table_key identifies the table.
+
+def _analyzer(table: PlotTable, **constants) -> ERWViabilityAnalyzer:
+    analyzer = ERWViabilityAnalyzer(table)
+    for name, value in constants.items():
+        setattr(analyzer, name, value)  # instance override of the class constant
+    return analyzer
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def climate_stage(_table: PlotTable, table_key: str, rainfall_mm: float) -> Dict[str, np.ndarray]:
+    analyzer = _analyzer(_table, ANNUAL_RAINFALL_MM=rainfall_mm)
+    climate = climate_columns(_table)
+    scores = analyzer.score_batch(_table.ph, _table.organic_matter, _table.exchangeable_mg, _table.cec, **climate)
+    multiplier = analyzer.weathering_multiplier_batch(_table.ph, _table.organic_matter,
+                                                      climate.get('annual_rainfall_mm'))
+    return {'total_score': np.round(scores['total_score'], 1), 'rating_code': scores['rating_code'],
+            'multiplier': multiplier}
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def co2_stage(_table: PlotTable, table_key: str, rainfall_mm: float, efficiency: float) -> Dict[str, np.ndarray]:
+    multiplier = climate_stage(_table, table_key, rainfall_mm)['multiplier']
+    return _analyzer(_table, WEATHERING_EFFICIENCY=efficiency).co2_batch(multiplier, _table.area_ha)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def economics_stage(_table: PlotTable, table_key: str, rainfall_mm: float, efficiency: float,
+                    carbon_price: float) -> Dict[str, np.ndarray]:
+    co2 = co2_stage(_table, table_key, rainfall_mm, efficiency)
+    return _analyzer(_table, CARBON_CREDIT_PRICE=carbon_price).economics_batch(
+        co2['co2_lime_t_ha_yr'], co2['co2_full_t_ha_yr'])
+
+
+def plot_frame(table: PlotTable, climate, co2, economics, index: np.ndarray) -> pd.DataFrame:
+    """analyze_all_plots-style DataFrame for selected rows."""
+    columns = {
+        'plot_id': table.plot_id[index],
+        'ph': table.ph[index],
+        'organic_matter': table.organic_matter[index],
+        'exchangeable_mg': table.exchangeable_mg[index],
+        'exchangeable_ca': table.exchangeable_ca[index],
+        'mg_ca_ratio': np.round(table.mg_ca_ratio[index], 3),
+        'mg_deficit': np.round(table.mg_deficit[index], 2),
+        'cec': table.cec[index],
+        'total_score': climate['total_score'][index],
+        'rating_code': climate['rating_code'][index],
+        'weathering_multiplier': np.round(climate['multiplier'][index], 2),
+        **{k: v[index] for k, v in co2.items()},
+        **{k: v[index] for k, v in economics.items()},
+        'area_ha': table.area_ha[index],
+    }
+    return ERWViabilityAnalyzer(table).results_frame(columns)
+
+
+# ── Page ────────────────────────────────────────────────────────────────────
+
+def main():
+    started = time.perf_counter()
+    st.set_page_config(page_title="São Miguel ERW Explorer", page_icon="🌋", layout="wide")
+    st.title("🌋 Enhanced Rock Weathering - São Miguel Scenario Explorer")
+
+    with st.sidebar:
+        st.header("Plots")
+        source = SOURCES[st.radio("Source", list(SOURCES))]
+        n_plots, path = 0, ''
+        if source == 'synthetic':
+            n_plots = st.select_slider("Number of plots", [1_000, 10_000, 50_000, 100_000], value=100_000)
+        elif source == 'file':
+            path = st.text_input("CSV / Parquet path", SOIL_DATA_PATH)
+        st.header("Scenario")
+        efficiency = st.select_slider("Weathering efficiency (%)", (EFFICIENCY_STEPS * 100).round().astype(int).tolist(),
+                                      value=45) / 100
+        rainfall = st.select_slider("Annual rainfall (mm)", RAINFALL_STEPS.tolist(), value=1750,
+                                    help="Used for plots without their own climate data")
+        rate = st.select_slider("Application rate (t/ha)", RATE_STEPS.tolist(), value=2.7)
+        carbon_price = st.slider("Carbon price (€/tCO₂)", 0, 300, int(ERWViabilityAnalyzer.CARBON_CREDIT_PRICE), 5)
+
+    table = load_plots(source, n_plots, path)
+    table_key = f"{source}:{n_plots}:{path}"
+    if len(table) == 0:
+        st.warning("No plots loaded.")
+        return
+
+    climate = climate_stage(table, table_key, float(rainfall))
+    co2 = co2_stage(table, table_key, float(rainfall), float(efficiency))
+    economics = economics_stage(table, table_key, float(rainfall), float(efficiency), float(carbon_price))
+    area = table.area_ha
+
+    cols = st.columns(5)
+    cols[0].metric("Plots", f"{len(table):,}")
+    cols[1].metric("Area", f"{area.sum():,.0f} ha")
+    cols[2].metric("Mean viability score", f"{climate['total_score'].mean():.1f}")
+    cols[3].metric("CO₂, lime replacement", f"{co2['co2_lime_t_ha_yr'] @ area:,.0f} t/yr")
+    cols[4].metric("Farmer benefit, lime repl.", f"€{economics['benefit_lime_eur_ha_yr'] @ area:,.0f}/yr")
+
+    plots_tab, balance_tab = st.tabs(["Plots", "Mass balance"])
+
+    with plots_tab:
+        left, right = st.columns([1, 2])
+        counts = np.bincount(climate['rating_code'], minlength=len(ERWViabilityAnalyzer.RATING_LABELS))
+        left.subheader("Rating distribution")
+        left.bar_chart(pd.DataFrame({'Plots': counts}, index=list(ERWViabilityAnalyzer.RATING_LABELS)))
+        right.subheader(f"Top {min(TOP_PLOTS, len(table)):,} plots by viability score")
+        top = np.argsort(-climate['total_score'], kind='stable')[:TOP_PLOTS]
+        right.dataframe(plot_frame(table, climate, co2, economics, top), hide_index=True, height=360)
+
+    with balance_tab:
+        grid = mass_balance_grid()
+        scenario = ERWScenario("Explorer", float(rate), float(efficiency), float(rainfall))
+        balance = calculate_co2_mass_balance(scenario)
+        left, right = st.columns([1, 2])
+        left.subheader("CO₂ mass balance (10 years, 2 ha)")
+        left.dataframe(pd.DataFrame({'Value': {
+            'Gross CO₂ (t/ha/yr)': balance['gross_co2_t_ha_yr'],
+            'Upstream emissions (t/ha/yr)': balance['total_upstream_t_ha_yr'],
+            'Net CO₂ (t/ha/yr)': balance['net_co2_t_ha_yr'],
+            'Net CO₂ (t/ha, 10 yr)': balance['net_co2_t_ha_total'],
+            'Upstream share of gross (%)': balance['upstream_pct_of_gross'],
+            'Carbon revenue (€/ha/yr)': round(balance['net_co2_t_ha_yr'] * carbon_price, 2),
+        }}))
+        right.subheader("Net CO₂ (t/ha/yr) vs weathering efficiency")
+        rainfall_slice = grid.sel(application_rate_t_ha=rate)
+        shown = [r for r in (1000, 1500, 2000, 2500, 3000) if r != rainfall] + [rainfall]
+        right.line_chart(pd.DataFrame(
+            {f"{r:,} mm": rainfall_slice.sel(annual_rainfall_mm=r)['net_co2_t_ha_yr'] for r in sorted(shown)},
+            index=pd.Index(grid.coords['weathering_efficiency'], name='Weathering efficiency')))
+
+    st.caption(f"Updated in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+
+main()
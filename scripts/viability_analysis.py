@@ -8,9 +8,18 @@ Analyzes real soil data to quantify ERW potential and generate visualizations.
 
 import numpy as np
 import pandas as pd
-from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from dataclasses import MISSING, dataclass, fields
+from functools import cached_property, lru_cache
+from typing import Dict, List, Tuple, Union
+import contextlib
 import json
+import csv
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import run_metrics
 
 @dataclass
 class SoilPlot:
@@ -26,6 +35,10 @@ class SoilPlot:
     p_extractable: float  # mg/kg
     k_extractable: float  # mg/kg
     area_ha: float = 2.0  # hectares
+    longitude: float = float('nan')  # WGS84 degrees (unknown when NaN)
+    latitude: float = float('nan')
+    annual_rainfall_mm: float = float('nan')  # plot climate (analyzer constants when NaN)
+    temperature_c: float = float('nan')
 
     @property
     def mg_ca_ratio(self) -> float:
@@ -39,6 +52,255 @@ class SoilPlot:
         return max(0, optimal_min - self.exchangeable_mg)
 
 
+PLOT_FIELDS = [f.name for f in fields(SoilPlot)]
+PLOT_NUMERIC_FIELDS = [f for f in PLOT_FIELDS if f != 'plot_id']
+PLOT_FIELD_DEFAULTS = {f.name: f.default for f in fields(SoilPlot) if f.default is not MISSING}
+# Plot location only places a plot on the map; it is not a model input
+PLOT_LOCATION_FIELDS = ('longitude', 'latitude')
+# Per-plot climate (see climate_layers); NaN falls back to the analyzer's
+# ANNUAL_RAINFALL_MM / AVG_TEMPERATURE_C
+PLOT_CLIMATE_FIELDS = ('annual_rainfall_mm', 'temperature_c')
+
+# Columns returned by ERWViabilityAnalyzer.analyze_table -> analyze_all_plots
+# display names. area_ha has no display column (used for totals only).
+RESULT_COLUMNS = {
+    'plot_id': 'Plot ID',
+    'ph': 'pH',
+    'organic_matter': 'Organic Matter (%)',
+    'exchangeable_mg': 'Mg (cmol/kg)',
+    'exchangeable_ca': 'Ca (cmol/kg)',
+    'mg_ca_ratio': 'Mg/Ca Ratio',
+    'mg_deficit': 'Mg Deficit',
+    'cec': 'CEC (cmol/kg)',
+    'total_score': 'Viability Score',
+    'rating_code': 'Rating',
+    'weathering_multiplier': 'Weathering Multiplier',
+    'co2_lime_t_ha_yr': 'CO₂ Lime Repl. (t/ha/yr)',
+    'co2_full_t_ha_yr': 'CO₂ Full ERW (t/ha/yr)',
+    'benefit_lime_eur_ha_yr': 'Benefit Lime Repl. (€/ha/yr)',
+    'benefit_full_eur_ha_yr': 'Benefit Full ERW (€/ha/yr)',
+    'area_ha': None,
+}
+# analyze_table outputs computed from (not copied from) the plot columns
+DERIVED_RESULT_COLUMNS = [k for k in RESULT_COLUMNS if k != 'plot_id' and k not in PLOT_NUMERIC_FIELDS]
+
+# Shared no-op stage timer for analyzers without metrics attached
+_NULL_SPAN = contextlib.nullcontext()
+# Elements per pass in round_half
+_ROUND_BLOCK = 1 << 14
+# Plot values in analyze_plot cache keys (location does not affect results)
+_PLOT_KEY_FIELDS = [f for f in PLOT_NUMERIC_FIELDS if f not in PLOT_LOCATION_FIELDS]
+
+
+class PlotRow:
+    """
+    Zero-copy view of one PlotTable row.
+    
+    Exposes the SoilPlot attributes (and mg_ca_ratio / mg_deficit) by
+    reading the table columns, so it can be passed to every
+    ERWViabilityAnalyzer method that takes a SoilPlot. Values are Python
+    floats, as on SoilPlot: round() of an np.float64 uses NumPy's
+    scale-and-round and can differ in the last decimal.
+    """
+    __slots__ = ('_table', '_index')
+    
+    def __init__(self, table: 'PlotTable', index: int):
+        self._table = table
+        self._index = index
+    
+    @property
+    def plot_id(self) -> str:
+        return self._table.plot_id[self._index]
+    
+    @property
+    def mg_ca_ratio(self) -> float:
+        return float(self._table.mg_ca_ratio[self._index])
+    
+    @property
+    def mg_deficit(self) -> float:
+        return float(self._table.mg_deficit[self._index])
+    
+    def to_soil_plot(self) -> SoilPlot:
+        return SoilPlot(plot_id=self.plot_id,
+                        **{f: getattr(self, f) for f in PLOT_NUMERIC_FIELDS})
+    
+    def __repr__(self) -> str:
+        return f"PlotRow({self.plot_id!r}, index={self._index})"
+
+
+for _name in PLOT_NUMERIC_FIELDS:
+    setattr(PlotRow, _name, property(lambda self, _n=_name: float(self._table.columns[_n][self._index])))
+
+
+class PlotTable:
+    """
+    Column-array container for many plots (alternative to List[SoilPlot]).
+    
+    Each SoilPlot numeric field is one contiguous float64 array (8 bytes
+    per field per plot: 80 bytes for the ten soil and area fields, 112
+    with the location and climate columns) and plot_id is a separate
+    array. Derived columns
+    mg_ca_ratio and mg_deficit are computed once and cached; call
+    invalidate() after modifying columns in place.
+    """
+    
+    def __init__(self, columns: Dict[str, np.ndarray], plot_id=None):
+        n = None
+        self.columns = {}
+        for name in PLOT_NUMERIC_FIELDS:
+            if name in columns:
+                values = np.asarray(columns[name], dtype=float)
+            elif name in PLOT_FIELD_DEFAULTS:
+                values = np.full(n, PLOT_FIELD_DEFAULTS[name])
+            else:
+                raise ValueError(f"PlotTable is missing column '{name}'")
+            if n is not None and len(values) != n:
+                raise ValueError(f"Column '{name}' has length {len(values)}, expected {n}")
+            n = len(values)
+            self.columns[name] = values
+        if plot_id is None:
+            plot_id = columns.get('plot_id')
+        self.plot_id = np.arange(n) if plot_id is None else np.asarray(plot_id)
+    
+    @classmethod
+    def from_plots(cls, plots: List[SoilPlot]) -> 'PlotTable':
+        return cls({f: [getattr(p, f) for p in plots] for f in PLOT_NUMERIC_FIELDS},
+                   plot_id=np.array([p.plot_id for p in plots], dtype=object))
+    
+    @classmethod
+    def from_columns(cls, columns: Dict[str, np.ndarray]) -> 'PlotTable':
+        """Build from a dict of SoilPlot-named columns (e.g. soil_ingest output)."""
+        return cls(columns)
+    
+    def __len__(self) -> int:
+        return len(self.plot_id)
+    
+    def __getattr__(self, name):
+        # Column access as attributes: table.ph, table.cec, ...
+        columns = self.__dict__.get('columns', {})
+        if name in columns:
+            return columns[name]
+        raise AttributeError(name)
+    
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError(index)
+            return PlotRow(self, int(index))
+        # Slices give views, index arrays / masks give copies (NumPy rules)
+        return PlotTable({k: v[index] for k, v in self.columns.items()},
+                         plot_id=self.plot_id[index])
+    
+    def __iter__(self):
+        for i in range(len(self)):
+            yield PlotRow(self, i)
+    
+    @cached_property
+    def mg_ca_ratio(self) -> np.ndarray:
+        mg = self.columns['exchangeable_mg']
+        ca = self.columns['exchangeable_ca']
+        return np.divide(mg, ca, out=np.zeros_like(mg), where=ca > 0)
+    
+    @cached_property
+    def mg_deficit(self) -> np.ndarray:
+        return np.fmax(0.0, 1.5 - self.columns['exchangeable_mg'])
+    
+    def invalidate(self):
+        """Drop cached derived columns after in-place edits."""
+        self.__dict__.pop('mg_ca_ratio', None)
+        self.__dict__.pop('mg_deficit', None)
+    
+    def update_rows(self, index, **values):
+        """
+        Overwrite column values for the given rows (e.g. resampled plots).
+        
+        Cached derived columns are patched for those rows only rather than
+        recomputed for the whole table.
+        """
+        index = np.asarray(index)
+        for name, column_values in values.items():
+            if name not in self.columns:
+                raise KeyError(f"Unknown plot column '{name}'")
+            self.columns[name][index] = column_values
+        if 'mg_ca_ratio' in self.__dict__:
+            mg = self.columns['exchangeable_mg'][index]
+            ca = self.columns['exchangeable_ca'][index]
+            self.__dict__['mg_ca_ratio'][index] = np.divide(mg, ca, out=np.zeros_like(mg), where=ca > 0)
+        if 'mg_deficit' in self.__dict__:
+            self.__dict__['mg_deficit'][index] = np.fmax(0.0, 1.5 - self.columns['exchangeable_mg'][index])
+    
+    def to_plots(self) -> List[SoilPlot]:
+        return [row.to_soil_plot() for row in self]
+    
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the numeric columns and the plot_id array itself."""
+        return sum(v.nbytes for v in self.columns.values()) + self.plot_id.nbytes
+
+
+def climate_columns(columns) -> Dict[str, np.ndarray]:
+    """
+    Per-plot climate keyword arguments for score_batch and
+    weathering_multiplier_batch from a PlotTable (or dict of columns).
+    
+    Climate columns that are absent or entirely NaN are left out, so
+    plots without climate data keep the constant-climate fast path.
+    """
+    if isinstance(columns, PlotTable):
+        columns = columns.columns
+    result = {}
+    for name in PLOT_CLIMATE_FIELDS:
+        if name in columns:
+            values = np.asarray(columns[name], dtype=float)
+            if not np.isnan(values).all():
+                result[name] = values
+    return result
+
+
+def round_half(values, decimals: int) -> np.ndarray:
+    """
+    Vectorized Python round(value, decimals) for float arrays.
+    
+    np.round rounds values * 10**decimals, so a value whose scaled form
+    lands within rounding error of a .5 tie can round the other way than
+    round(), which rounds the exact binary value (47.77 vs 47.78). Such
+    near-ties are rare: they are found blockwise (temporaries stay in
+    cache, about 2x the cost of np.round) and redone with round().
+    """
+    values = np.asarray(values, dtype=float)
+    scale = 10.0 ** decimals
+    result = np.empty_like(values)
+    flat_values, flat_result = values.reshape(-1), result.reshape(-1)
+    gap = np.empty(min(_ROUND_BLOCK, flat_values.size))
+    ties = []
+    for start in range(0, flat_values.size, _ROUND_BLOCK):
+        block = flat_values[start:start + _ROUND_BLOCK]
+        rounded = flat_result[start:start + _ROUND_BLOCK]
+        scaled = gap[:len(block)]
+        np.multiply(block, scale, out=scaled)
+        # Scaling error grows with magnitude (half an ulp ≈ 1.1e-16 · |scaled|)
+        limit = 0.5 - 1e-9 - 1e-15 * max(np.fmax.reduce(scaled), -np.fmin.reduce(scaled))
+        np.rint(scaled, out=rounded)
+        with np.errstate(invalid='ignore'):  # inf - inf
+            np.subtract(scaled, rounded, out=scaled)
+            np.abs(scaled, out=scaled)
+            rounded /= scale
+            near_tie = scaled >= limit
+        if near_tie.any():
+            ties.append(start + np.flatnonzero(near_tie))
+    for index in ties:
+        flat_result[index] = [round(v, decimals) for v in flat_values[index].tolist()]
+    return result
+
+
+@lru_cache(maxsize=None)
+def _constant_names(cls: type) -> Tuple[str, ...]:
+    """Upper-case (model constant) attribute names of an analyzer class."""
+    return tuple(name for name in dir(cls) if name.isupper())
+
+
 class ERWViabilityAnalyzer:
     """Analyzes ERW viability based on soil chemistry, climate, and economic factors."""
     
@@ -57,9 +319,75 @@ class ERWViabilityAnalyzer:
     BASALT_CAO_CONTENT = 0.10  # 10% CaO
     WEATHERING_EFFICIENCY = 0.45  # 45% weathering over 10 years
     
-    def __init__(self, plots: List[SoilPlot]):
+    # Score ladders used by the batch scoring path (score_batch).
+    # Each entry: (breakpoints, points, side). 'left' ladders award points[i]
+    # for value <= breakpoints[i] (pH); 'right' ladders award points[i] for
+    # breakpoints[i-1] <= value < breakpoints[i] (OM, Mg deficit, CEC).
+    PH_LADDER = ((5.2, 5.5, 5.8, 6.0, 6.5, 7.0), (30.0, 29.0, 27.0, 25.0, 20.0, 15.0, 5.0), 'left')
+    OM_LADDER = ((4, 6, 8, 10, 12), (3.0, 8.0, 12.0, 15.0, 18.0, 20.0), 'right')
+    MG_DEFICIT_LADDER = ((0.5, 0.8, 1.0, 1.2, 1.5), (2.0, 6.0, 9.0, 11.0, 13.0, 15.0), 'right')
+    CEC_LADDER = ((8, 10, 15, 20), (3.0, 6.0, 8.0, 9.0, 10.0), 'right')
+    RAINFALL_LADDER = ((750, 1000, 1500), (5.0, 9.0, 12.0, 15.0), 'right')
+    # Temperature points by band: < 12, [12, 15), [15, 20], (20, 23], > 23 °C
+    TEMPERATURE_BANDS = ((12, 15, 20, 23), (5.0, 8.0, 10.0, 8.0, 5.0))
+    
+    # Rating codes returned by score_batch index into RATING_LABELS
+    RATING_THRESHOLDS = (50, 60, 70, 80, 90)
+    RATING_LABELS = (
+        "⭐ MARGINAL",
+        "⭐⭐ MODERATE",
+        "⭐⭐⭐ GOOD",
+        "⭐⭐⭐⭐ VERY GOOD",
+        "⭐⭐⭐⭐⭐ EXCELLENT",
+        "⭐⭐⭐⭐⭐ EXCEPTIONAL",
+    )
+    
+    def __init__(self, plots: Union[List[SoilPlot], PlotTable], cache=None, metrics=None, rubric=None):
+        """
+        cache : optional result_cache.ResultCache (or any object with
+        get_or_compute(key_parts, compute)) used by analyze_plot.
+        metrics : optional run_metrics.RunMetrics (or any object with
+        span(name) and count(name, value)) timing the analysis stages;
+        when None, the process-wide run_metrics collector is used if
+        enabled (run_metrics.enable() / ERW_METRICS).
+        rubric : optional scoring_rubric.Rubric (or any object with
+        score(columns), rating_labels(codes)) replacing the built-in
+        ladders in score_plots, analyze_table and analyze_all_plots. The
+        per-plot calculate_* methods keep the built-in ladders.
+        """
         self.plots = plots
         self.results = {}
+        self.cache = cache
+        self.metrics = metrics
+        self.rubric = rubric
+    
+    def active_metrics(self):
+        """The attached metrics, else the enabled run_metrics collector (or None)."""
+        return self.metrics if self.metrics is not None else run_metrics.active()
+    
+    def _span(self, name: str):
+        """Timed stage on the active metrics, or a no-op."""
+        metrics = self.active_metrics()
+        return _NULL_SPAN if metrics is None else metrics.span(name)
+    
+    def model_constants(self) -> Dict:
+        """Upper-case model constants as seen by this instance (incl. overrides)."""
+        return {name: getattr(self, name) for name in _constant_names(type(self))}
+    
+    def model_fingerprint(self) -> str:
+        """
+        Hash of the analyzer code and model constants (cache key prefix).
+        
+        Computed on first use and again only when a constant differs from
+        the values it was computed for (instance or class attribute), so
+        per-plot cache lookups do not rehash the class.
+        """
+        from result_cache import stable_hash
+        constants = tuple([getattr(self, name) for name in _constant_names(type(self))])
+        cached = self.__dict__.get('_fingerprint')
+        if cached is None or cached[0] != constants:
+            cached = self._fingerprint = (constants, stable_hash(type(self), self.model_constants()))
+        return cached[1]
     
     def calculate_ph_score(self, ph: float) -> float:
         """
@@ -141,39 +469,84 @@ class ERWViabilityAnalyzer:
         else:
             return 3.0
     
-    def calculate_climate_score(self) -> float:
+    def plot_climate(self, plot: SoilPlot) -> Tuple[float, float]:
+        """
+        Annual rainfall (mm) and mean temperature (°C) for a plot.
+        
+        Uses the plot's own climate values where set and the
+        ANNUAL_RAINFALL_MM / AVG_TEMPERATURE_C constants otherwise.
+        """
+        rainfall = getattr(plot, 'annual_rainfall_mm', float('nan'))
+        temperature = getattr(plot, 'temperature_c', float('nan'))
+        return (self.ANNUAL_RAINFALL_MM if np.isnan(rainfall) else rainfall,
+                self.AVG_TEMPERATURE_C if np.isnan(temperature) else temperature)
+    
+    def calculate_climate_score(self, annual_rainfall_mm: float = None, temperature_c: float = None) -> float:
         """
         Calculate climate score (0-25 points).
         
-        Based on rainfall and temperature.
+        Based on rainfall and temperature (default: the class constants).
         """
+        if annual_rainfall_mm is None:
+            annual_rainfall_mm = self.ANNUAL_RAINFALL_MM
+        if temperature_c is None:
+            temperature_c = self.AVG_TEMPERATURE_C
+        
         # Rainfall component (0-15 points)
-        if self.ANNUAL_RAINFALL_MM >= 1500:
+        if annual_rainfall_mm >= 1500:
             rainfall_score = 15.0
-        elif self.ANNUAL_RAINFALL_MM >= 1000:
+        elif annual_rainfall_mm >= 1000:
             rainfall_score = 12.0
-        elif self.ANNUAL_RAINFALL_MM >= 750:
+        elif annual_rainfall_mm >= 750:
             rainfall_score = 9.0
         else:
             rainfall_score = 5.0
         
         # Temperature component (0-10 points)
-        if 15 <= self.AVG_TEMPERATURE_C <= 20:
+        if 15 <= temperature_c <= 20:
             temp_score = 10.0
-        elif 12 <= self.AVG_TEMPERATURE_C <= 23:
+        elif 12 <= temperature_c <= 23:
             temp_score = 8.0
         else:
             temp_score = 5.0
         
         return rainfall_score + temp_score
     
+    def climate_score_batch(self, annual_rainfall_mm=None, temperature_c=None) -> np.ndarray:
+        """
+        Vectorized calculate_climate_score.
+        
+        Either argument may be None (class constant), a scalar or a
+        per-plot array; NaN entries also take the class constant. Two
+        searchsorted lookups, so the cost is a few array passes.
+        """
+        rainfall = self._fill_climate(annual_rainfall_mm, self.ANNUAL_RAINFALL_MM)
+        temperature = self._fill_climate(temperature_c, self.AVG_TEMPERATURE_C)
+        
+        rainfall_score = self._score_ladder(rainfall, self.RAINFALL_LADDER)
+        breakpoints, points = self.TEMPERATURE_BANDS
+        breakpoints = np.asarray(breakpoints, dtype=float)
+        # Bounds are inclusive towards the 15-20 °C optimum
+        band = np.where(temperature <= breakpoints[2],
+                        np.searchsorted(breakpoints[:2], temperature, side='right'),
+                        np.searchsorted(breakpoints[2:], temperature, side='left') + 2)
+        temp_score = np.asarray(points, dtype=float)[band]
+        return rainfall_score + temp_score
+    
+    @staticmethod
+    def _fill_climate(values, default: float) -> np.ndarray:
+        if values is None:
+            return np.asarray(default, dtype=float)
+        values = np.asarray(values, dtype=float)
+        return np.where(np.isnan(values), default, values)
+    
     def calculate_total_viability_score(self, plot: SoilPlot) -> Dict[str, float]:
         """Calculate comprehensive viability score for a plot."""
         ph_score = self.calculate_ph_score(plot.ph)
         om_score = self.calculate_om_score(plot.organic_matter)
         mg_score = self.calculate_mg_deficit_score(plot.mg_deficit)
         cec_score = self.calculate_cec_score(plot.cec)
-        climate_score = self.calculate_climate_score()
+        climate_score = self.calculate_climate_score(*self.plot_climate(plot))
         
         total_score = ph_score + om_score + mg_score + cec_score + climate_score
         
@@ -204,6 +577,108 @@ class ERWViabilityAnalyzer:
         else:
             return "⭐ MARGINAL"
     
+    @staticmethod
+    def _score_ladder(values: np.ndarray, ladder: Tuple) -> np.ndarray:
+        """
+        Evaluate a threshold ladder for an array of values.
+        
+        Equivalent to the if/elif chains of the scalar score methods,
+        including NaN inputs (which fall through to the last branch).
+        """
+        breakpoints, points, side = ladder
+        points = np.asarray(points, dtype=float)
+        idx = np.searchsorted(np.asarray(breakpoints, dtype=float), values, side=side)
+        if side == 'right':
+            # NaN fails every ">=" test in the scalar path -> lowest score
+            idx = np.where(np.isnan(values), 0, idx)
+        return points[idx]
+    
+    def score_batch(self, ph, organic_matter, exchangeable_mg, cec,
+                    annual_rainfall_mm=None, temperature_c=None) -> Dict[str, np.ndarray]:
+        """
+        Vectorized viability scoring for columns of plot data.
+        
+        Parameters:
+        -----------
+        ph, organic_matter, exchangeable_mg, cec : array_like
+            One value per plot (same units as SoilPlot)
+        annual_rainfall_mm, temperature_c : array_like
+            Optional per-plot climate (NaN or None = class constants)
+        
+        Returns:
+        --------
+        dict : Arrays for every score component, 'total_score' and
+               'rating_code' (index into RATING_LABELS). Values are
+               identical to calculate_total_viability_score().
+        """
+        ph = np.asarray(ph, dtype=float)
+        organic_matter = np.asarray(organic_matter, dtype=float)
+        exchangeable_mg = np.asarray(exchangeable_mg, dtype=float)
+        cec = np.asarray(cec, dtype=float)
+        
+        mg_deficit = np.fmax(0.0, 1.5 - exchangeable_mg)
+        
+        ph_score = self._score_ladder(ph, self.PH_LADDER)
+        om_score = self._score_ladder(organic_matter, self.OM_LADDER)
+        mg_score = self._score_ladder(mg_deficit, self.MG_DEFICIT_LADDER)
+        cec_score = self._score_ladder(cec, self.CEC_LADDER)
+        if annual_rainfall_mm is None and temperature_c is None:
+            climate_score = np.full(ph.shape, self.calculate_climate_score())
+        else:
+            climate_score = np.broadcast_to(self.climate_score_batch(annual_rainfall_mm, temperature_c),
+                                            ph.shape).copy()
+        
+        total_score = ph_score + om_score + mg_score + cec_score + climate_score
+        
+        return {
+            'mg_deficit': mg_deficit,
+            'ph_score': ph_score,
+            'om_score': om_score,
+            'mg_score': mg_score,
+            'cec_score': cec_score,
+            'climate_score': climate_score,
+            'total_score': total_score,
+            'rating_code': self.rating_codes(total_score),
+        }
+    
+    @classmethod
+    def rating_codes(cls, scores) -> np.ndarray:
+        """Convert an array of total scores to rating codes (0 = MARGINAL)."""
+        scores = np.asarray(scores, dtype=float)
+        codes = np.searchsorted(np.asarray(cls.RATING_THRESHOLDS, dtype=float), scores, side='right')
+        return np.where(np.isnan(scores), 0, codes).astype(np.int8)
+    
+    @classmethod
+    def rating_labels(cls, codes) -> np.ndarray:
+        """Map rating codes back to the star-rating strings of _get_rating()."""
+        return np.asarray(cls.RATING_LABELS, dtype=object)[np.asarray(codes)]
+    
+    def plot_ratings(self, codes) -> np.ndarray:
+        """Rating labels for codes from score_plots (the rubric's labels if set)."""
+        return (self.rubric or self).rating_labels(codes)
+    
+    def score_plots(self, plots: Union[List[SoilPlot], PlotTable] = None) -> Dict[str, np.ndarray]:
+        """Run score_batch over a SoilPlot list or PlotTable (default: self.plots)."""
+        plots = self.plots if plots is None else plots
+        if self.rubric is not None:
+            return self.rubric.score(plots if isinstance(plots, PlotTable) else PlotTable.from_plots(plots))
+        if isinstance(plots, PlotTable):
+            return self.score_batch(plots.ph, plots.organic_matter, plots.exchangeable_mg, plots.cec,
+                                    **climate_columns(plots))
+        return self.score_batch(
+            [p.ph for p in plots],
+            [p.organic_matter for p in plots],
+            [p.exchangeable_mg for p in plots],
+            [p.cec for p in plots],
+            **climate_columns({f: [getattr(p, f, np.nan) for p in plots] for f in PLOT_CLIMATE_FIELDS}),
+        )
+    
+    def plot_table(self) -> PlotTable:
+        """self.plots as a PlotTable (a list of SoilPlot is converted)."""
+        if isinstance(self.plots, PlotTable):
+            return self.plots
+        return PlotTable.from_plots(self.plots)
+    
     def calculate_weathering_rate_multiplier(self, plot: SoilPlot) -> float:
         """
         Calculate weathering rate multiplier based on pH and OM.
@@ -217,7 +692,27 @@ class ERWViabilityAnalyzer:
         om_multiplier = 1.0 + (plot.organic_matter - 2.0) * 0.15
         
         # Climate effect
-        climate_multiplier = (self.ANNUAL_RAINFALL_MM / 1000) * 1.2
+        annual_rainfall_mm, _ = self.plot_climate(plot)
+        climate_multiplier = (annual_rainfall_mm / 1000) * 1.2
+        
+        return ph_multiplier * om_multiplier * climate_multiplier
+    
+    def weathering_multiplier_batch(self, ph, organic_matter, annual_rainfall_mm=None) -> np.ndarray:
+        """
+        Vectorized calculate_weathering_rate_multiplier.
+        
+        Agrees with the scalar method to floating-point precision (NumPy's
+        power kernel can differ from math.pow in the last bit).
+        annual_rainfall_mm defaults to the ANNUAL_RAINFALL_MM constant and
+        may be a per-plot array (NaN entries take the constant).
+        """
+        ph = np.asarray(ph, dtype=float)
+        organic_matter = np.asarray(organic_matter, dtype=float)
+        annual_rainfall_mm = self._fill_climate(annual_rainfall_mm, self.ANNUAL_RAINFALL_MM)
+        
+        ph_multiplier = 10 ** (7.0 - ph) / 10 ** (7.0 - 7.0)
+        om_multiplier = 1.0 + (organic_matter - 2.0) * 0.15
+        climate_multiplier = (annual_rainfall_mm / 1000) * 1.2
         
         return ph_multiplier * om_multiplier * climate_multiplier
     
@@ -324,83 +819,290 @@ class ERWViabilityAnalyzer:
             'roi_percent': round((total_benefit / basalt_cost * 100), 1) if scenario == 'full_erw' else round((total_benefit / (basalt_cost if basalt_cost > 0 else 1) * 100), 1)
         }
     
-    def analyze_all_plots(self) -> pd.DataFrame:
-        """Perform comprehensive analysis on all plots."""
+    def _analyze_plot(self, plot: SoilPlot, viability: bool = True) -> Dict[str, Dict]:
+        if self.active_metrics() is None:
+            result = {'viability': self.calculate_total_viability_score(plot)} if viability else {}
+            result.update({
+                'co2_lime': self.calculate_co2_removal_lime_replacement(plot),
+                'co2_full': self.calculate_co2_removal_full_erw(plot),
+                'economics_lime': self.calculate_economics(plot, 'lime_replacement'),
+                'economics_full': self.calculate_economics(plot, 'full_erw'),
+            })
+            return result
+        result = {}
+        if viability:
+            with self._span('viability'):
+                result['viability'] = self.calculate_total_viability_score(plot)
+        with self._span('co2'):
+            result['co2_lime'] = self.calculate_co2_removal_lime_replacement(plot)
+            result['co2_full'] = self.calculate_co2_removal_full_erw(plot)
+        with self._span('economics'):
+            result['economics_lime'] = self.calculate_economics(plot, 'lime_replacement')
+            result['economics_full'] = self.calculate_economics(plot, 'full_erw')
+        return result
+    
+    def analyze_plot(self, plot: SoilPlot, viability: bool = True) -> Dict[str, Dict]:
+        """
+        Viability, both CO2 scenarios and both economics cases for one plot.
+        
+        viability=False leaves out the 'viability' entry (for callers that
+        score plots in a batch, as analyze_all_plots does).
+        With a cache attached, results are keyed by model_fingerprint() and
+        the plot's soil values, so any model change invalidates them;
+        plot_id and location are not part of the key.
+        """
+        if self.cache is None:
+            return self._analyze_plot(plot, viability)
+        key = ('analyze_plot' if viability else 'analyze_plot_co2', self.model_fingerprint(),
+               tuple([float(getattr(plot, f)) for f in _PLOT_KEY_FIELDS]))
+        result = self.cache.get_or_compute(key, lambda: self._analyze_plot(plot, viability))
+        if viability:
+            result['viability']['plot_id'] = plot.plot_id
+        return result
+    
+    def analyze_table(self, table: PlotTable = None) -> Dict[str, np.ndarray]:
+        """
+        Columnar equivalent of analyze_all_plots.
+        
+        Evaluates scoring, both CO2 scenarios and both economics cases for
+        every plot in one vectorized pass, rounding (round_half) at the
+        same points as the per-plot methods, so values equal
+        analyze_all_plots on the same plots. Returns arrays keyed as
+        RESULT_COLUMNS.
+        """
+        with self._span('analyze_table'):
+            result = self._analyze_table(self.plot_table() if table is None else table)
+        metrics = self.active_metrics()
+        if metrics is not None:
+            metrics.count('plots_analyzed', len(result['plot_id']))
+        return result
+    
+    def _analyze_table(self, table: PlotTable) -> Dict[str, np.ndarray]:
+        area = table.area_ha
+        
+        climate = climate_columns(table)
+        
+        with self._span('scoring'):
+            scores = self.score_plots(table)
+        with self._span('weathering_multiplier'):
+            multiplier = self.weathering_multiplier_batch(table.ph, table.organic_matter,
+                                                          climate.get('annual_rainfall_mm'))
+        co2 = self.co2_batch(multiplier, area)
+        economics = self.economics_batch(co2['co2_lime_t_ha_yr'], co2['co2_full_t_ha_yr'])
+        
+        return {
+            'plot_id': table.plot_id,
+            'ph': table.ph,
+            'organic_matter': table.organic_matter,
+            'exchangeable_mg': table.exchangeable_mg,
+            'exchangeable_ca': table.exchangeable_ca,
+            'mg_ca_ratio': round_half(table.mg_ca_ratio, 3),
+            'mg_deficit': round_half(table.mg_deficit, 2),
+            'cec': table.cec,
+            'total_score': round_half(scores['total_score'], 1),
+            'rating_code': scores['rating_code'],
+            'weathering_multiplier': round_half(multiplier, 2),
+            **co2,
+            **economics,
+            'area_ha': area,
+        }
+    
+    def co2_batch(self, multiplier, area_ha) -> Dict[str, np.ndarray]:
+        """
+        CO2 rates of both scenarios from weathering multipliers.
+        
+        Returns 'co2_lime_t_ha_yr' and 'co2_full_t_ha_yr', rounded as in
+        calculate_co2_removal_lime_replacement / _full_erw.
+        """
+        multiplier = np.asarray(multiplier, dtype=float)
+        area = np.asarray(area_ha, dtype=float)
+        
+        # Lime replacement: 2,700 kg basalt/ha/yr
+        mgo_weathered = 2700 * self.BASALT_MGO_CONTENT * self.WEATHERING_EFFICIENCY
+        cao_weathered = 2700 * self.BASALT_CAO_CONTENT * self.WEATHERING_EFFICIENCY
+        co2_lime = round_half(mgo_weathered * (44 / 40) * multiplier / 1000
+                            + cao_weathered * (44 / 56) * multiplier / 1000, 2)
+        
+        # Full ERW: 50 t/ha one-time, averaged over 10 years
+        mgo_weathered = 50000 * self.BASALT_MGO_CONTENT * self.WEATHERING_EFFICIENCY
+        cao_weathered = 50000 * self.BASALT_CAO_CONTENT * self.WEATHERING_EFFICIENCY
+        total_co2_10yr = (mgo_weathered * (44 / 40) * multiplier / 1000
+                          + cao_weathered * (44 / 56) * multiplier / 1000) * area
+        co2_full = round_half(total_co2_10yr / 10 / area, 1)
+        
+        return {'co2_lime_t_ha_yr': co2_lime, 'co2_full_t_ha_yr': co2_full}
+    
+    def economics_batch(self, co2_lime_t_ha_yr, co2_full_t_ha_yr) -> Dict[str, np.ndarray]:
+        """
+        Farmer benefit of both scenarios from their (rounded) CO2 rates.
+        
+        Returns 'benefit_lime_eur_ha_yr' and 'benefit_full_eur_ha_yr'.
+        """
+        # Carbon revenue uses the rounded CO2 rates, as the scalar path does
+        lime_cost = 3000 / 1000 * self.LIME_COST_PER_TON
+        basalt_cost_lime = 2700 / 1000 * self.BASALT_COST_PER_TON
+        basalt_cost_full = 50 * self.BASALT_COST_PER_TON
+        benefit_lime = round_half((lime_cost - basalt_cost_lime)
+                                + np.asarray(co2_lime_t_ha_yr) * self.CARBON_CREDIT_PRICE, 2)
+        benefit_full = round_half(np.asarray(co2_full_t_ha_yr) * self.CARBON_CREDIT_PRICE - basalt_cost_full / 10, 2)
+        return {'benefit_lime_eur_ha_yr': benefit_lime, 'benefit_full_eur_ha_yr': benefit_full}
+    
+    def results_frame(self, columns: Dict[str, np.ndarray]) -> pd.DataFrame:
+        """Turn analyze_table output into the analyze_all_plots DataFrame."""
+        data = {}
+        for key, label in RESULT_COLUMNS.items():
+            if label is None:
+                continue
+            data[label] = self.plot_ratings(columns[key]) if key == 'rating_code' else columns[key]
+        return pd.DataFrame(data)
+    
+    def analyze_all_plots(self, n_workers: int = None) -> pd.DataFrame:
+        """
+        Perform comprehensive analysis on all plots.
+        
+        With n_workers set, runs the columnar path sharded across a process
+        pool (see parallel_analysis.analyze_parallel); n_workers=0 uses all
+        CPUs.
+        """
+        if n_workers is not None:
+            from parallel_analysis import analyze_parallel
+            with self._span('analyze_parallel'):
+                return self.results_frame(analyze_parallel(self, n_workers=n_workers or None))
+        
         results = []
+        with self._span('scoring'):
+            scores = self.score_plots()
+            ratings = self.plot_ratings(scores['rating_code'])
         
-        for plot in self.plots:
-            viability = self.calculate_total_viability_score(plot)
-            co2_lime = self.calculate_co2_removal_lime_replacement(plot)
-            co2_full = self.calculate_co2_removal_full_erw(plot)
-            economics_lime = self.calculate_economics(plot, 'lime_replacement')
-            economics_full = self.calculate_economics(plot, 'full_erw')
-            
-            result = {
-                'Plot ID': plot.plot_id,
-                'pH': plot.ph,
-                'Organic Matter (%)': plot.organic_matter,
-                'Mg (cmol/kg)': plot.exchangeable_mg,
-                'Ca (cmol/kg)': plot.exchangeable_ca,
-                'Mg/Ca Ratio': round(plot.mg_ca_ratio, 3),
-                'Mg Deficit': round(plot.mg_deficit, 2),
-                'CEC (cmol/kg)': plot.cec,
-                'Viability Score': round(viability['total_score'], 1),
-                'Rating': viability['rating'],
-                'Weathering Multiplier': co2_lime['weathering_multiplier'],
-                'CO₂ Lime Repl. (t/ha/yr)': co2_lime['co2_t_ha_yr'],
-                'CO₂ Full ERW (t/ha/yr)': co2_full['co2_t_ha_yr_avg'],
-                'Benefit Lime Repl. (€/ha/yr)': economics_lime['total_benefit_eur_ha_yr'],
-                'Benefit Full ERW (€/ha/yr)': economics_full['total_benefit_eur_ha_yr'],
-            }
-            results.append(result)
+        # One span for the loop (a span per plot would sample RSS per plot)
+        with self._span('analyze_plots'):
+            for i, plot in enumerate(self.plots):
+                analysis = self.analyze_plot(plot, viability=False)  # scored above
+                co2_lime = analysis['co2_lime']
+                co2_full = analysis['co2_full']
+                economics_lime = analysis['economics_lime']
+                economics_full = analysis['economics_full']
+                
+                result = {
+                    'Plot ID': plot.plot_id,
+                    'pH': plot.ph,
+                    'Organic Matter (%)': plot.organic_matter,
+                    'Mg (cmol/kg)': plot.exchangeable_mg,
+                    'Ca (cmol/kg)': plot.exchangeable_ca,
+                    'Mg/Ca Ratio': round(plot.mg_ca_ratio, 3),
+                    'Mg Deficit': round(plot.mg_deficit, 2),
+                    'CEC (cmol/kg)': plot.cec,
+                    'Viability Score': round(float(scores['total_score'][i]), 1),
+                    'Rating': ratings[i],
+                    'Weathering Multiplier': co2_lime['weathering_multiplier'],
+                    'CO₂ Lime Repl. (t/ha/yr)': co2_lime['co2_t_ha_yr'],
+                    'CO₂ Full ERW (t/ha/yr)': co2_full['co2_t_ha_yr_avg'],
+                    'Benefit Lime Repl. (€/ha/yr)': economics_lime['total_benefit_eur_ha_yr'],
+                    'Benefit Full ERW (€/ha/yr)': economics_full['total_benefit_eur_ha_yr'],
+                }
+                results.append(result)
         
+        metrics = self.active_metrics()
+        if metrics is not None:
+            metrics.count('plots_analyzed', len(results))
         return pd.DataFrame(results)
     
     def generate_summary_statistics(self, df: pd.DataFrame) -> Dict:
-        """Generate summary statistics for all plots."""
-        return {
-            'n_plots': len(df),
-            'avg_ph': round(df['pH'].mean(), 2),
-            'std_ph': round(df['pH'].std(), 2),
-            'avg_om': round(df['Organic Matter (%)'].mean(), 1),
-            'std_om': round(df['Organic Matter (%)'].std(), 1),
-            'avg_mg_deficit': round(df['Mg Deficit'].mean(), 2),
-            'avg_viability_score': round(df['Viability Score'].mean(), 1),
-            'total_area_ha': sum(plot.area_ha for plot in self.plots),
-            'total_co2_lime_replacement_t_yr': round(df['CO₂ Lime Repl. (t/ha/yr)'].sum() * 2, 1),  # Assuming 2 ha per plot
-            'total_co2_full_erw_t_yr': round(df['CO₂ Full ERW (t/ha/yr)'].sum() * 2, 1),
-            'total_economic_benefit_lime_eur_yr': round(df['Benefit Lime Repl. (€/ha/yr)'].sum() * 2, 0),
-            'total_economic_benefit_full_eur_yr': round(df['Benefit Full ERW (€/ha/yr)'].sum() * 2, 0),
-        }
+        """
+        Generate summary statistics for all plots.
+        
+        Totals are weighted by each plot's area_ha (df's own column if it
+        has one, else looked up by 'Plot ID', so filtered or reordered
+        results work). For results that do not fit in memory, feed chunks
+        to streaming_summary.StreamingSummary.
+        """
+        from streaming_summary import StreamingSummary
+        area = df['area_ha'].to_numpy() if 'area_ha' in df else self.plot_areas(df['Plot ID'])
+        return StreamingSummary().update(df, weights=area).summary()
     
-    def export_results(self, output_path: str = 'viability_results.csv'):
-        """Export analysis results to CSV."""
-        df = self.analyze_all_plots()
+    def plot_areas(self, plot_ids) -> np.ndarray:
+        """area_ha of each plot in plot_ids (e.g. a results 'Plot ID' column)."""
+        table = self.plot_table()
+        plot_ids = np.asarray(plot_ids)
+        if len(plot_ids) == len(table) and np.array_equal(plot_ids, table.plot_id):
+            return table.area_ha
+        index = pd.Index(table.plot_id)
+        if not index.is_unique:
+            raise ValueError("Plot IDs are not unique; cannot look up plot areas by ID")
+        positions = index.get_indexer(plot_ids)
+        if (positions < 0).any():
+            missing = plot_ids[positions < 0]
+            raise ValueError(f"No plot area for {len(missing)} Plot ID(s), e.g. {missing[0]!r}")
+        return table.area_ha[positions]
+    
+    def export_results(self, output_path: str = 'viability_results.csv', df: pd.DataFrame = None):
+        """
+        Export analysis results to CSV.
+        
+        df : analyze_all_plots output to write (analysed here when None).
+        An output_path ending in .parquet or .arrow is written as a
+        columnar dataset directory instead (see result_store), from df or
+        from analyze_table; repeated exports append to it. Either way the
+        batch has the analyze_table columns and types (df gets float64
+        values and area_ha by Plot ID), so the two can share a dataset.
+        Columnar exports need pyarrow (listed in requirements.txt); CSV
+        does not.
+        """
+        ext = os.path.splitext(output_path)[1].lower()
+        if ext in ('.parquet', '.arrow'):
+            from result_store import write_results
+            if df is None:
+                results = self.analyze_table()
+            else:
+                results = df.astype({label: float for key, label in RESULT_COLUMNS.items()
+                                     if label in df and key not in ('plot_id', 'rating_code')})
+                if 'area_ha' not in results:
+                    results['area_ha'] = self.plot_areas(df['Plot ID'])
+            write_results(results, output_path, partition_by=(), format=ext[1:],
+                          labels=self.rubric.labels if self.rubric is not None else self.RATING_LABELS)
+            print(f"✅ Results exported to {output_path}")
+            return results
+        df = self.analyze_all_plots() if df is None else df
         df.to_csv(output_path, index=False)
         print(f"✅ Results exported to {output_path}")
         return df
 
 
-def load_sao_miguel_data() -> List[SoilPlot]:
-    """Load São Miguel soil analysis data from Sanguinho area."""
-    plots = [
-        SoilPlot("J. Moleiro 1", 5.6, 10, 7.2, 0.6, 0.7, 14.4, 58, 45, 180, 2.0),
-        SoilPlot("J. Moleiro 2", 5.7, 9, 9.1, 0.8, 0.9, 17.9, 60, 38, 210, 2.0),
-        SoilPlot("J. Moleiro 3", 5.5, 11, 6.5, 0.7, 0.6, 13.5, 59, 52, 170, 2.0),
-        SoilPlot("J. Moleiro 4", 5.5, 10, 10.3, 0.9, 1.0, 19.2, 64, 41, 240, 2.0),
-        SoilPlot("J. Moleiro 5", 5.2, 8, 6.0, 0.5, 0.5, 12.0, 58, 60, 150, 2.0),
-        SoilPlot("J. Moleiro 6", 5.2, 7, 5.8, 0.6, 0.5, 11.8, 59, 65, 145, 2.0),
-        SoilPlot("J. Moleiro 7", 5.3, 12, 7.9, 0.7, 0.8, 16.4, 59, 48, 200, 2.0),
-        SoilPlot("J. Moleiro 8", 5.4, 9, 8.4, 0.8, 0.8, 16.0, 63, 43, 195, 2.0),
-        SoilPlot("J. Moleiro 9", 5.9, 8, 11.2, 0.9, 1.1, 20.2, 65, 35, 260, 2.0),
-        SoilPlot("J. Moleiro 10", 5.7, 9, 8.7, 0.7, 0.9, 16.3, 62, 40, 215, 2.0),
-        SoilPlot("J. Moleiro 11", 6.0, 6, 9.8, 1.0, 1.0, 18.8, 63, 33, 235, 2.0),
-    ]
+# Sanguinho soil analyses (one row per plot, columns named after SoilPlot fields)
+SOIL_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'sao_miguel_soil_plots.csv')
+
+
+def _parse_number(text: str) -> Union[int, float]:
+    """CSV field as int when written as a whole number, else float."""
+    text = text.strip()
+    return int(text) if text.lstrip('+-').isdigit() else float(text)
+
+
+def load_sao_miguel_data(path: str = SOIL_DATA_PATH) -> List[SoilPlot]:
+    """
+    Load São Miguel soil analysis data from Sanguinho area.
+    
+    Reads a small CSV into SoilPlot objects. For large lab exports use
+    soil_ingest.load_soil_table / iter_soil_chunks instead.
+    Whole numbers stay int (OM 10 prints as 10, not 10.0).
+    """
+    plots = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            plots.append(SoilPlot(
+                plot_id=row['plot_id'],
+                **{k: _parse_number(v) for k, v in row.items() if k != 'plot_id'}
+            ))
     return plots
 
 
 def main():
     """Main analysis workflow."""
+    # Opt-in instrumentation: ERW_METRICS=run_metrics.json (or .prom)
+    metrics_path = os.environ.get('ERW_METRICS')
+    if metrics_path:
+        run_metrics.enable()
+    
     print("=" * 80)
     print("🌋 ENHANCED ROCK WEATHERING VIABILITY ANALYSIS")
     print("São Miguel Island, Azores - Sanguinho Agricultural Area")
@@ -482,8 +1184,8 @@ def main():
     print()
     
     # Export results
-    output_file = "/Users/aswin/Documents/GitHub/ERW---Volcanic-Islands/data/sao_miguel_viability_results.csv"
-    analyzer.export_results(output_file)
+    output_file = os.path.join(os.path.dirname(SOIL_DATA_PATH), 'sao_miguel_viability_results.csv')
+    analyzer.export_results(output_file, results_df)
     print()
     print(f"📁 Detailed results saved to: {output_file}")
     print()
@@ -504,6 +1206,10 @@ def main():
     print("=" * 80)
     print("✅ ANALYSIS COMPLETE")
     print("=" * 80)
+    
+    if metrics_path:
+        run_metrics.disable().write(metrics_path)
+        print(f"📁 Run metrics written to {metrics_path}")
 
 
 if __name__ == "__main__":
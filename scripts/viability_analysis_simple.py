@@ -7,9 +7,10 @@ Analyzes real soil data to quantify ERW potential (no external dependencies).
 """
 
 from dataclasses import dataclass
-from typing import List, Dict
+from typing import List, Dict, Union
 import csv
 import statistics
+import os
 
 
 @dataclass
@@ -276,21 +277,31 @@ class ERWViabilityAnalyzer:
         return results
 
 
-def load_sao_miguel_data() -> List[SoilPlot]:
-    """Load São Miguel soil analysis data from Sanguinho area."""
-    plots = [
-        SoilPlot("J. Moleiro 1", 5.6, 10, 7.2, 0.6, 0.7, 14.4, 58, 45, 180, 2.0),
-        SoilPlot("J. Moleiro 2", 5.7, 9, 9.1, 0.8, 0.9, 17.9, 60, 38, 210, 2.0),
-        SoilPlot("J. Moleiro 3", 5.5, 11, 6.5, 0.7, 0.6, 13.5, 59, 52, 170, 2.0),
-        SoilPlot("J. Moleiro 4", 5.5, 10, 10.3, 0.9, 1.0, 19.2, 64, 41, 240, 2.0),
-        SoilPlot("J. Moleiro 5", 5.2, 8, 6.0, 0.5, 0.5, 12.0, 58, 60, 150, 2.0),
-        SoilPlot("J. Moleiro 6", 5.2, 7, 5.8, 0.6, 0.5, 11.8, 59, 65, 145, 2.0),
-        SoilPlot("J. Moleiro 7", 5.3, 12, 7.9, 0.7, 0.8, 16.4, 59, 48, 200, 2.0),
-        SoilPlot("J. Moleiro 8", 5.4, 9, 8.4, 0.8, 0.8, 16.0, 63, 43, 195, 2.0),
-        SoilPlot("J. Moleiro 9", 5.9, 8, 11.2, 0.9, 1.1, 20.2, 65, 35, 260, 2.0),
-        SoilPlot("J. Moleiro 10", 5.7, 9, 8.7, 0.7, 0.9, 16.3, 62, 40, 215, 2.0),
-        SoilPlot("J. Moleiro 11", 6.0, 6, 9.8, 1.0, 1.0, 18.8, 63, 33, 235, 2.0),
-    ]
+# Sanguinho soil analyses (one row per plot, columns named after SoilPlot fields)
+SOIL_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'sao_miguel_soil_plots.csv')
+
+
+def _parse_number(text: str) -> Union[int, float]:
+    """CSV field as int when written as a whole number, else float."""
+    text = text.strip()
+    return int(text) if text.lstrip('+-').isdigit() else float(text)
+
+
+def load_sao_miguel_data(path: str = SOIL_DATA_PATH) -> List[SoilPlot]:
+    """
+    Load São Miguel soil analysis data from Sanguinho area.
+    
+    Reads a small CSV into SoilPlot objects. For large lab exports use
+    soil_ingest.load_soil_table / iter_soil_chunks instead.
+    Whole numbers stay int (OM 10 prints as 10, not 10.0).
+    """
+    plots = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            plots.append(SoilPlot(
+                plot_id=row['plot_id'],
+                **{k: _parse_number(v) for k, v in row.items() if k != 'plot_id'}
+            ))
     return plots
 
 